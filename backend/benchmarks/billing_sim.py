@@ -0,0 +1,451 @@
+"""Billing simulation benchmark.
+
+Drives the per-minute billing path (start_session_billing, the
+BillingScheduler tick and settle_billing_batch) with a virtual clock, so an
+hour of billing for tens of thousands of sessions runs in seconds.
+
+By default the database is an in-process stand-in that mimics the billing
+statements and counts round trips; pass --dsn to run against a local
+Postgres instead (the schema is created with init_db and seeded).
+
+Usage:
+    python backend/benchmarks/billing_sim.py --sessions 1000 10000 50000 --minutes 30
+    python backend/benchmarks/billing_sim.py --sessions 10000 --dsn postgresql://localhost/soulseer_bench
+
+Reported per run:
+    round trips / billed minute  - DB statements issued per minute charged, including
+                                   the inbox writes of insufficient-funds notifications
+    tick latency                 - wall time of one scheduler tick (avg / max)
+    loop lag                     - extra delay seen by a 1ms sleeper while billing runs
+    drift                        - elapsed seconds minus charged seconds per session;
+                                   under 60s plus one tick is on time, more means a missed minute
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import server  # noqa: E402
+
+
+class VirtualClock:
+    def __init__(self, start: float):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class InProcessConnection:
+    """Stand-in for an asyncpg connection that understands the billing statements."""
+
+    def __init__(self, db: "InProcessDatabase"):
+        self.db = db
+
+    def transaction(self):
+        return _NullTransaction()
+
+    async def _round_trip(self):
+        self.db.round_trips += 1
+        if self.db.latency:
+            await asyncio.sleep(self.db.latency)
+
+    async def fetch(self, query: str, *args):
+        await self._round_trip()
+        if "AS d(session_id, client_id, rate, total_billed, hold_remaining, extend_by, amount_held)" in query:
+            return self.db.settle(*args)
+        if "DELETE FROM session_billing_state WHERE session_id = ANY" in query:
+            return self.db.end_for_insufficient_funds(*args)
+        if "FROM reading_sessions" in query and "FOR UPDATE" in query:
+            return self.db.lock_sessions(*args)
+        raise NotImplementedError(f"Unexpected query in billing simulation: {query[:80]}")
+
+    async def fetchval(self, query: str, *args):
+        await self._round_trip()
+        if "INSERT INTO user_notifications" in query:
+            return self.db.record_notification(*args)
+        raise NotImplementedError(f"Unexpected query in billing simulation: {query[:80]}")
+
+    async def execute(self, query: str, *args):
+        await self._round_trip()
+        if "INSERT INTO reader_earnings" in query or "INSERT INTO ledger_entries" in query:
+            return "INSERT"
+        if "FOR UPDATE" in query:
+            return "SELECT"
+        raise NotImplementedError(f"Unexpected statement in billing simulation: {query[:80]}")
+
+
+class _NullTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _Acquire:
+    def __init__(self, db):
+        self.db = db
+
+    async def __aenter__(self):
+        return InProcessConnection(self.db)
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class InProcessDatabase:
+    """Client balances, holds and session status kept in dicts."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self.round_trips = 0
+        self.balances = {}
+        self.holds = {}
+        self.active = set()
+        self.session_totals = {}
+        self.notification_seqs = defaultdict(int)
+
+    def acquire(self):
+        return _Acquire(self)
+
+    def settle(self, session_ids, client_ids, rates, totals, hold_remaining, extend_by, amount_held, billed_at):
+        wanted = defaultdict(Decimal)
+        for session_id, client_id, extend in zip(session_ids, client_ids, extend_by):
+            if session_id in self.active and extend > 0:
+                wanted[client_id] += extend
+        granted_by_client = {}
+        for client_id, amount in wanted.items():
+            available = max(self.balances[client_id], Decimal("0.00"))
+            if available > 0:
+                granted_by_client[client_id] = min(available, amount)
+                self.balances[client_id] -= granted_by_client[client_id]
+
+        rows = []
+        remaining_grant = dict(granted_by_client)
+        for session_id, client_id, rate, total, remaining, extend, held in sorted(
+            zip(session_ids, client_ids, rates, totals, hold_remaining, extend_by, amount_held)
+        ):
+            if session_id not in self.active:
+                rows.append({"session_id": session_id, "is_active": False, "granted": Decimal("0.00")})
+                continue
+            granted = min(extend, remaining_grant.get(client_id, Decimal("0.00")))
+            if granted:
+                remaining_grant[client_id] -= granted
+                self.holds[session_id] = held + granted
+            if remaining + granted >= rate:
+                self.session_totals[session_id] = total + rate
+            rows.append({"session_id": session_id, "is_active": True, "granted": granted})
+        return rows
+
+    def record_notification(self, user_id, payload):
+        self.notification_seqs[user_id] += 1
+        return self.notification_seqs[user_id]
+
+    def lock_sessions(self, session_ids):
+        return [{"id": sid, "client_id": f"c-{sid}"} for sid in session_ids if sid in self.active]
+
+    def end_for_insufficient_funds(self, end_time, session_ids):
+        rows = []
+        for session_id in session_ids:
+            if session_id not in self.active:
+                continue
+            self.active.discard(session_id)
+            client_id = f"c-{session_id}"
+            billed = self.session_totals.get(session_id, Decimal("0.00"))
+            self.balances[client_id] += self.holds.pop(session_id, Decimal("0.00")) - billed
+            rows.append({
+                "id": session_id, "client_id": client_id, "reader_id": "r-sim",
+                "total_amount": billed, "client_user_id": f"u-{session_id}", "reader_user_id": "u-reader",
+            })
+        return rows
+
+
+class PostgresHarness:
+    """Runs the simulation against a real Postgres, counting statements on the pool."""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.round_trips = 0
+        self.top_ups = 0
+
+    async def setup(self, session_count: int, balances: dict, rate: Decimal):
+        server.DATABASE_URL = self.dsn
+        await server.init_db()
+        self.pool = server.db_pool
+        async with self.pool.acquire() as conn:
+            await conn.execute("TRUNCATE users, ledger_entries, ledger_snapshots CASCADE")
+            await conn.execute("INSERT INTO users (id, email, hashed_password, role) VALUES ('u-reader', 'reader@sim', '-', 'reader')")
+            await conn.execute("INSERT INTO readers (id, user_id) VALUES ('r-sim', 'u-reader')")
+            ids = [f"s{i}" for i in range(session_count)]
+            await conn.execute(
+                """INSERT INTO users (id, email, hashed_password)
+                   SELECT 'u-' || sid, sid || '@sim', '-' FROM unnest($1::text[]) AS sid""", ids)
+            await conn.execute(
+                """INSERT INTO clients (id, user_id)
+                   SELECT 'c-' || sid, 'u-' || sid FROM unnest($1::text[]) AS sid""", ids)
+            await self._journal(conn, [entry for sid in ids for entry in self._top_up(f"c-{sid}", balances[f"c-{sid}"])])
+            await conn.execute(
+                """INSERT INTO reading_sessions (id, client_id, reader_id, session_type, status, rate_per_minute, room_id)
+                   SELECT sid, 'c-' || sid, 'r-sim', 'chat', 'pending', $2, 'room-' || sid
+                   FROM unnest($1::text[]) AS sid""", ids, rate)
+        server.db_pool = _CountingPool(self.pool, self)
+        # Insufficient-funds ends notify both parties; their inbox writes count too
+        self.inbox = server.NotificationInbox(dsn=self.dsn)
+        await self.inbox.start()
+        self.inbox.pool = _CountingPool(self.inbox.pool, self)
+        server.notification_inbox = self.inbox
+
+    async def accept(self, session_id: str, start_time: datetime, hold_amount: Decimal) -> Decimal:
+        async with server.db_pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "UPDATE reading_sessions SET status = 'active', start_time = $1 WHERE id = $2",
+                    start_time, session_id)
+                return await server.place_balance_hold(session_id, f"c-{session_id}", hold_amount, conn)
+
+    async def end(self, session_id: str, end_time: datetime):
+        async with server.db_pool.acquire() as conn:
+            await conn.execute(
+                "UPDATE reading_sessions SET status = 'completed', end_time = $1 WHERE id = $2",
+                end_time, session_id)
+
+    async def top_up(self, client_id: str, amount: Decimal):
+        async with server.db_pool.acquire() as conn:
+            await self._journal(conn, self._top_up(client_id, amount))
+
+    def _top_up(self, client_id: str, amount: Decimal) -> list:
+        """Ledger entries crediting the client, as a confirmed payment would."""
+        self.top_ups += 1
+        return server.ledger_transfer(f"top_up:sim-{self.top_ups}", "top_up", client_id, [
+            (server.EXTERNAL_PAYMENTS_ACCOUNT, -amount),
+            (server.client_account(client_id), amount),
+        ])
+
+    async def _journal(self, conn, entries: list):
+        await conn.execute(
+            """INSERT INTO ledger_entries (transfer_id, account, amount, entry_type, reference_id)
+               SELECT * FROM unnest($1::text[], $2::text[], $3::numeric[], $4::text[], $5::text[])""",
+            *(list(column) for column in zip(*entries)))
+
+    async def close(self):
+        await self.inbox.stop()
+        await self.pool.close()
+
+
+class _CountingPool:
+    def __init__(self, pool, harness):
+        self.pool = pool
+        self.harness = harness
+
+    def acquire(self):
+        return _CountingAcquire(self.pool.acquire(), self.harness)
+
+    async def close(self):
+        await self.pool.close()
+
+
+class _CountingAcquire:
+    def __init__(self, acquire_ctx, harness):
+        self.acquire_ctx = acquire_ctx
+        self.harness = harness
+
+    async def __aenter__(self):
+        conn = await self.acquire_ctx.__aenter__()
+        return _CountingConnection(conn, self.harness)
+
+    async def __aexit__(self, *exc):
+        return await self.acquire_ctx.__aexit__(*exc)
+
+
+class _CountingConnection:
+    def __init__(self, conn, harness):
+        self.conn = conn
+        self.harness = harness
+
+    def transaction(self):
+        return self.conn.transaction()
+
+    def __getattr__(self, name):
+        method = getattr(self.conn, name)
+        if name not in ("fetch", "fetchrow", "fetchval", "execute"):
+            return method
+
+        async def counted(*args, **kwargs):
+            self.harness.round_trips += 1
+            return await method(*args, **kwargs)
+        return counted
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run_simulation(session_count: int, minutes: int, args) -> dict:
+    rng = random.Random(args.seed)
+    rate = Decimal(args.rate)
+    clock = VirtualClock(start=1_700_000_000.0)
+    start_wall = clock.now
+
+    server.active_sessions.clear()
+    scheduler = server.BillingScheduler(interval_seconds=60, tick_seconds=args.tick, clock=clock)
+    scheduler.is_leader = True
+    server.billing_scheduler = scheduler
+
+    # Balances between 2 and 40 minutes of reading; lengths between 1 and `minutes` minutes
+    balances = {f"c-s{i}": rate * rng.randint(2, 40) for i in range(session_count)}
+    starts = {f"s{i}": start_wall + rng.uniform(0, 60) for i in range(session_count)}
+    ends = {sid: start + rng.uniform(60, minutes * 60) for sid, start in starts.items()}
+    top_ups = {sid: start + rng.uniform(0, minutes * 60) for sid, start in starts.items() if rng.random() < args.top_up_ratio}
+
+    if args.dsn:
+        db = PostgresHarness(args.dsn)
+        await db.setup(session_count, balances, rate)
+    else:
+        db = InProcessDatabase(latency_ms=args.db_latency_ms)
+        db.balances = dict(balances)
+        server.db_pool = db
+        server.notification_inbox = server.NotificationInbox(dsn=None)
+        server.notification_inbox.pool = db
+
+    hold_amount = rate * server.BILLING_HOLD_MINUTES
+    pending_starts = sorted(starts.items(), key=lambda item: item[1])
+    pending_ends = sorted(ends.items(), key=lambda item: item[1])
+    pending_top_ups = sorted(top_ups.items(), key=lambda item: item[1])
+    started_at = {}
+    drifts = []
+    lags = []
+    probing = True
+
+    async def lag_probe():
+        while probing:
+            before = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append((time.perf_counter() - before - 0.001) * 1000)
+
+    probe = asyncio.create_task(lag_probe())
+    round_trips_before = db.round_trips
+    real_started = time.perf_counter()
+    horizon = start_wall + minutes * 60
+
+    while clock.now < horizon:
+        clock.now += args.tick
+
+        while pending_starts and pending_starts[0][1] <= clock.now:
+            session_id, at = pending_starts.pop(0)
+            start_time = datetime.utcfromtimestamp(at)
+            if args.dsn:
+                held = await db.accept(session_id, start_time, hold_amount)
+            else:
+                db.round_trips += 2  # status UPDATE + hold placement
+                client_id = f"c-{session_id}"
+                held = min(max(db.balances[client_id], Decimal("0.00")), hold_amount)
+                db.balances[client_id] -= held
+                db.holds[session_id] = held
+                db.active.add(session_id)
+            await server.start_session_billing(session_id, {
+                "client_id": f"c-{session_id}", "reader_id": "r-sim", "rate_per_minute": rate,
+                "start_time": start_time, "amount_held": held,
+            })
+            started_at[session_id] = at
+
+        while pending_top_ups and pending_top_ups[0][1] <= clock.now:
+            session_id, _ = pending_top_ups.pop(0)
+            amount = rate * 10
+            if args.dsn:
+                await db.top_up(f"c-{session_id}", amount)
+            else:
+                db.round_trips += 1
+                db.balances[f"c-{session_id}"] += amount
+
+        while pending_ends and pending_ends[0][1] <= clock.now:
+            session_id, at = pending_ends.pop(0)
+            billing_data = server.active_sessions.pop(session_id, None)
+            scheduler.remove(session_id)
+            if billing_data is None:
+                continue  # already ended for insufficient funds
+            if args.dsn:
+                await db.end(session_id, datetime.utcfromtimestamp(at))
+            else:
+                db.round_trips += 1
+                db.active.discard(session_id)
+            charged_seconds = float(billing_data['total_billed'] / rate) * 60
+            drifts.append(at - started_at[session_id] - charged_seconds)
+
+        await scheduler.tick()
+        await asyncio.sleep(0)  # let the lag probe observe how long the tick held the loop
+
+    probing = False
+    await probe
+    real_elapsed = time.perf_counter() - real_started
+
+    # Sessions still running at the horizon
+    for session_id, billing_data in server.active_sessions.items():
+        charged_seconds = float(billing_data['total_billed'] / rate) * 60
+        drifts.append(horizon - started_at[session_id] - charged_seconds)
+
+    billed_minutes = scheduler.sessions_billed
+    round_trips = db.round_trips - round_trips_before
+    tick_stats = scheduler.tick_duration_ms
+    result = {
+        "sessions": session_count,
+        "billed_minutes": billed_minutes,
+        "exhausted": scheduler.sessions_exhausted,
+        "round_trips": round_trips,
+        "round_trips_per_minute": round_trips / billed_minutes if billed_minutes else 0.0,
+        "tick_avg_ms": tick_stats.total / tick_stats.count if tick_stats.count else 0.0,
+        "tick_max_ms": tick_stats.max,
+        "batch_max": scheduler.batch_size.max,
+        "loop_lag_p99_ms": percentile(lags, 0.99),
+        "loop_lag_max_ms": max(lags) if lags else 0.0,
+        "drift_avg_s": sum(drifts) / len(drifts) if drifts else 0.0,
+        "drift_max_s": max(drifts) if drifts else 0.0,
+        "late_sessions": sum(1 for drift in drifts if drift >= 60 + args.tick),
+        "real_seconds": real_elapsed,
+    }
+    if args.dsn:
+        await db.close()
+    return result
+
+
+def print_result(result: dict):
+    print(
+        f"{result['sessions']:>7} sessions | {result['billed_minutes']:>8} minutes billed "
+        f"| {result['exhausted']:>6} exhausted | {result['round_trips_per_minute']:.4f} round trips/min "
+        f"| tick avg {result['tick_avg_ms']:.2f}ms max {result['tick_max_ms']:.2f}ms (batch max {result['batch_max']:.0f}) "
+        f"| loop lag p99 {result['loop_lag_p99_ms']:.2f}ms max {result['loop_lag_max_ms']:.2f}ms "
+        f"| drift avg {result['drift_avg_s']:.1f}s max {result['drift_max_s']:.1f}s, {result['late_sessions']} late "
+        f"| {result['real_seconds']:.1f}s real"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Simulate per-minute billing with a virtual clock.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--minutes", type=int, default=30, help="Simulated wall-clock minutes")
+    parser.add_argument("--tick", type=float, default=server.BILLING_TICK_SECONDS, help="Scheduler tick in seconds")
+    parser.add_argument("--rate", default="1.99", help="Per-minute rate")
+    parser.add_argument("--top-up-ratio", type=float, default=0.2, help="Share of clients that top up mid-session")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Simulated round-trip latency (in-process mode)")
+    parser.add_argument("--dsn", help="Run against this Postgres instead of the in-process stand-in")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    server.logger.setLevel("ERROR")
+    for session_count in args.sessions:
+        print_result(await run_simulation(session_count, args.minutes, args))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+"""Buffered vs streamed list responses: peak memory benchmark.
+
+Seeds online readers into a scratch schema of a Postgres database and builds
+the /api/readers/available and admin reader directory responses both ways:
+buffered (every row fetched, converted and encoded into one body, as FastAPI
+does for a returned list) and with ?stream=true (server-side cursor, JSON
+array written in chunks).
+
+Usage:
+    python backend/benchmarks/list_streaming.py --dsn postgresql://localhost/soulseer_bench
+    python backend/benchmarks/list_streaming.py --dsn ... --readers 10000 100000 200000
+
+Reported per run: peak Python heap (tracemalloc), wall time and body size.
+Tracing slows both paths down; compare the times with each other only.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import List
+
+import asyncpg
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import server  # noqa: E402
+
+SCHEMA = "list_streaming_bench"
+
+SEED_USERS = """
+INSERT INTO users (id, email, hashed_password, first_name, last_name, role)
+SELECT 'u' || g, 'reader' || g || '@example.com', 'x', 'Reader', 'Number ' || g, 'reader'
+FROM generate_series(1, $1::int) g
+"""
+
+SEED_READERS = """
+INSERT INTO readers (id, user_id, bio, specialties, availability_status, application_status,
+                     chat_rate_per_minute, phone_rate_per_minute, video_rate_per_minute, created_at, updated_at)
+SELECT 'r' || g, 'u' || g, 'Tarot, astrology and mediumship readings since 2010.', '["tarot", "astrology"]',
+       'online', 'active', 1.99, 2.99, 3.99, NOW() - g * INTERVAL '1 minute', NOW() - g * INTERVAL '1 second'
+FROM generate_series(1, $1::int) g
+"""
+
+ADMIN = server.User(id="admin", email="admin@example.com", role="admin",
+                    created_at=datetime.utcnow(), updated_at=datetime.utcnow())
+
+
+async def measure(label: str, build):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = await build()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<34} peak heap {peak / 2**20:>8.1f} MiB | {elapsed:>6.2f}s | body {size / 2**20:>7.1f} MiB")
+
+
+async def drain(response) -> int:
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    return size
+
+
+async def run(pool, readers: int):
+    print(f"{readers} readers")
+    async with pool.acquire() as conn:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+        await server.apply_migrations(conn)
+        await conn.execute(SEED_USERS, readers)
+        await conn.execute(SEED_READERS, readers)
+        await conn.execute("ANALYZE")
+
+    async def available_buffered():
+        rows = await server.get_available_readers(stream=False, db=pool)
+        return len(JSONResponse(jsonable_encoder(rows)).body)
+
+    async def available_streamed():
+        return await drain(await server.get_available_readers(stream=True, db=pool))
+
+    directory = TypeAdapter(List[server.AdminReaderView])
+
+    async def directory_buffered():
+        async with pool.acquire() as conn:
+            records = await server.fetch_reader_directory_page(conn, None)
+        return len(directory.dump_json(directory.validate_python([dict(record) for record in records])))
+
+    async def directory_streamed():
+        response = await server.admin_get_readers(
+            response=None, limit=server.PAGE_SIZE_DEFAULT, cursor=None, application_status=None,
+            availability_status=None, q=None, stream=True, current_user=ADMIN, db=pool
+        )
+        return await drain(response)
+
+    await measure("available readers, buffered", available_buffered)
+    await measure("available readers, streamed", available_streamed)
+    await measure("reader directory, buffered", directory_buffered)
+    await measure("reader directory, streamed", directory_streamed)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of buffered and streamed list responses.")
+    parser.add_argument("--dsn", required=True, help="Postgres to seed (a scratch schema is created and dropped)")
+    parser.add_argument("--readers", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    server.logger.setLevel("ERROR")
+    pool = await asyncpg.create_pool(args.dsn, min_size=1, max_size=2, server_settings={"search_path": SCHEMA})
+    try:
+        for readers in args.readers:
+            await run(pool, readers)
+    finally:
+        async with pool.acquire() as conn:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
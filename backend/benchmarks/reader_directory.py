@@ -0,0 +1,160 @@
+"""Admin reader directory benchmark.
+
+Seeds N readers into a scratch schema of a Postgres database, applies the
+migrations, and compares the old single-response directory (every reader
+joined with users and validated as AdminReaderView) with the keyset-paginated
+page queries, the filters, prefix search and the count estimate.
+
+Usage:
+    python backend/benchmarks/reader_directory.py --dsn postgresql://localhost/soulseer_bench
+    python backend/benchmarks/reader_directory.py --dsn ... --readers 10000 100000 --repeat 20
+
+Reported per query: average and max latency over --repeat runs, rows returned
+and, where it applies, the size of the JSON response body.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import List
+
+import asyncpg
+from pydantic import TypeAdapter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import server  # noqa: E402
+
+SCHEMA = "reader_directory_bench"
+PAGE = server.PAGE_SIZE_DEFAULT
+
+LEGACY_QUERY = """
+    SELECT u.*, r.id as reader_db_id, r.bio, r.specialties, r.is_online,
+           r.chat_rate_per_minute, r.phone_rate_per_minute, r.video_rate_per_minute,
+           r.availability_status, r.application_status,
+           r.created_at as reader_created_at, r.updated_at as reader_updated_at
+    FROM users u
+    JOIN readers r ON u.id = r.user_id
+    WHERE u.role = 'reader'
+    ORDER BY u.created_at DESC
+"""
+
+FIRST_NAMES = ["Ava", "Luna", "Iris", "Nova", "Sage", "Rhea", "Mira", "Cleo", "Zara", "Juno"]
+
+SEED_USERS = """
+INSERT INTO users (id, email, hashed_password, first_name, last_name, role, created_at)
+SELECT 'u' || g, 'reader' || g || '@example.com', 'x',
+       ($2::text[])[1 + g % array_length($2::text[], 1)], 'Star' || g, 'reader',
+       NOW() - g * INTERVAL '1 minute'
+FROM generate_series(1, $1::int) g
+"""
+
+SEED_READERS = """
+INSERT INTO readers (id, user_id, bio, specialties, availability_status, application_status, created_at, updated_at)
+SELECT 'r' || g, 'u' || g, 'Tarot and astrology', '["tarot", "astrology"]',
+       CASE WHEN g % 50 = 0 THEN 'online' ELSE 'offline' END,
+       CASE WHEN g % 100 = 0 THEN 'pending_approval' WHEN g % 97 = 0 THEN 'suspended' ELSE 'active' END,
+       NOW() - g * INTERVAL '1 minute', NOW()
+FROM generate_series(1, $1::int) g
+"""
+
+reader_list = TypeAdapter(List[server.AdminReaderView])
+
+
+async def timed(repeat: int, func):
+    durations = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await func()
+        durations.append((time.perf_counter() - started) * 1000)
+    return sum(durations) / len(durations), max(durations), result
+
+
+def report(label: str, avg_ms: float, max_ms: float, rows=None, body_bytes=None):
+    extra = f" | {rows:>7} rows" if rows is not None else ""
+    if body_bytes is not None:
+        extra += f" | {body_bytes / 1024:>9.1f} KiB"
+    print(f"  {label:<36} avg {avg_ms:>9.2f}ms  max {max_ms:>9.2f}ms{extra}")
+
+
+async def seed(conn, readers: int):
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+    await conn.execute(f"SET search_path TO {SCHEMA}")
+    await server.apply_migrations(conn)
+    await conn.execute(SEED_USERS, readers, FIRST_NAMES)
+    await conn.execute(SEED_READERS, readers)
+    await conn.execute("ANALYZE")
+
+
+async def run(conn, readers: int, repeat: int):
+    print(f"{readers} readers")
+    await seed(conn, readers)
+
+    async def legacy():
+        records = await conn.fetch(LEGACY_QUERY)
+        rows = [dict(record) for record in records]
+        for row in rows:
+            row["specialties"] = json.loads(row["specialties"])
+        return len(rows), reader_list.dump_json(reader_list.validate_python(rows))
+
+    async def page(after=server.PAGE_START, **filters):
+        records = await server.fetch_reader_directory_page(conn, PAGE + 1, after, **filters)
+        rows = [dict(record) for record in records[:PAGE]]
+        return len(rows), reader_list.dump_json(reader_list.validate_python(rows))
+
+    avg_ms, max_ms, (rows, body) = await timed(max(1, repeat // 5), legacy)
+    report("legacy: all readers in one response", avg_ms, max_ms, rows, len(body))
+
+    avg_ms, max_ms, (rows, body) = await timed(repeat, page)
+    report("first page", avg_ms, max_ms, rows, len(body))
+
+    middle = await conn.fetchrow(
+        "SELECT created_at, id FROM readers ORDER BY created_at DESC, id DESC OFFSET $1 LIMIT 1", readers // 2
+    )
+    avg_ms, max_ms, (rows, body) = await timed(repeat, lambda: page((middle["created_at"], middle["id"])))
+    report("page at the middle (cursor)", avg_ms, max_ms, rows, len(body))
+
+    for label, filters in [
+        ("application_status=pending_approval", {"application_status": "pending_approval"}),
+        ("availability_status=online", {"availability_status": "online"}),
+        ("q=reader4242 (email prefix)", {"search": "reader4242"}),
+        ("q=star777 (last name prefix)", {"search": "star777"}),
+        ("q=ava + pending_approval", {"search": "ava", "application_status": "pending_approval"}),
+    ]:
+        avg_ms, max_ms, (rows, body) = await timed(repeat, lambda: page(**filters))
+        report(label, avg_ms, max_ms, rows, len(body))
+
+    for label, filters in [("all", {}), ("pending_approval", {"application_status": "pending_approval"}),
+                           ("q=luna", {"search": "luna"})]:
+        from_where, args = server.reader_directory_filters(**filters)
+        avg_ms, max_ms, exact = await timed(repeat, lambda: conn.fetchval(f"SELECT COUNT(*) {from_where}", *args))
+        report(f"COUNT(*) {label}", avg_ms, max_ms, exact)
+        avg_ms, max_ms, estimate = await timed(
+            repeat, lambda: server.estimate_row_count(conn, f"SELECT 1 {from_where}", *args)
+        )
+        report(f"estimate {label}", avg_ms, max_ms, estimate)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the admin reader directory queries.")
+    parser.add_argument("--dsn", required=True, help="Postgres to seed (a scratch schema is created and dropped)")
+    parser.add_argument("--readers", type=int, nargs="+", default=[100000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    server.logger.setLevel("ERROR")
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        for readers in args.readers:
+            await run(conn, readers, args.repeat)
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+"""Row decoding benchmark for the connection type codecs.
+
+Seeds readers (JSONB specialties, NUMERIC rates) and reading sessions (NUMERIC
+money columns) into a scratch schema of a Postgres database and times fetching
+them with different connection setups:
+
+    no codecs       asyncpg defaults; JSONB arrives as a string and is parsed
+                    per row in Python, as handlers had to before
+    stdlib json     JSONB codec backed by the json module
+    codecs/native   register_type_codecs with asyncpg's binary NUMERIC codec
+    codecs/decimal  register_type_codecs with the text NUMERIC codec (default)
+
+Usage:
+    python backend/benchmarks/row_decoding.py --dsn postgresql://localhost/soulseer_bench
+    python backend/benchmarks/row_decoding.py --dsn ... --rows 200000 --repeat 5
+
+Reported per setup and query: best-of-repeat rows/s.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import asyncpg
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import server  # noqa: E402
+
+SCHEMA = "row_decoding_bench"
+
+SEED_USERS = """
+INSERT INTO users (id, email, hashed_password, first_name, role)
+SELECT 'u' || g, 'user' || g || '@example.com', 'x', 'User', 'reader'
+FROM generate_series(1, $1::int) g
+"""
+
+SEED_READERS = """
+INSERT INTO readers (id, user_id, specialties, chat_rate_per_minute, phone_rate_per_minute, video_rate_per_minute)
+SELECT 'r' || g, 'u' || g, '["tarot", "astrology", "mediumship", "dream interpretation"]', 1.99, 2.99, 3.99
+FROM generate_series(1, $1::int) g
+"""
+
+SEED_SESSIONS = """
+INSERT INTO reading_sessions (id, client_id, reader_id, session_type, status, rate_per_minute, fixed_price,
+                              total_minutes, total_amount, room_id)
+SELECT 's' || g, NULL, 'r' || (1 + g % $1::int), 'chat', 'completed', 2.50, 25.00, 12.50, 31.25, 'room_' || g
+FROM generate_series(1, $1::int) g
+"""
+
+QUERIES = {
+    "readers (JSONB + NUMERIC)": "SELECT id, specialties, chat_rate_per_minute, phone_rate_per_minute, video_rate_per_minute FROM readers",
+    "sessions (NUMERIC money)": "SELECT id, rate_per_minute, fixed_price, total_minutes, total_amount FROM reading_sessions",
+}
+
+
+async def stdlib_json_codec(conn):
+    await conn.set_type_codec("jsonb", schema="pg_catalog", encoder=json.dumps, decoder=json.loads, format="text")
+
+
+SETUPS = {
+    "no codecs": None,
+    "stdlib json": stdlib_json_codec,
+    "codecs/native": lambda conn: server.register_type_codecs(conn, "native"),
+    "codecs/decimal": lambda conn: server.register_type_codecs(conn, "decimal"),
+}
+
+
+async def decode_rows(conn, query: str, parse_json: bool) -> int:
+    records = await conn.fetch(query)
+    if parse_json:
+        for record in records:
+            json.loads(record["specialties"])
+    return len(records)
+
+
+async def run(dsn: str, rows: int, repeat: int):
+    print(f"{rows} rows per table (orjson {'available' if server.orjson else 'not installed'})")
+    conn = await asyncpg.connect(dsn, server_settings={"search_path": SCHEMA})
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+        await server.apply_migrations(conn)
+        await conn.execute(SEED_USERS, rows)
+        await conn.execute(SEED_READERS, rows)
+        await conn.execute(SEED_SESSIONS, rows)
+    finally:
+        await conn.close()
+
+    for setup_name, setup in SETUPS.items():
+        conn = await asyncpg.connect(dsn, server_settings={"search_path": SCHEMA})
+        try:
+            if setup:
+                await setup(conn)
+            for query_name, query in QUERIES.items():
+                parse_json = setup is None and "specialties" in query
+                await decode_rows(conn, query, parse_json) # warm the page cache and statement cache
+                best = float("inf")
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    count = await decode_rows(conn, query, parse_json)
+                    best = min(best, time.perf_counter() - started)
+                print(f"  {setup_name:<15} {query_name:<27} {count / best:>12,.0f} rows/s")
+        finally:
+            await conn.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark row decoding with and without the type codecs.")
+    parser.add_argument("--dsn", required=True, help="Postgres to seed (a scratch schema is created and dropped)")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    server.logger.setLevel("ERROR")
+    try:
+        for rows in args.rows:
+            await run(args.dsn, rows, args.repeat)
+    finally:
+        conn = await asyncpg.connect(args.dsn)
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
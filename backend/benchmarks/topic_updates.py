@@ -0,0 +1,111 @@
+"""Reader status fan-out: broadcast full rows vs topic subscriptions with deltas.
+
+Connects N in-process fake notification sockets, of which --subscribed-pct
+subscribe to the "readers" topic (the rest are on pages that do not show the
+reader list), then replays a burst of reader status updates over --seconds:
+
+    broadcast   the previous behaviour: every update sends the full reader
+                row (RETURNING *) to every connected socket
+    topics      WebSocketHub.publish: only the changed fields, only to
+                subscribers, updates to the same reader within
+                WS_COALESCE_SECONDS merged into one message
+
+No database is needed.
+
+Usage:
+    python backend/benchmarks/topic_updates.py
+    python backend/benchmarks/topic_updates.py --sockets 10000 --subscribed-pct 5 --readers 50 --updates 300
+
+Reported per mode: send calls and outbound bytes.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import server  # noqa: E402
+
+
+def reader_row(reader_id: str) -> dict:
+    return {
+        "id": reader_id, "user_id": "u" + reader_id, "bio": "Tarot, astrology and mediumship readings since 2010.",
+        "specialties": ["tarot", "astrology"], "is_online": False, "availability_status": "offline",
+        "application_status": "active", "chat_rate_per_minute": Decimal("1.99"),
+        "phone_rate_per_minute": Decimal("2.99"), "video_rate_per_minute": Decimal("3.99"),
+        "created_at": datetime.utcnow(), "updated_at": datetime.utcnow(),
+    }
+
+
+class CountingSocket:
+    def __init__(self):
+        self.sends = 0
+        self.bytes = 0
+
+    async def send_text(self, text: str):
+        self.sends += 1
+        self.bytes += len(text.encode())
+
+
+async def run(mode: str, args, updates):
+    hub = server.WebSocketHub()
+    sockets = [CountingSocket() for _ in range(args.sockets)]
+    subscribed = int(args.sockets * args.subscribed_pct / 100)
+    for i, socket in enumerate(sockets):
+        connection = hub.connect(f"u{i}", socket)
+        if i < subscribed:
+            hub.subscribe(connection, "readers")
+
+    rows = {}
+    pause = args.seconds / len(updates)
+    started = time.perf_counter()
+    for reader_id, status in updates:
+        row = rows.setdefault(reader_id, reader_row(reader_id))
+        changes = {"availability_status": status, "updated_at": datetime.utcnow()}
+        row.update(changes)
+        if mode == "broadcast":
+            hub.broadcast(server.dumps_json({"type": "reader_status_change", "data": row}))
+        else:
+            hub.publish(f"reader:{reader_id}", ["readers", f"reader:{reader_id}"],
+                        {"type": "reader_status_change", "reader_id": reader_id, "changes": changes})
+        await asyncio.sleep(pause)
+    hub.flush()
+    while hub.metrics()["queued"]:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    sends = sum(socket.sends for socket in sockets)
+    sent_bytes = sum(socket.bytes for socket in sockets)
+    print(f"  {mode:<10} {sends:>12,} sends | {sent_bytes / 2**20:>10.2f} MiB | {elapsed:.2f}s")
+    for connection in list(hub.connections.values()):
+        hub.disconnect(connection)
+    return sends, sent_bytes
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare reader status fan-out with and without topics.")
+    parser.add_argument("--sockets", type=int, default=10000)
+    parser.add_argument("--subscribed-pct", type=float, default=5.0, help="Share of sockets subscribed to readers")
+    parser.add_argument("--readers", type=int, default=50)
+    parser.add_argument("--updates", type=int, default=300)
+    parser.add_argument("--seconds", type=float, default=2.0, help="Time the updates are spread over")
+    args = parser.parse_args()
+
+    server.logger.setLevel("ERROR")
+    rng = random.Random(42)
+    updates = [(f"r{rng.randrange(args.readers)}", rng.choice(["online", "busy", "offline"])) for _ in range(args.updates)]
+    print(f"{args.sockets} sockets, {args.subscribed_pct:g}% subscribed to readers; "
+          f"{args.updates} updates to {args.readers} readers over {args.seconds:g}s")
+    sends, sent_bytes = await run("broadcast", args, updates)
+    topic_sends, topic_bytes = await run("topics", args, updates)
+    print(f"  reduction: {sends / max(topic_sends, 1):,.0f}x sends, {sent_bytes / max(topic_bytes, 1):,.0f}x bytes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
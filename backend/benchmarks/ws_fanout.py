@@ -0,0 +1,121 @@
+"""WebSocket broadcast fan-out benchmark.
+
+Connects N in-process fake notification sockets, a few of them slow, and
+broadcasts a reader_status_change to all of them two ways:
+
+    sequential      the previous notify_user loop: serialize per recipient
+                    and await each send before the next
+    queued          WebSocketHub.broadcast: serialize once, enqueue on every
+                    connection, per-connection writer tasks do the sends
+
+Each fake socket yields to the event loop on every send, as a real one does;
+--slow of them also take --slow-ms per send, like a stalled mobile client.
+No database is needed.
+
+Usage:
+    python backend/benchmarks/ws_fanout.py
+    python backend/benchmarks/ws_fanout.py --sockets 1000 10000 --slow 10 --slow-ms 200 --broadcasts 20
+
+Reported per run: how long the broadcaster is blocked, and the delivery
+latency (p50/p99/max) over the fast sockets.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import server  # noqa: E402
+
+MESSAGE = {
+    "type": "reader_status_change",
+    "data": {
+        "id": "r42", "user_id": "u42", "bio": "Tarot, astrology and mediumship readings since 2010.",
+        "specialties": ["tarot", "astrology"], "availability_status": "online", "is_online": True,
+        "chat_rate_per_minute": Decimal("1.99"), "phone_rate_per_minute": Decimal("2.99"),
+        "video_rate_per_minute": Decimal("3.99"), "created_at": datetime.utcnow(), "updated_at": datetime.utcnow(),
+    },
+}
+
+
+class FakeSocket:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received_at = []
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(self.delay)
+        self.received_at.append(time.perf_counter())
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def report(label: str, blocked: float, latencies):
+    print(
+        f"  {label:<11} broadcaster blocked {blocked * 1000:>9.2f}ms | delivery p50 {percentile(latencies, 0.5) * 1000:>8.2f}ms"
+        f"  p99 {percentile(latencies, 0.99) * 1000:>8.2f}ms  max {max(latencies) * 1000:>8.2f}ms"
+    )
+
+
+def make_sockets(count: int, slow: int, slow_delay: float):
+    return [FakeSocket(slow_delay if i < slow else 0) for i in range(count)]
+
+
+async def sequential(count: int, slow: int, slow_delay: float, broadcasts: int):
+    sockets = make_sockets(count, slow, slow_delay)
+    blocked, latencies = 0.0, []
+    for _ in range(broadcasts):
+        started = time.perf_counter()
+        for socket in sockets:
+            await socket.send_text(server.dumps_json(MESSAGE))
+        blocked += time.perf_counter() - started
+        latencies.extend(socket.received_at.pop() - started for socket in sockets[slow:])
+    report("sequential", blocked / broadcasts, latencies)
+
+
+async def queued(count: int, slow: int, slow_delay: float, broadcasts: int):
+    hub = server.WebSocketHub()
+    sockets = make_sockets(count, slow, slow_delay)
+    for i, socket in enumerate(sockets):
+        hub.connect(f"u{i}", socket)
+    fast = sockets[slow:]
+    blocked, latencies = 0.0, []
+    for _ in range(broadcasts):
+        started = time.perf_counter()
+        hub.broadcast(server.dumps_json(MESSAGE))
+        blocked += time.perf_counter() - started
+        while any(not socket.received_at for socket in fast):
+            await asyncio.sleep(0.001)
+        latencies.extend(socket.received_at.pop() - started for socket in fast)
+    report("queued", blocked / broadcasts, latencies)
+    metrics = hub.metrics()
+    print(f"  {'':<11} slow sockets still queued: {metrics['queued']} messages, evicted {metrics['evicted_slow_consumers']}")
+    for connection in list(hub.connections.values()):
+        hub.disconnect(connection)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark broadcast latency to many notification WebSockets.")
+    parser.add_argument("--sockets", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--slow", type=int, default=10, help="How many sockets are slow")
+    parser.add_argument("--slow-ms", type=float, default=200.0, help="Send time of a slow socket")
+    parser.add_argument("--broadcasts", type=int, default=10)
+    args = parser.parse_args()
+
+    server.logger.setLevel("ERROR")
+    for count in args.sockets:
+        print(f"{count} sockets ({args.slow} slow at {args.slow_ms:g}ms per send), {args.broadcasts} broadcasts")
+        await sequential(count, args.slow, args.slow_ms / 1000, args.broadcasts)
+        await queued(count, args.slow, args.slow_ms / 1000, args.broadcasts)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+"""Schema migration CLI.
+
+    python migrate.py            apply pending migrations
+    python migrate.py status     show the current version and pending migrations
+
+Uses DATABASE_URL unless --dsn is given. Migrations live in migrations/ and are
+also applied at server startup unless MIGRATE_ON_STARTUP=false.
+"""
+import argparse
+import asyncio
+
+import asyncpg
+
+from server import DATABASE_URL, apply_migrations, get_schema_version, load_migrations
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Apply or inspect schema migrations.")
+    parser.add_argument("command", nargs="?", default="up", choices=["up", "status"])
+    parser.add_argument("--dsn", default=DATABASE_URL, help="Postgres DSN (defaults to DATABASE_URL)")
+    args = parser.parse_args()
+
+    migrations = load_migrations()
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        current = await get_schema_version(conn)
+        pending = [m for m in migrations if m.version > current]
+        if args.command == "status":
+            print(f"Current version: {current}")
+            for migration in pending:
+                mode = "" if migration.in_transaction else " (no transaction)"
+                print(f"  pending: {migration.label}{mode}")
+            if not pending:
+                print("Schema is up to date.")
+            return
+
+        applied = await apply_migrations(conn, migrations)
+        print(f"Applied {len(applied)} migration(s); schema is at version {await get_schema_version(conn)}.")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
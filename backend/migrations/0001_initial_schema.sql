@@ -0,0 +1,179 @@
+-- Initial schema: the tables init_db used to create on every boot.
+-- Written with IF NOT EXISTS so it also applies cleanly to databases
+-- created before migrations existed.
+
+-- Users table
+CREATE TABLE IF NOT EXISTS users (
+    id VARCHAR PRIMARY KEY,
+    email VARCHAR UNIQUE NOT NULL,
+    hashed_password TEXT NOT NULL,
+    first_name VARCHAR,
+    last_name VARCHAR,
+    role VARCHAR DEFAULT 'client',
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Readers table
+CREATE TABLE IF NOT EXISTS readers (
+    id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
+    user_id VARCHAR REFERENCES users(id) ON DELETE CASCADE,
+    bio TEXT,
+    specialties JSONB DEFAULT '[]',
+    is_online BOOLEAN DEFAULT FALSE,
+    chat_rate_per_minute DECIMAL(10,2) DEFAULT 0.00,
+    phone_rate_per_minute DECIMAL(10,2) DEFAULT 0.00,
+    video_rate_per_minute DECIMAL(10,2) DEFAULT 0.00,
+    availability_status VARCHAR DEFAULT 'offline',
+    application_status VARCHAR(20) DEFAULT 'pending_approval', -- pending_approval, active, suspended
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Clients table
+CREATE TABLE IF NOT EXISTS clients (
+    id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
+    user_id VARCHAR REFERENCES users(id) ON DELETE CASCADE,
+    balance DECIMAL(10,2) DEFAULT 0.00,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Reading sessions table
+CREATE TABLE IF NOT EXISTS reading_sessions (
+    id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
+    client_id VARCHAR REFERENCES clients(id),
+    reader_id VARCHAR REFERENCES readers(id),
+    session_type VARCHAR NOT NULL,
+    billing_type VARCHAR DEFAULT 'per_minute', -- per_minute, fixed_duration
+    status VARCHAR DEFAULT 'pending',
+    rate_per_minute DECIMAL(10,2),
+    fixed_price DECIMAL(10,2),
+    duration_minutes INTEGER,
+    scheduled_time TIMESTAMP,
+    start_time TIMESTAMP,
+    end_time TIMESTAMP,
+    billing_duration_seconds INTEGER, -- For precise billing
+    total_minutes DECIMAL(10,2) DEFAULT 0.00, -- Kept for now, or can be calculated from seconds
+    total_amount DECIMAL(10,2) DEFAULT 0.00,
+    room_id VARCHAR UNIQUE,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Messages table for premium messaging
+CREATE TABLE IF NOT EXISTS messages (
+    id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
+    sender_id VARCHAR REFERENCES users(id),
+    recipient_id VARCHAR REFERENCES users(id),
+    message_text TEXT NOT NULL,
+    is_paid BOOLEAN DEFAULT FALSE,
+    price DECIMAL(10,2) DEFAULT 0.00,
+    paid_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Live streams table
+CREATE TABLE IF NOT EXISTS live_streams (
+    id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
+    reader_id VARCHAR REFERENCES readers(id),
+    title VARCHAR NOT NULL,
+    description TEXT,
+    status VARCHAR DEFAULT 'scheduled', -- scheduled, live, ended
+    start_time TIMESTAMP,
+    end_time TIMESTAMP,
+    viewer_count INTEGER DEFAULT 0,
+    total_gifts DECIMAL(10,2) DEFAULT 0.00,
+    stream_key VARCHAR UNIQUE,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Virtual gifts table
+CREATE TABLE IF NOT EXISTS virtual_gifts (
+    id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
+    stream_id VARCHAR REFERENCES live_streams(id),
+    sender_id VARCHAR REFERENCES users(id),
+    gift_type VARCHAR NOT NULL,
+    gift_value DECIMAL(10,2) NOT NULL,
+    message TEXT,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Forum posts table
+CREATE TABLE IF NOT EXISTS forum_posts (
+    id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
+    user_id VARCHAR REFERENCES users(id),
+    title VARCHAR NOT NULL,
+    content TEXT NOT NULL,
+    category VARCHAR DEFAULT 'general',
+    reply_count INTEGER DEFAULT 0,
+    last_reply_at TIMESTAMP,
+    is_pinned BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Forum replies table
+CREATE TABLE IF NOT EXISTS forum_replies (
+    id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
+    post_id VARCHAR REFERENCES forum_posts(id) ON DELETE CASCADE,
+    user_id VARCHAR REFERENCES users(id),
+    content TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Reader earnings table
+CREATE TABLE IF NOT EXISTS reader_earnings (
+    id TEXT PRIMARY KEY DEFAULT gen_random_uuid()::text,
+    reader_id TEXT REFERENCES readers(id) ON DELETE CASCADE,
+    session_id TEXT REFERENCES reading_sessions(id) ON DELETE CASCADE,
+    total_session_amount DECIMAL(10,2) NOT NULL,
+    amount_earned DECIMAL(10,2) NOT NULL,
+    payout_status VARCHAR(20) DEFAULT 'pending', -- pending, processing, paid, failed
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_reader_earnings_reader_id ON reader_earnings(reader_id);
+CREATE INDEX IF NOT EXISTS idx_reader_earnings_session_id ON reader_earnings(session_id);
+
+-- Billing checkpoints for active per-minute sessions (one row per session)
+CREATE TABLE IF NOT EXISTS session_billing_state (
+    session_id TEXT PRIMARY KEY REFERENCES reading_sessions(id) ON DELETE CASCADE,
+    last_billed_at TIMESTAMP NOT NULL,
+    total_billed DECIMAL(10,2) NOT NULL DEFAULT 0.00
+);
+
+-- Balance reserved for per-minute sessions, settled once when the session ends
+CREATE TABLE IF NOT EXISTS balance_holds (
+    session_id TEXT PRIMARY KEY REFERENCES reading_sessions(id) ON DELETE CASCADE,
+    client_id TEXT REFERENCES clients(id) ON DELETE CASCADE,
+    amount_held DECIMAL(10,2) NOT NULL DEFAULT 0.00,
+    amount_settled DECIMAL(10,2),
+    status VARCHAR(20) DEFAULT 'open', -- open, settled
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Append-only double-entry ledger: every transfer is a set of legs summing to zero
+CREATE TABLE IF NOT EXISTS ledger_entries (
+    id BIGSERIAL PRIMARY KEY,
+    transfer_id TEXT NOT NULL,
+    account TEXT NOT NULL, -- client:<id>, reader:<id>, platform:revenue, external:stripe
+    amount DECIMAL(12,2) NOT NULL, -- positive = credit, negative = debit
+    entry_type VARCHAR(30) NOT NULL, -- top_up, session_charge
+    reference_id TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE (transfer_id, account)
+);
+CREATE INDEX IF NOT EXISTS idx_ledger_entries_account_id ON ledger_entries(account, id);
+
+-- Per-account balance as of last_entry_id, maintained by the snapshot job only
+CREATE TABLE IF NOT EXISTS ledger_snapshots (
+    account TEXT PRIMARY KEY,
+    balance DECIMAL(12,2) NOT NULL,
+    last_entry_id BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
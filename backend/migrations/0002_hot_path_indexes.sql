@@ -0,0 +1,34 @@
+-- migrate:no-transaction
+-- Indexes for the columns the hot request paths filter and sort on. Built
+-- concurrently so they can ship without blocking writes; each CREATE is
+-- preceded by a DROP so a retry rebuilds an index left INVALID by a failure.
+
+-- Client bookings: WHERE client_id = $1 ORDER BY created_at DESC
+DROP INDEX CONCURRENTLY IF EXISTS idx_reading_sessions_client_created;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reading_sessions_client_created ON reading_sessions(client_id, created_at);
+
+-- Reader session queue: WHERE reader_id = $1 AND status IN (...) ORDER BY created_at
+DROP INDEX CONCURRENTLY IF EXISTS idx_reading_sessions_reader_status_created;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reading_sessions_reader_status_created ON reading_sessions(reader_id, status, created_at);
+
+-- Billing recovery and resync: the (few) active per-minute sessions
+DROP INDEX CONCURRENTLY IF EXISTS idx_reading_sessions_active_per_minute;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reading_sessions_active_per_minute ON reading_sessions(id) WHERE status = 'active' AND billing_type = 'per_minute';
+
+-- user id -> profile lookups (identity map misses, profile endpoints, signin)
+DROP INDEX CONCURRENTLY IF EXISTS idx_readers_user_id;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_readers_user_id ON readers(user_id);
+DROP INDEX CONCURRENTLY IF EXISTS idx_clients_user_id;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clients_user_id ON clients(user_id);
+
+-- Available readers: WHERE availability_status = 'online' ORDER BY updated_at DESC
+DROP INDEX CONCURRENTLY IF EXISTS idx_readers_availability_updated;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_readers_availability_updated ON readers(availability_status, updated_at);
+
+-- Recent earnings: WHERE reader_id = $1 ORDER BY created_at DESC LIMIT 10
+DROP INDEX CONCURRENTLY IF EXISTS idx_reader_earnings_reader_created;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reader_earnings_reader_created ON reader_earnings(reader_id, created_at);
+
+-- Message inbox: WHERE recipient_id = $1 ORDER BY created_at DESC
+DROP INDEX CONCURRENTLY IF EXISTS idx_messages_recipient_created;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_recipient_created ON messages(recipient_id, created_at);
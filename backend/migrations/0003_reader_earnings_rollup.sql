@@ -0,0 +1,102 @@
+-- Per-reader earnings totals, so the earnings summary is one primary-key
+-- lookup instead of SUMs over the reader's whole history. Kept current by
+-- statement-level triggers in the same transaction as every insert, payout
+-- status update or delete on reader_earnings, including manual payout updates.
+
+CREATE TABLE IF NOT EXISTS reader_earnings_rollup (
+    reader_id TEXT PRIMARY KEY REFERENCES readers(id) ON DELETE CASCADE,
+    pending_total DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    paid_total DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    lifetime_total DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION reader_earnings_rollup_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO reader_earnings_rollup AS r (reader_id, pending_total, paid_total, lifetime_total)
+        SELECT reader_id,
+               COALESCE(SUM(amount_earned) FILTER (WHERE payout_status = 'pending'), 0.00),
+               COALESCE(SUM(amount_earned) FILTER (WHERE payout_status = 'paid'), 0.00),
+               SUM(amount_earned)
+        FROM inserted_rows
+        WHERE reader_id IS NOT NULL
+        GROUP BY reader_id
+        ON CONFLICT (reader_id) DO UPDATE
+        SET pending_total = r.pending_total + EXCLUDED.pending_total,
+            paid_total = r.paid_total + EXCLUDED.paid_total,
+            lifetime_total = r.lifetime_total + EXCLUDED.lifetime_total,
+            updated_at = NOW();
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO reader_earnings_rollup AS r (reader_id, pending_total, paid_total, lifetime_total)
+        SELECT reader_id,
+               COALESCE(SUM(amount_earned) FILTER (WHERE payout_status = 'pending'), 0.00),
+               COALESCE(SUM(amount_earned) FILTER (WHERE payout_status = 'paid'), 0.00),
+               SUM(amount_earned)
+        FROM (
+            SELECT reader_id, amount_earned, payout_status FROM updated_rows
+            UNION ALL
+            SELECT reader_id, -amount_earned, payout_status FROM previous_rows
+        ) AS delta
+        WHERE reader_id IS NOT NULL
+        GROUP BY reader_id
+        ON CONFLICT (reader_id) DO UPDATE
+        SET pending_total = r.pending_total + EXCLUDED.pending_total,
+            paid_total = r.paid_total + EXCLUDED.paid_total,
+            lifetime_total = r.lifetime_total + EXCLUDED.lifetime_total,
+            updated_at = NOW();
+    ELSE
+        -- Only adjust existing rows: when a reader is deleted, the cascade
+        -- removes the rollup row and the reader row must not be re-referenced
+        UPDATE reader_earnings_rollup AS r
+        SET pending_total = r.pending_total - d.pending,
+            paid_total = r.paid_total - d.paid,
+            lifetime_total = r.lifetime_total - d.lifetime,
+            updated_at = NOW()
+        FROM (
+            SELECT reader_id,
+                   COALESCE(SUM(amount_earned) FILTER (WHERE payout_status = 'pending'), 0.00) AS pending,
+                   COALESCE(SUM(amount_earned) FILTER (WHERE payout_status = 'paid'), 0.00) AS paid,
+                   SUM(amount_earned) AS lifetime
+            FROM deleted_rows
+            GROUP BY reader_id
+        ) AS d
+        WHERE r.reader_id = d.reader_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reader_earnings_rollup_insert ON reader_earnings;
+CREATE TRIGGER reader_earnings_rollup_insert
+    AFTER INSERT ON reader_earnings
+    REFERENCING NEW TABLE AS inserted_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION reader_earnings_rollup_apply();
+
+DROP TRIGGER IF EXISTS reader_earnings_rollup_update ON reader_earnings;
+CREATE TRIGGER reader_earnings_rollup_update
+    AFTER UPDATE ON reader_earnings
+    REFERENCING OLD TABLE AS previous_rows NEW TABLE AS updated_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION reader_earnings_rollup_apply();
+
+DROP TRIGGER IF EXISTS reader_earnings_rollup_delete ON reader_earnings;
+CREATE TRIGGER reader_earnings_rollup_delete
+    AFTER DELETE ON reader_earnings
+    REFERENCING OLD TABLE AS deleted_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION reader_earnings_rollup_apply();
+
+-- Backfill. The triggers above already hold a lock that blocks writes to
+-- reader_earnings until this migration commits, so nothing is missed.
+INSERT INTO reader_earnings_rollup (reader_id, pending_total, paid_total, lifetime_total)
+SELECT re.reader_id,
+       COALESCE(SUM(re.amount_earned) FILTER (WHERE re.payout_status = 'pending'), 0.00),
+       COALESCE(SUM(re.amount_earned) FILTER (WHERE re.payout_status = 'paid'), 0.00),
+       SUM(re.amount_earned)
+FROM reader_earnings re
+JOIN readers r ON r.id = re.reader_id
+GROUP BY re.reader_id
+ON CONFLICT (reader_id) DO UPDATE
+SET pending_total = EXCLUDED.pending_total,
+    paid_total = EXCLUDED.paid_total,
+    lifetime_total = EXCLUDED.lifetime_total,
+    updated_at = NOW();
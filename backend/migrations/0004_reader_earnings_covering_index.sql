@@ -0,0 +1,12 @@
+-- migrate:no-transaction
+-- Recent earnings (WHERE reader_id = $1 ORDER BY created_at DESC LIMIT 10)
+-- read entirely from the index. Replaces the plain (reader_id, created_at)
+-- index and the now-redundant reader_id index.
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_reader_earnings_recent;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reader_earnings_recent
+    ON reader_earnings(reader_id, created_at DESC)
+    INCLUDE (session_id, total_session_amount, amount_earned, payout_status);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_reader_earnings_reader_created;
+DROP INDEX CONCURRENTLY IF EXISTS idx_reader_earnings_reader_id;
@@ -0,0 +1,9 @@
+-- migrate:no-transaction
+-- Client bookings are paged by (created_at, id) keyset; include id so the
+-- cursor comparison is an index condition. Replaces (client_id, created_at).
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_reading_sessions_client_created_id;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reading_sessions_client_created_id
+    ON reading_sessions(client_id, created_at, id);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_reading_sessions_client_created;
@@ -0,0 +1,21 @@
+-- migrate:no-transaction
+-- Admin reader directory: pages ordered by (created_at, id), optionally
+-- filtered by application or availability status, and prefix search on the
+-- reader's email or name (lower(...) LIKE 'prefix%').
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_readers_created_id;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_readers_created_id ON readers(created_at, id);
+DROP INDEX CONCURRENTLY IF EXISTS idx_readers_application_created_id;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_readers_application_created_id ON readers(application_status, created_at, id);
+DROP INDEX CONCURRENTLY IF EXISTS idx_readers_availability_created_id;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_readers_availability_created_id ON readers(availability_status, created_at, id);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_users_email_prefix;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_email_prefix
+    ON users(lower(email) text_pattern_ops);
+DROP INDEX CONCURRENTLY IF EXISTS idx_users_first_name_prefix;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_first_name_prefix
+    ON users(lower(first_name) text_pattern_ops);
+DROP INDEX CONCURRENTLY IF EXISTS idx_users_last_name_prefix;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_last_name_prefix
+    ON users(lower(last_name) text_pattern_ops);
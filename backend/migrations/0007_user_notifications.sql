@@ -0,0 +1,19 @@
+-- Offline notification inbox: direct WebSocket notifications numbered per
+-- user, so a client that reconnects with ?since=<seq> is sent what it missed.
+-- The server prunes rows older than NOTIFICATION_RETENTION_DAYS; the per-user
+-- counter is kept so sequence numbers never go backwards.
+
+CREATE TABLE IF NOT EXISTS user_notification_sequences (
+    user_id VARCHAR PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    last_seq BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS user_notifications (
+    user_id VARCHAR NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    seq BIGINT NOT NULL,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, seq)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_notifications_created_at ON user_notifications (created_at);
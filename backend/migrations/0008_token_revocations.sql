@@ -0,0 +1,8 @@
+-- Per-user token cutoffs: access tokens issued before revoked_before are
+-- rejected. Every worker loads these at startup; rows older than the token
+-- lifetime are pruned on the next revocation.
+
+CREATE TABLE IF NOT EXISTS token_revocations (
+    user_id VARCHAR PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    revoked_before TIMESTAMP NOT NULL
+);
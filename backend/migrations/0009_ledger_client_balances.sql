@@ -0,0 +1,39 @@
+-- Client balances live on the ledger: client:<id> is the spendable balance
+-- and hold:<id> the part reserved for running per-minute sessions. Money
+-- paths only append entries; a balance is read as its snapshot plus the
+-- entries appended since (ledger_balance). clients.balance is dropped so
+-- nothing can read or update it any more.
+
+CREATE OR REPLACE FUNCTION ledger_balance(p_account TEXT) RETURNS DECIMAL AS $$
+    SELECT COALESCE(s.balance, 0.00) + COALESCE((
+               SELECT SUM(e.amount) FROM ledger_entries e
+               WHERE e.account = p_account AND e.id > COALESCE(s.last_entry_id, 0)
+           ), 0.00)
+    FROM (SELECT 1) AS one
+    LEFT JOIN ledger_snapshots s ON s.account = p_account
+$$ LANGUAGE sql STABLE;
+
+-- Open the client accounts at balance + open holds, net of the top-ups and
+-- charges the ledger already has for them...
+INSERT INTO ledger_entries (transfer_id, account, amount, entry_type, reference_id)
+SELECT 'opening_balance:' || o.id, leg.account, leg.amount, 'opening_balance', o.id
+FROM (
+    SELECT c.id, COALESCE(c.balance, 0.00) + COALESCE(h.held, 0.00) - ledger_balance('client:' || c.id) AS amount
+    FROM clients c
+    LEFT JOIN (
+        SELECT client_id, SUM(amount_held) AS held FROM balance_holds WHERE status = 'open' GROUP BY client_id
+    ) h ON h.client_id = c.id
+) o
+CROSS JOIN LATERAL (VALUES ('client:' || o.id, o.amount), ('equity:opening_balances', -o.amount)) AS leg(account, amount)
+WHERE o.amount <> 0
+ON CONFLICT (transfer_id, account) DO NOTHING;
+
+-- ...then move the open holds into the clients' hold accounts
+INSERT INTO ledger_entries (transfer_id, account, amount, entry_type, reference_id)
+SELECT 'hold:' || h.session_id || ':' || h.amount_held, leg.account, leg.amount, 'hold', h.session_id
+FROM balance_holds h
+CROSS JOIN LATERAL (VALUES ('client:' || h.client_id, -h.amount_held), ('hold:' || h.client_id, h.amount_held)) AS leg(account, amount)
+WHERE h.status = 'open' AND h.amount_held > 0
+ON CONFLICT (transfer_id, account) DO NOTHING;
+
+ALTER TABLE clients DROP COLUMN IF EXISTS balance;
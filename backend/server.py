@@ -3,13 +3,22 @@ import asyncpg
 import stripe
 import json
 import asyncio
+import base64
+import hashlib
+import math
+import re
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from typing import Optional, Dict, Any, List, Set
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect, BackgroundTasks, Query
+from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect, BackgroundTasks, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, TypeAdapter
 from dotenv import load_dotenv
 import jwt
 import requests
@@ -19,12 +28,57 @@ import websockets
 import uuid
 import logging
 
+try:
+    import orjson
+except ImportError: # Optional speed-up; the standard json module is used without it
+    orjson = None
+
 load_dotenv()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class RunningStat:
+    """Running count / average / max of an observed value (used for metrics)."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 3) if self.count else 0.0,
+            "max": round(self.max, 3),
+            "last": round(self.last, 3),
+        }
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+if orjson is not None:
+    def dumps_json(value) -> str:
+        return orjson.dumps(value, default=_json_default).decode()
+    loads_json = orjson.loads
+else:
+    def dumps_json(value) -> str:
+        return json.dumps(value, default=_json_default)
+    loads_json = json.loads
+
 # Environment variables
 DATABASE_URL = os.getenv("DATABASE_URL")
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY") # New
@@ -37,12 +91,105 @@ stripe.api_key = STRIPE_SECRET_KEY
 # Database connection pool
 db_pool = None
 
-# WebSocket connections for real-time features
-websocket_connections: Dict[str, WebSocket] = {}
-
 # Session billing tracking
 active_sessions: Dict[str, dict] = {}
 
+# Billing scheduler settings: sessions are charged every BILLING_INTERVAL_SECONDS,
+# the scheduler wakes up every BILLING_TICK_SECONDS to settle whatever is due.
+BILLING_INTERVAL_SECONDS = int(os.getenv("BILLING_INTERVAL_SECONDS", "60"))
+BILLING_TICK_SECONDS = float(os.getenv("BILLING_TICK_SECONDS", "1.0"))
+# Only one worker bills at a time (Postgres advisory lock). The leader
+# re-reads active sessions every BILLING_RESYNC_SECONDS to pick up sessions
+# accepted or ended on other workers.
+BILLING_LEADER_LOCK_KEY = int(os.getenv("BILLING_LEADER_LOCK_KEY", "72010001"))
+BILLING_RESYNC_SECONDS = float(os.getenv("BILLING_RESYNC_SECONDS", "10"))
+# Prepaid holds: accepting a per-minute session reserves BILLING_HOLD_MINUTES
+# of balance; the hold is topped up by the same amount once fewer than
+# BILLING_HOLD_REFILL_MINUTES remain.
+BILLING_HOLD_MINUTES = int(os.getenv("BILLING_HOLD_MINUTES", "10"))
+BILLING_HOLD_REFILL_MINUTES = int(os.getenv("BILLING_HOLD_REFILL_MINUTES", "2"))
+
+# Ledger snapshots: entries older than LEDGER_SNAPSHOT_LAG_SECONDS are rolled up
+# into per-account balances every LEDGER_SNAPSHOT_SECONDS.
+LEDGER_SNAPSHOT_SECONDS = float(os.getenv("LEDGER_SNAPSHOT_SECONDS", "300"))
+LEDGER_SNAPSHOT_LAG_SECONDS = int(os.getenv("LEDGER_SNAPSHOT_LAG_SECONDS", "60"))
+LEDGER_SNAPSHOT_LOCK_KEY = int(os.getenv("LEDGER_SNAPSHOT_LOCK_KEY", "72010002"))
+
+# Schema migrations: apply pending ones at startup, or refuse to start and
+# leave them to `python migrate.py` when MIGRATE_ON_STARTUP is false
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+MIGRATION_LOCK_KEY = int(os.getenv("MIGRATION_LOCK_KEY", "72010003"))
+
+# Optional read replica for read-only endpoints. It is skipped while its lag exceeds
+# REPLICA_MAX_LAG_SECONDS, and for that long after a user's own writes.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "1"))
+
+# Size of asyncpg's per-connection implicit statement cache (0 disables it,
+# e.g. behind a transaction-pooling PgBouncer)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+# NUMERIC (money) columns: "decimal" decodes to Decimal and encodes Decimal, int,
+# float or str through str(), so 1.99 is stored as 1.99 rather than its binary
+# expansion; "native" keeps asyncpg's built-in binary codec
+DB_NUMERIC_CODEC = os.getenv("DB_NUMERIC_CODEC", "decimal")
+
+# Authenticated-user cache used by get_current_user
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+
+# user id <-> client/reader id mappings kept in memory (per profile kind)
+IDENTITY_MAP_MAX_SIZE = int(os.getenv("IDENTITY_MAP_MAX_SIZE", "50000"))
+
+# In-memory available-readers listing: full re-read interval, a safety net for
+# changes made outside this process
+READER_DIRECTORY_RESYNC_SECONDS = float(os.getenv("READER_DIRECTORY_RESYNC_SECONDS", "30"))
+
+# WebSocket events are published once through Postgres LISTEN/NOTIFY on
+# EVENT_BUS_CHANNEL and delivered by the worker holding the recipient's socket.
+# The listener connection is pinged every EVENT_BUS_HEALTH_CHECK_SECONDS and
+# reconnects with backoff up to EVENT_BUS_RECONNECT_MAX_SECONDS.
+EVENT_BUS_CHANNEL = os.getenv("EVENT_BUS_CHANNEL", "soulseer_events")
+EVENT_BUS_HEALTH_CHECK_SECONDS = float(os.getenv("EVENT_BUS_HEALTH_CHECK_SECONDS", "10"))
+EVENT_BUS_RECONNECT_MAX_SECONDS = float(os.getenv("EVENT_BUS_RECONNECT_MAX_SECONDS", "30"))
+
+# Notification WebSockets each get an outbound queue drained by their own
+# writer task. A client whose queue stays above WS_SEND_QUEUE_HIGH_WATER
+# messages for WS_SLOW_CONSUMER_SECONDS, or reaches WS_SEND_QUEUE_MAX, is
+# disconnected (close code 1013) so it cannot hold memory or delay others.
+WS_SEND_QUEUE_HIGH_WATER = int(os.getenv("WS_SEND_QUEUE_HIGH_WATER", "256"))
+WS_SEND_QUEUE_MAX = int(os.getenv("WS_SEND_QUEUE_MAX", "1024"))
+WS_SLOW_CONSUMER_SECONDS = float(os.getenv("WS_SLOW_CONSUMER_SECONDS", "5"))
+# Topic subscriptions on the notification WebSocket: at most WS_MAX_SUBSCRIPTIONS
+# per connection; changes to the same entity within WS_COALESCE_SECONDS are
+# merged into one message.
+WS_MAX_SUBSCRIPTIONS = int(os.getenv("WS_MAX_SUBSCRIPTIONS", "100"))
+WS_COALESCE_SECONDS = float(os.getenv("WS_COALESCE_SECONDS", "0.1"))
+
+# Offline notification inbox: direct notifications are numbered per user and
+# kept for NOTIFICATION_RETENTION_DAYS (pruned every NOTIFICATION_PRUNE_SECONDS).
+# Each worker keeps the last NOTIFICATION_RING_SIZE of up to
+# NOTIFICATION_RING_USERS users in memory. A client reconnecting with
+# ?since=<seq> gets up to NOTIFICATION_REPLAY_MAX missed ones in one message.
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "7"))
+NOTIFICATION_PRUNE_SECONDS = float(os.getenv("NOTIFICATION_PRUNE_SECONDS", "3600"))
+NOTIFICATION_RING_SIZE = int(os.getenv("NOTIFICATION_RING_SIZE", "64"))
+NOTIFICATION_RING_USERS = int(os.getenv("NOTIFICATION_RING_USERS", "10000"))
+NOTIFICATION_REPLAY_MAX = int(os.getenv("NOTIFICATION_REPLAY_MAX", "200"))
+# Connections of the inbox's own pool (see NotificationInbox).
+NOTIFICATION_POOL_SIZE = int(os.getenv("NOTIFICATION_POOL_SIZE", "4"))
+
+# Keyset-paginated list endpoints: default page size and the cap on ?limit=
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+# Admin bulk exports: COPY chunks buffered between the database and a slow client
+EXPORT_BUFFER_CHUNKS = int(os.getenv("EXPORT_BUFFER_CHUNKS", "64"))
+
+# Rows fetched per round trip by server-side cursors behind ?stream=true responses
+STREAM_CURSOR_PREFETCH = int(os.getenv("STREAM_CURSOR_PREFETCH", "500"))
+
 # WebRTC Signaling Server Classes
 class RTCRoom:
     def __init__(self, room_id: str):
@@ -72,7 +219,7 @@ class RTCRoom:
         for client_id, websocket in self.clients.items():
             if client_id != sender_id:
                 try:
-                    await websocket.send_text(json.dumps(message))
+                    await websocket.send_text(dumps_json(message))
                 except:
                     # Remove disconnected clients
                     asyncio.create_task(self.remove_client(client_id))
@@ -80,7 +227,7 @@ class RTCRoom:
     async def send_to_user(self, target_id: str, message: dict):
         if target_id in self.clients:
             try:
-                await self.clients[target_id].send_text(json.dumps(message))
+                await self.clients[target_id].send_text(dumps_json(message))
                 return True
             except:
                 asyncio.create_task(self.remove_client(target_id))
@@ -199,6 +346,10 @@ signaling_server = WebRTCSignalingServer()
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "fallback-secret-key-for-dev-only") # Ensure this is set in .env for production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7 # 1 week (adjust as needed)
+# Version 2 tokens carry role, client_id and reader_id claims. Older tokens are
+# resolved from the DB until ACCESS_TOKEN_MIN_VERSION is raised to reject them.
+ACCESS_TOKEN_CLAIMS_VERSION = 2
+ACCESS_TOKEN_MIN_VERSION = int(os.getenv("ACCESS_TOKEN_MIN_VERSION", "1"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -208,43 +359,94 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# bcrypt is deliberately slow (100-300ms per call), so it runs on a bounded
+# executor instead of the event loop. Requests beyond workers + queue get a 429.
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread") # thread or process
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+def _timed_call(func, *args):
+    """Run func in the executor, reporting when it actually started and finished."""
+    started = time.monotonic()
+    result = func(*args)
+    return started, time.monotonic(), result
+
+class PasswordHasher:
+    """Bounded executor for password hashing with queue-depth admission control."""
+
+    def __init__(self, kind: str = PASSWORD_HASH_EXECUTOR, workers: int = PASSWORD_HASH_WORKERS,
+                 max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.kind = kind
+        self.workers = workers
+        self.max_in_flight = workers + max_queue
+        self.in_flight = 0
+        self.rejected = 0
+        self.hash_latency_ms = RunningStat()
+        self.queue_wait_ms = RunningStat()
+        self._executor = None
+
+    def _get_executor(self):
+        # Created lazily so importing the module does not spawn workers
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def run(self, func, *args):
+        if self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many authentication requests, please retry shortly.",
+                headers={"Retry-After": "1"}
+            )
+        self.in_flight += 1
+        submitted = time.monotonic()
+        try:
+            started, finished, result = await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), _timed_call, func, *args
+            )
+        finally:
+            self.in_flight -= 1
+        self.queue_wait_ms.observe((started - submitted) * 1000)
+        self.hash_latency_ms.observe((finished - started) * 1000)
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def metrics(self) -> dict:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "hash_latency_ms": self.hash_latency_ms.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+        }
+
+password_hasher = PasswordHasher()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": time.time(), "tv": ACCESS_TOKEN_CLAIMS_VERSION})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(security)) -> User:
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except jwt.PyJWTError:
-        raise credentials_exception
-
-    user = await get_user_by_id(user_id) # This uses the existing helper
-    if user is None:
-        raise credentials_exception
-    # Ensure get_user_by_id returns a Pydantic User model or convert it
-    # For now, assuming get_user_by_id returns a dict that can be parsed into User model
-    # If get_user_by_id returns a dict:
-    try:
-        user_model = User(**user)
-        return user_model
-    except Exception: # Handle potential Pydantic validation error
-        raise credentials_exception
-
-
 # WebRTC Configuration for TURN servers
 def get_rtc_configuration():
     turn_servers = os.getenv("TURN_SERVERS", "relay1.expressturn.com:3480")
@@ -443,176 +645,436 @@ class ForumReplyRequest(BaseModel):
     post_id: str
     content: str
 
-# Database initialization
-async def init_db():
-    global db_pool
-    db_pool = await asyncpg.create_pool(DATABASE_URL)
-    
-    # Create tables if they don't exist
-    async with db_pool.acquire() as conn:
-        # Users table
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id VARCHAR PRIMARY KEY,
-                email VARCHAR UNIQUE NOT NULL,
-                hashed_password TEXT NOT NULL,
-                first_name VARCHAR,
-                last_name VARCHAR,
-                role VARCHAR DEFAULT 'client',
-                created_at TIMESTAMP DEFAULT NOW(),
-                updated_at TIMESTAMP DEFAULT NOW()
-            )
-        ''')
-        
-        # Readers table
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS readers (
-                id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
-                user_id VARCHAR REFERENCES users(id) ON DELETE CASCADE,
-                bio TEXT,
-                specialties JSONB DEFAULT '[]',
-                is_online BOOLEAN DEFAULT FALSE,
-                chat_rate_per_minute DECIMAL(10,2) DEFAULT 0.00,
-                phone_rate_per_minute DECIMAL(10,2) DEFAULT 0.00,
-                video_rate_per_minute DECIMAL(10,2) DEFAULT 0.00,
-                availability_status VARCHAR DEFAULT 'offline',
-                application_status VARCHAR(20) DEFAULT 'pending_approval', -- pending_approval, active, suspended
-                created_at TIMESTAMP DEFAULT NOW(),
-                updated_at TIMESTAMP DEFAULT NOW()
-            )
-        ''')
-        
-        # Clients table
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS clients (
-                id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
-                user_id VARCHAR REFERENCES users(id) ON DELETE CASCADE,
-                balance DECIMAL(10,2) DEFAULT 0.00,
-                created_at TIMESTAMP DEFAULT NOW(),
-                updated_at TIMESTAMP DEFAULT NOW()
-            )
-        ''')
-        
-        # Reading sessions table
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS reading_sessions (
-                id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
-                client_id VARCHAR REFERENCES clients(id),
-                reader_id VARCHAR REFERENCES readers(id),
-                session_type VARCHAR NOT NULL,
-                billing_type VARCHAR DEFAULT 'per_minute', -- per_minute, fixed_duration
-                status VARCHAR DEFAULT 'pending',
-                rate_per_minute DECIMAL(10,2),
-                fixed_price DECIMAL(10,2),
-                duration_minutes INTEGER,
-                scheduled_time TIMESTAMP,
-                start_time TIMESTAMP,
-                end_time TIMESTAMP,
-                billing_duration_seconds INTEGER, -- For precise billing
-                total_minutes DECIMAL(10,2) DEFAULT 0.00, -- Kept for now, or can be calculated from seconds
-                total_amount DECIMAL(10,2) DEFAULT 0.00,
-                room_id VARCHAR UNIQUE,
-                created_at TIMESTAMP DEFAULT NOW(),
-                updated_at TIMESTAMP DEFAULT NOW()
-            )
-        ''')
-        
-        # Messages table for premium messaging
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
-                sender_id VARCHAR REFERENCES users(id),
-                recipient_id VARCHAR REFERENCES users(id),
-                message_text TEXT NOT NULL,
-                is_paid BOOLEAN DEFAULT FALSE,
-                price DECIMAL(10,2) DEFAULT 0.00,
-                paid_at TIMESTAMP,
-                created_at TIMESTAMP DEFAULT NOW(),
-                updated_at TIMESTAMP DEFAULT NOW()
-            )
-        ''')
-        
-        # Live streams table
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS live_streams (
-                id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
-                reader_id VARCHAR REFERENCES readers(id),
-                title VARCHAR NOT NULL,
-                description TEXT,
-                status VARCHAR DEFAULT 'scheduled', -- scheduled, live, ended
-                start_time TIMESTAMP,
-                end_time TIMESTAMP,
-                viewer_count INTEGER DEFAULT 0,
-                total_gifts DECIMAL(10,2) DEFAULT 0.00,
-                stream_key VARCHAR UNIQUE,
-                created_at TIMESTAMP DEFAULT NOW(),
-                updated_at TIMESTAMP DEFAULT NOW()
-            )
-        ''')
-        
-        # Virtual gifts table
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS virtual_gifts (
-                id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
-                stream_id VARCHAR REFERENCES live_streams(id),
-                sender_id VARCHAR REFERENCES users(id),
-                gift_type VARCHAR NOT NULL,
-                gift_value DECIMAL(10,2) NOT NULL,
-                message TEXT,
-                created_at TIMESTAMP DEFAULT NOW()
-            )
-        ''')
-        
-        # Forum posts table
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS forum_posts (
-                id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
-                user_id VARCHAR REFERENCES users(id),
-                title VARCHAR NOT NULL,
-                content TEXT NOT NULL,
-                category VARCHAR DEFAULT 'general',
-                reply_count INTEGER DEFAULT 0,
-                last_reply_at TIMESTAMP,
-                is_pinned BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT NOW(),
-                updated_at TIMESTAMP DEFAULT NOW()
-            )
-        ''')
-        
-        # Forum replies table
+# Schema migrations
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_(\w+)\.sql$")
+# First line of a migration that must run outside a transaction (CREATE INDEX CONCURRENTLY)
+NO_TRANSACTION_DIRECTIVE = "-- migrate:no-transaction"
+
+class Migration:
+    """One file in MIGRATIONS_DIR, named <version>_<name>.sql.
+
+    Migrations normally run in a transaction together with their schema_version
+    row. Files starting with NO_TRANSACTION_DIRECTIVE run statement by statement
+    outside a transaction instead, so a failure part-way leaves the earlier
+    statements applied: write them to be re-runnable (IF NOT EXISTS, and a
+    DROP INDEX CONCURRENTLY IF EXISTS before each CREATE INDEX CONCURRENTLY so
+    an INVALID index from a failed build is rebuilt).
+    """
+
+    def __init__(self, version: int, name: str, sql: str):
+        self.version = version
+        self.name = name
+        self.sql = sql
+        self.in_transaction = not sql.lstrip().startswith(NO_TRANSACTION_DIRECTIVE)
+
+    @property
+    def label(self) -> str:
+        return f"{self.version:04d}_{self.name}"
+
+    def statements(self) -> List[str]:
+        # Statements end with a semicolon at the end of a line
+        chunks = re.split(r";[ \t]*$", self.sql, flags=re.MULTILINE)
+        statements = []
+        for chunk in chunks:
+            code = "\n".join(line for line in chunk.splitlines() if not line.strip().startswith("--")).strip()
+            if code:
+                statements.append(code)
+        return statements
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE_PATTERN.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            migrations.append(Migration(int(match.group(1)), match.group(2), f.read()))
+    migrations.sort(key=lambda m: m.version)
+    for previous, migration in zip(migrations, migrations[1:]):
+        if previous.version == migration.version:
+            raise ValueError(f"Duplicate migration version {migration.version}: {previous.name}, {migration.name}")
+    return migrations
+
+async def get_schema_version(conn) -> int:
+    """Highest applied migration version (0 for a database that has none)."""
+    try:
+        return await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    except asyncpg.exceptions.UndefinedTableError:
+        return 0
+
+async def apply_migrations(conn, migrations: Optional[List[Migration]] = None) -> List[int]:
+    """Apply pending migrations in order and return the versions applied.
+
+    Holds a session advisory lock so that concurrently starting workers (or the
+    CLI) apply each migration exactly once. The lock is polled rather than
+    waited on: a backend blocked in pg_advisory_lock() is inside a transaction,
+    which CREATE INDEX CONCURRENTLY in the lock holder would wait for forever.
+    """
+    if migrations is None:
+        migrations = load_migrations()
+    while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", MIGRATION_LOCK_KEY):
+        logger.info("Waiting for another process to finish migrating")
+        await asyncio.sleep(1)
+    try:
         await conn.execute('''
-            CREATE TABLE IF NOT EXISTS forum_replies (
-                id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()::text,
-                post_id VARCHAR REFERENCES forum_posts(id) ON DELETE CASCADE,
-                user_id VARCHAR REFERENCES users(id),
-                content TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT NOW(),
-                updated_at TIMESTAMP DEFAULT NOW()
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT NOW()
             )
         ''')
+        current = await get_schema_version(conn)
+        applied = []
+        for migration in migrations:
+            if migration.version <= current:
+                continue
+            logger.info(f"Applying migration {migration.label}")
+            started = time.monotonic()
+            if migration.in_transaction:
+                async with conn.transaction():
+                    await conn.execute(migration.sql)
+                    await conn.execute(
+                        "INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                        migration.version, migration.name
+                    )
+            else:
+                for statement in migration.statements():
+                    await conn.execute(statement)
+                await conn.execute(
+                    "INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                    migration.version, migration.name
+                )
+            logger.info(f"Applied migration {migration.label} in {time.monotonic() - started:.2f}s")
+            applied.append(migration.version)
+        return applied
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_KEY)
+
+async def ensure_schema_current(conn):
+    """Startup check: a single query when the schema is already up to date."""
+    migrations = load_migrations()
+    latest = migrations[-1].version if migrations else 0
+    current = await get_schema_version(conn)
+    if current >= latest:
+        return
+    if not MIGRATE_ON_STARTUP:
+        raise RuntimeError(
+            f"Database schema is at version {current} but this build expects {latest}; run `python migrate.py`."
+        )
+    await apply_migrations(conn, migrations)
 
-        # Reader earnings table
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS reader_earnings (
-                id TEXT PRIMARY KEY DEFAULT gen_random_uuid()::text,
-                reader_id TEXT REFERENCES readers(id) ON DELETE CASCADE,
-                session_id TEXT REFERENCES reading_sessions(id) ON DELETE CASCADE,
-                total_session_amount DECIMAL(10,2) NOT NULL,
-                amount_earned DECIMAL(10,2) NOT NULL,
-                payout_status VARCHAR(20) DEFAULT 'pending', -- pending, processing, paid, failed
-                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-                updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+async def register_type_codecs(conn, numeric_codec: str = DB_NUMERIC_CODEC):
+    """JSON/JSONB to and from Python objects, and the NUMERIC codec chosen by DB_NUMERIC_CODEC."""
+    for pg_type in ("json", "jsonb"):
+        await conn.set_type_codec(pg_type, schema="pg_catalog", encoder=dumps_json, decoder=loads_json, format="text")
+    if numeric_codec == "decimal":
+        await conn.set_type_codec("numeric", schema="pg_catalog", encoder=str, decoder=Decimal, format="text")
+
+async def init_connection(conn):
+    """Pool init hook: type codecs first, so the prepared statements use them."""
+    await register_type_codecs(conn)
+    await statement_registry.prepare_connection(conn)
+
+# Database initialization
+async def init_db():
+    global db_pool
+    # Bring the schema up to date before the pool is created, because every
+    # pool connection prepares the registered statements when it opens.
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        await ensure_schema_current(conn)
+    finally:
+        await conn.close()
+
+    db_pool = await asyncpg.create_pool(
+        DATABASE_URL,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        init=init_connection,
+    )
+
+class ReplicaRouter:
+    """Routes read-only endpoints to a replica pool when it is safe to.
+
+    Reads go to the primary when no replica is configured, while the replica
+    is unreachable or lagging more than REPLICA_MAX_LAG_SECONDS, and for
+    REPLICA_MAX_LAG_SECONDS after the requesting user's last successful write
+    (see WriteTrackingMiddleware). The replica can be at most that far behind
+    while in use, so users always read their own writes.
+
+    Writes are announced to the other workers over the event bus, so the next
+    request may land on any worker. While this worker's listener is down, and
+    for the window after it reconnects, it cannot see other workers' writes
+    and reads from the primary. A write made on a worker whose own listener
+    is down is only known to that worker.
+    """
+
+    def __init__(self, dsn: Optional[str] = DATABASE_REPLICA_URL, max_lag_seconds: float = REPLICA_MAX_LAG_SECONDS,
+                 check_seconds: float = REPLICA_LAG_CHECK_SECONDS):
+        self.dsn = dsn
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self.pool = None
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self._last_write: "OrderedDict[str, float]" = OrderedDict() # user_id -> monotonic time, oldest first
+        self._writes_unknown_until = 0.0 # Other workers' writes may have been missed until then
+        self._task: Optional[asyncio.Task] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.recent_write_fallbacks = 0
+        self.lag_fallbacks = 0
+        self.event_bus_fallbacks = 0
+        self.lag_check_ms = RunningStat()
+
+    async def start(self):
+        if not self.dsn:
+            return
+        try:
+            self.pool = await asyncpg.create_pool(
+                self.dsn,
+                statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                init=init_connection,
             )
-        ''')
-        await conn.execute('''CREATE INDEX IF NOT EXISTS idx_reader_earnings_reader_id ON reader_earnings(reader_id);''')
-        await conn.execute('''CREATE INDEX IF NOT EXISTS idx_reader_earnings_session_id ON reader_earnings(session_id);''')
+            await self.check_lag()
+        except Exception as e:
+            # The primary can serve everything; keep retrying in the background
+            logger.error(f"Replica pool unavailable, reading from the primary: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_seconds)
+            try:
+                if self.pool is None:
+                    self.pool = await asyncpg.create_pool(
+                        self.dsn,
+                        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                        init=init_connection,
+                    )
+                await self.check_lag()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.healthy:
+                    logger.warning(f"Replica lag check failed, reading from the primary: {e}")
+                self.healthy = False
+                self.lag_seconds = None
+
+    async def check_lag(self):
+        started = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            # Replay timestamps go stale on an idle primary, so a replica that
+            # has replayed everything it received counts as current
+            self.lag_seconds = float(await conn.fetchval("""
+                SELECT CASE
+                    WHEN NOT pg_is_in_recovery() THEN 0
+                    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                    ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+                END
+            """))
+        self.lag_check_ms.observe((time.perf_counter() - started) * 1000)
+        was_healthy = self.healthy
+        self.healthy = self.lag_seconds <= self.max_lag_seconds
+        if was_healthy and not self.healthy:
+            logger.warning(f"Replica lag {self.lag_seconds:.1f}s exceeds {self.max_lag_seconds}s, reading from the primary")
+
+    def record_write(self, user_id: str):
+        now = time.monotonic()
+        self._last_write[user_id] = now
+        self._last_write.move_to_end(user_id)
+        # Forget writes older than the window (oldest are at the front)
+        horizon = now - self.max_lag_seconds
+        while self._last_write:
+            oldest_user_id, written_at = next(iter(self._last_write.items()))
+            if written_at >= horizon:
+                break
+            del self._last_write[oldest_user_id]
+
+    async def note_write(self, user_id: str):
+        """Record a write by user_id here and on every other worker."""
+        self.record_write(user_id)
+        if self.dsn:
+            await event_bus.publish("write", user_id=user_id)
+
+    def missed_writes(self):
+        """The event bus was down: other workers' writes in the window are unknown."""
+        self._writes_unknown_until = time.monotonic() + self.max_lag_seconds
+
+    def read_pool(self, user_id: Optional[str] = None):
+        if self.pool is None or not self.healthy:
+            if self.pool is not None:
+                self.lag_fallbacks += 1
+            self.primary_reads += 1
+            return db_pool
+        if not event_bus.listening or time.monotonic() < self._writes_unknown_until:
+            self.event_bus_fallbacks += 1
+            self.primary_reads += 1
+            return db_pool
+        written_at = self._last_write.get(user_id) if user_id else None
+        if written_at is not None and time.monotonic() - written_at < self.max_lag_seconds:
+            self.recent_write_fallbacks += 1
+            self.primary_reads += 1
+            return db_pool
+        self.replica_reads += 1
+        return self.pool
+
+    def metrics(self) -> dict:
+        def pool_metrics(pool):
+            if pool is None:
+                return None
+            return {"size": pool.get_size(), "idle": pool.get_idle_size(), "max_size": pool.get_max_size()}
+
+        return {
+            "replica_configured": bool(self.dsn),
+            "replica_healthy": self.healthy,
+            "replica_lag_seconds": self.lag_seconds,
+            "lag_check_ms": self.lag_check_ms.snapshot(),
+            "primary": {"reads": self.primary_reads, "pool": pool_metrics(db_pool)},
+            "replica": {"reads": self.replica_reads, "pool": pool_metrics(self.pool)},
+            "recent_write_fallbacks": self.recent_write_fallbacks,
+            "lag_fallbacks": self.lag_fallbacks,
+            "event_bus_fallbacks": self.event_bus_fallbacks,
+        }
+
+replica_router = ReplicaRouter()
+
+class ReaderDirectory:
+    """In-memory copy of the available-readers listing.
+
+    Loaded at startup, updated in place when a reader's status changes and
+    re-read every READER_DIRECTORY_RESYNC_SECONDS. The serialized body and its
+    ETag are rebuilt on each change, so serving the listing touches neither
+    Postgres nor the JSON encoder.
+    """
+
+    def __init__(self, resync_seconds: float = READER_DIRECTORY_RESYNC_SECONDS):
+        self.resync_seconds = resync_seconds
+        self.readers: Dict[str, dict] = {}
+        self.payload: Optional[bytes] = None
+        self.etag: Optional[str] = None
+        self.version = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.served = 0
+        self.not_modified = 0
+        self.rebuild_ms = RunningStat()
+
+    @property
+    def loaded(self) -> bool:
+        return self.payload is not None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.resync_seconds)
+            try:
+                async with db_pool.acquire() as conn:
+                    await self.load(conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Reader directory resync failed: {e}")
+
+    async def load(self, conn):
+        async with self._lock:
+            records = await statement_registry.fetch(conn, "available_readers")
+            self._replace({record["id"]: dict(record) for record in records})
+
+    async def refresh_reader(self, reader_id: str, conn):
+        """Re-read one reader after a committed write that may change its entry.
+
+        Refreshes are serialized and each reads the row after its own write was
+        committed, so the last one applied always reflects the newest state.
+        """
+        async with self._lock:
+            record = await statement_registry.fetchrow(conn, "available_reader", reader_id)
+            readers = dict(self.readers)
+            if record:
+                readers[reader_id] = dict(record)
+            else:
+                readers.pop(reader_id, None)
+            self._replace(readers)
+
+    def _replace(self, readers: Dict[str, dict]):
+        if self.loaded and readers == self.readers:
+            return
+        started = time.perf_counter()
+        listing = sorted(readers.values(), key=lambda reader: reader["updated_at"] or datetime.min, reverse=True)
+        payload = dumps_json(listing).encode()
+        self.readers = readers
+        self.payload = payload
+        self.etag = f'"{hashlib.blake2b(payload, digest_size=16).hexdigest()}"' # Same content, same ETag on every worker
+        self.version += 1
+        self.rebuild_ms.observe((time.perf_counter() - started) * 1000)
+
+    def response(self, if_none_match: Optional[str]) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache", "X-Directory-Version": str(self.version)}
+        if if_none_match and any(tag.strip().removeprefix("W/") in (self.etag, "*") for tag in if_none_match.split(",")):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        self.served += 1
+        return Response(content=self.payload, media_type="application/json", headers=headers)
+
+    def metrics(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "version": self.version,
+            "online_readers": len(self.readers),
+            "payload_bytes": len(self.payload) if self.payload else 0,
+            "served": self.served,
+            "not_modified": self.not_modified,
+            "rebuild_ms": self.rebuild_ms.snapshot(),
+        }
+
+reader_directory = ReaderDirectory()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await init_db()
+    async with db_pool.acquire() as conn:
+        await identity_map.warm_up(conn)
+        await reader_directory.load(conn)
+        await token_revocations.load(conn)
+    reader_directory.start()
+    await event_bus.start()
+    await replica_router.start()
+    await notification_inbox.start() # Before billing: recovery can end sessions and notify
+    await billing_scheduler.start() # Takes billing leadership and rebuilds the schedule
+    ledger_snapshot_job.start()
     yield
     # Shutdown
+    await event_bus.stop()
+    await ledger_snapshot_job.stop()
+    await billing_scheduler.stop()
+    await notification_inbox.stop()
+    password_hasher.shutdown()
+    await reader_directory.stop()
+    await replica_router.stop()
     if db_pool:
         await db_pool.close()
 
@@ -651,138 +1113,820 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"], # Or specify methods: ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
     allow_headers=["*"], # Or specify headers: ["Authorization", "Content-Type"]
+    expose_headers=["X-Next-Cursor", "X-Total-Estimate"],
 )
 
 # Security
-security = HTTPBearer()
+security = HTTPBearer(auto_error=False)
 
-# Database helper functions
-async def get_user_by_id(user_id: str) -> Optional[dict]:
-    async with db_pool.acquire() as conn:
-        result = await conn.fetchrow("SELECT * FROM users WHERE id = $1", user_id)
-        return dict(result) if result else None
+class UserCache:
+    """TTL + LRU cache of User models keyed by user id, with single-flight loading.
 
-async def get_client_id_from_user_id(user_id: str, conn) -> Optional[str]:
-    """Fetch client_id from user_id."""
-    return await conn.fetchval("SELECT id FROM clients WHERE user_id = $1", user_id)
+    Concurrent misses for the same id share one DB load. invalidate() must be
+    called wherever a user's row (or anything derived from it) changes.
+    """
 
-async def get_reader_id_from_user_id(user_id: str, conn) -> Optional[str]:
-    """Fetch reader_id from user_id."""
-    return await conn.fetchval("SELECT id FROM readers WHERE user_id = $1", user_id)
+    def __init__(self, loader, ttl_seconds: float = USER_CACHE_TTL_SECONDS, max_size: int = USER_CACHE_MAX_SIZE):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict() # user_id -> (expires_at, User)
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._generation: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    async def get(self, user_id: str) -> Optional[User]:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            del self._entries[user_id]
+
+        pending = self._loading.get(user_id)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._loading[user_id] = future
+        generation = self._generation.get(user_id, 0)
+        try:
+            user = await self.loader(user_id)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception() # Mark retrieved so waiterless failures are not logged
+            raise
+        else:
+            future.set_result(user)
+        finally:
+            self._loading.pop(user_id, None)
+            # Skip the store if the user was invalidated while the load was in flight
+            invalidated = self._generation.pop(user_id, 0) != generation
+
+        if user is not None and not invalidated:
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return user
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+        if user_id in self._loading:
+            self._generation[user_id] = self._generation.get(user_id, 0) + 1
+        else:
+            self._generation.pop(user_id, None)
 
-async def get_user_id_from_client_id(client_id: str, conn) -> Optional[str]:
-    """Fetch user_id from client_id."""
-    return await conn.fetchval("SELECT user_id FROM clients WHERE id = $1", client_id)
+    def clear(self):
+        self._entries.clear()
+        for user_id in self._loading:
+            self._generation[user_id] = self._generation.get(user_id, 0) + 1
 
-async def get_user_id_from_reader_id(reader_id: str, conn) -> Optional[str]:
-    """Fetch user_id from reader_id."""
-    return await conn.fetchval("SELECT user_id FROM readers WHERE id = $1", reader_id)
+    def metrics(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
 
-# API Routes
+async def load_user_model(user_id: str) -> Optional[User]:
+    user = await get_user_by_id(user_id)
+    if user is None:
+        return None
+    try:
+        return User(**user)
+    except Exception: # Handle potential Pydantic validation error
+        logger.exception(f"Stored user {user_id} does not match the User model")
+        return None
 
-# Auth Endpoints
-@app.post("/api/auth/signup", response_model=Token)
-async def signup(user_create: UserCreate):
-    async with db_pool.acquire() as conn:
-        # Check if user email already exists
-        existing_user = await conn.fetchrow("SELECT id FROM users WHERE email = $1", user_create.email)
-        if existing_user:
-            raise HTTPException(status_code=400, detail="Email already registered")
+user_cache = UserCache(load_user_model)
+
+class TokenRevocations:
+    """Per-user token cutoffs: tokens issued before the cutoff are rejected.
+
+    Checked in memory on every request. Cutoffs are stored in the
+    token_revocations table, loaded at startup and sent to the other workers
+    over the event bus, so a revocation outlives restarts and holds on every
+    worker.
+    """
 
-        hashed_password = get_password_hash(user_create.password)
-        user_id = str(uuid.uuid4())
-        role = "client" # Default role
+    def __init__(self):
+        self._not_before: Dict[str, float] = {}
+
+    def horizon(self) -> float:
+        # A cutoff older than the token lifetime cannot match an unexpired token
+        return time.time() - ACCESS_TOKEN_EXPIRE_MINUTES * 60
 
-        # Insert into users table
+    def apply(self, user_id: str, cutoff: float):
+        self._not_before[user_id] = max(cutoff, self._not_before.get(user_id, cutoff))
+        horizon = self.horizon()
+        for stale_user_id in [u for u, stale in self._not_before.items() if stale < horizon]:
+            del self._not_before[stale_user_id]
+
+    async def revoke_user(self, user_id: str, conn) -> float:
+        """Store a cutoff of now for user_id and apply it here. Returns the cutoff."""
+        now = time.time()
+        await conn.execute("""
+            INSERT INTO token_revocations (user_id, revoked_before) VALUES ($1, $2)
+            ON CONFLICT (user_id) DO UPDATE SET revoked_before = EXCLUDED.revoked_before
+        """, user_id, datetime.utcfromtimestamp(now))
         await conn.execute(
-            """INSERT INTO users (id, email, hashed_password, role)
-               VALUES ($1, $2, $3, $4)""",
-            user_id, user_create.email, hashed_password, role
+            "DELETE FROM token_revocations WHERE revoked_before < $1",
+            datetime.utcfromtimestamp(self.horizon())
         )
-        
-        # Insert into clients table
-        await conn.execute(
-            "INSERT INTO clients (user_id, balance) VALUES ($1, $2)",
-            user_id, 0.0
+        self.apply(user_id, now)
+        return now
+
+    async def load(self, conn):
+        """Replace the in-memory cutoffs with the unexpired ones in the database."""
+        rows = await conn.fetch(
+            "SELECT user_id, revoked_before FROM token_revocations WHERE revoked_before >= $1",
+            datetime.utcfromtimestamp(self.horizon())
         )
-        
-        access_token = create_access_token(data={"sub": user_id, "role": role})
-        return Token(access_token=access_token, token_type="bearer", role=role, user_id=user_id)
+        self._not_before = {
+            row["user_id"]: row["revoked_before"].replace(tzinfo=timezone.utc).timestamp() for row in rows
+        }
+        logger.info(f"Loaded {len(self._not_before)} token revocations")
 
-@app.post("/api/auth/signin", response_model=Token)
-async def signin(user_login: UserLogin):
-    async with db_pool.acquire() as conn:
-        user_record = await conn.fetchrow("SELECT * FROM users WHERE email = $1", user_login.email)
+    def is_revoked(self, user_id: str, issued_at: Optional[float]) -> bool:
+        cutoff = self._not_before.get(user_id)
+        return cutoff is not None and (issued_at is None or issued_at < cutoff)
 
-        if not user_record:
-            raise HTTPException(status_code=401, detail="Incorrect email or password")
+token_revocations = TokenRevocations()
 
-        if not verify_password(user_login.password, user_record["hashed_password"]):
-            raise HTTPException(status_code=401, detail="Incorrect email or password")
+class TokenIdentity(BaseModel):
+    user_id: str
+    role: Optional[str] = None
+    client_id: Optional[str] = None
+    reader_id: Optional[str] = None
+    claims_version: int = 1 # Tokens issued before claims were added have no "tv"
+    issued_at: Optional[float] = None
+
+def decode_access_token(token: str) -> TokenIdentity:
+    """Verify a JWT and return its identity claims. Raises jwt.PyJWTError if invalid or revoked."""
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    user_id = payload.get("sub")
+    if user_id is None:
+        raise jwt.InvalidTokenError("Token has no subject")
+    identity = TokenIdentity(
+        user_id=user_id,
+        role=payload.get("role"),
+        client_id=payload.get("client_id"),
+        reader_id=payload.get("reader_id"),
+        claims_version=payload.get("tv", 1),
+        issued_at=payload.get("iat"),
+    )
+    if identity.claims_version < ACCESS_TOKEN_MIN_VERSION:
+        raise jwt.InvalidTokenError("Token version is no longer accepted")
+    if token_revocations.is_revoked(identity.user_id, identity.issued_at):
+        raise jwt.InvalidTokenError("Token has been revoked")
+    return identity
+
+async def get_optional_token_identity(
+    request: Request,
+    token: Optional[HTTPAuthorizationCredentials] = Depends(security)
+) -> Optional[TokenIdentity]:
+    """Decoded token claims, or None for anonymous requests or invalid tokens.
+
+    FastAPI resolves this once per request however many dependencies use it.
+    """
+    if token is None:
+        return None
+    try:
+        identity = decode_access_token(token.credentials)
+    except jwt.PyJWTError:
+        return None
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        request.state.writer_id = identity.user_id # Recorded by WriteTrackingMiddleware on success
+    return identity
+
+async def get_token_identity(identity: Optional[TokenIdentity] = Depends(get_optional_token_identity)) -> TokenIdentity:
+    """Decoded token claims for the request (shared with get_current_user)."""
+    if identity is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return identity
 
-        access_token = create_access_token(data={"sub": user_record["id"], "role": user_record["role"]})
-        return Token(access_token=access_token, token_type="bearer", role=user_record["role"], user_id=user_record["id"])
+async def read_only_db(identity: Optional[TokenIdentity] = Depends(get_optional_token_identity)):
+    """Dependency for read-only endpoints: the pool their queries should use."""
+    return replica_router.read_pool(identity.user_id if identity else None)
 
-@app.get("/api/status")
-async def get_status():
-    return {"status": "ok", "service": "SoulSeer API"}
+class WriteTrackingMiddleware:
+    """Records an authenticated write for read-your-writes routing once it has succeeded.
 
-@app.get("/api/health")
-async def health_check():
-    try:
-        async with db_pool.acquire() as conn:
-            await conn.fetchval("SELECT 1")
-        return {"status": "healthy", "database": "connected"}
-    except Exception as e:
-        raise HTTPException(status_code=503, detail="Database connection failed")
+    The marker is set as the response starts, before the client can send its
+    next request. Rejected requests (status 400 and up) changed nothing, so
+    they neither publish an event nor send the user's reads to the primary.
+    """
 
-@app.get("/api/user/profile")
-async def get_user_profile(current_user: User = Depends(get_current_user)):
-    # The user object is already fetched and validated by get_current_user
-    # It's also already a Pydantic User model
-    return current_user
+    def __init__(self, app):
+        self.app = app
 
-@app.get("/api/client/profile", response_model=ClientProfile)
-async def get_client_profile(current_user: User = Depends(get_current_user)):
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_after_recording(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                writer_id = scope.get("state", {}).get("writer_id")
+                if writer_id is not None:
+                    await replica_router.note_write(writer_id)
+            await send(message)
+
+        await self.app(scope, receive, send_after_recording)
+
+app.add_middleware(WriteTrackingMiddleware)
+
+async def get_current_user(identity: TokenIdentity = Depends(get_token_identity)) -> User:
+    credentials_exception = HTTPException(
+        status_code=401,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    user = await user_cache.get(identity.user_id)
+    if user is None:
+        raise credentials_exception
+    return user
+
+
+# Prepared statements
+class StatementRegistry:
+    """Named hot statements with per-statement call counts and latency.
+
+    Statements run through asyncpg's per-connection statement cache, keyed by
+    the SQL text, so each one is parsed and planned once per connection. The
+    pool init hook prepares every statement without executing it: bad SQL
+    fails at startup, and the type introspection the statements need is done
+    before the first request on a fresh connection.
+    Run them with statement_registry.fetch/fetchrow/fetchval(conn, name, *args).
     """
-    Get client-specific profile information, including balance.
+
+    def __init__(self):
+        self.statements: Dict[str, str] = {}
+        self.latency_ms: Dict[str, RunningStat] = {}
+
+    def register(self, name: str, sql: str):
+        self.statements[name] = sql
+        self.latency_ms[name] = RunningStat()
+
+    async def prepare_connection(self, conn):
+        """Pool init hook."""
+        for sql in self.statements.values():
+            await conn.prepare(sql)
+
+    async def _run(self, conn, name: str, method: str, *args):
+        started = time.perf_counter()
+        try:
+            return await getattr(conn, method)(self.statements[name], *args)
+        finally:
+            self.latency_ms[name].observe((time.perf_counter() - started) * 1000)
+
+    async def fetch(self, conn, name: str, *args):
+        return await self._run(conn, name, "fetch", *args)
+
+    async def fetchrow(self, conn, name: str, *args):
+        return await self._run(conn, name, "fetchrow", *args)
+
+    async def fetchval(self, conn, name: str, *args):
+        return await self._run(conn, name, "fetchval", *args)
+
+    def metrics(self) -> dict:
+        return {name: stat.snapshot() for name, stat in self.latency_ms.items()}
+
+statement_registry = StatementRegistry()
+
+statement_registry.register("user_by_id", "SELECT * FROM users WHERE id = $1")
+statement_registry.register("available_readers", """
+    SELECT r.*, u.first_name, u.last_name, u.email 
+    FROM readers r 
+    JOIN users u ON r.user_id = u.id 
+    WHERE r.availability_status = 'online'
+    ORDER BY r.updated_at DESC
+""")
+statement_registry.register("available_reader", """
+    SELECT r.*, u.first_name, u.last_name, u.email
+    FROM readers r
+    JOIN users u ON r.user_id = u.id
+    WHERE r.id = $1 AND r.availability_status = 'online'
+""")
+statement_registry.register("session_with_participants", """
+    SELECT rs.*, c.user_id AS client_user_id, r.user_id AS reader_user_id
+    FROM reading_sessions rs
+    JOIN clients c ON rs.client_id = c.id
+    JOIN readers r ON rs.reader_id = r.id
+    WHERE rs.id = $1
+""")
+statement_registry.register("notification_last_seq", """
+    SELECT last_seq FROM user_notification_sequences WHERE user_id = $1
+""")
+statement_registry.register("notifications_since", """
+    SELECT seq, payload FROM user_notifications
+    WHERE user_id = $1 AND seq > $2
+    ORDER BY seq DESC
+    LIMIT $3
+""")
+statement_registry.register("client_bookings", """
+    SELECT rs.*,
+           r_user.first_name AS reader_first_name,
+           r_user.last_name AS reader_last_name
+    FROM reading_sessions rs
+    JOIN readers r_table ON rs.reader_id = r_table.id
+    JOIN users r_user ON r_table.user_id = r_user.id
+    WHERE rs.client_id = $1
+      AND (rs.created_at, rs.id) < ($2, $3)
+      AND rs.created_at >= $4
+      AND ($5::varchar IS NULL OR rs.status = $5)
+    ORDER BY rs.created_at DESC, rs.id DESC
+    LIMIT $6
+""")
+statement_registry.register("reader_session_queue", """
+    SELECT rs.*,
+           u_client.first_name AS client_first_name,
+           u_client.last_name AS client_last_name
+    FROM reading_sessions rs
+    JOIN clients c ON rs.client_id = c.id
+    JOIN users u_client ON c.user_id = u_client.id
+    WHERE rs.reader_id = $1 AND rs.status IN ('pending', 'active')
+    ORDER BY rs.created_at ASC
+""")
+statement_registry.register("active_billing_sessions", """
+    SELECT rs.id, rs.client_id, rs.reader_id, rs.rate_per_minute, rs.start_time,
+           bs.last_billed_at, COALESCE(bs.total_billed, 0.00) AS total_billed,
+           COALESCE(bh.amount_held, bs.total_billed, 0.00) AS amount_held
+    FROM reading_sessions rs
+    LEFT JOIN session_billing_state bs ON bs.session_id = rs.id
+    LEFT JOIN balance_holds bh ON bh.session_id = rs.id AND bh.status = 'open'
+    WHERE rs.status = 'active' AND rs.billing_type = 'per_minute'
+      AND rs.rate_per_minute > 0 AND rs.start_time IS NOT NULL
+""")
+statement_registry.register("reader_earnings_totals", """
+    SELECT pending_total, paid_total, lifetime_total
+    FROM reader_earnings_rollup
+    WHERE reader_id = $1
+""")
+statement_registry.register("reader_recent_earnings", """
+    SELECT re.session_id, re.total_session_amount, re.amount_earned, re.payout_status, re.created_at,
+           rs.session_type, u_client.first_name as client_first_name
+    FROM reader_earnings re
+    JOIN reading_sessions rs ON re.session_id = rs.id
+    JOIN clients c ON rs.client_id = c.id
+    JOIN users u_client ON c.user_id = u_client.id
+    WHERE re.reader_id = $1
+    ORDER BY re.created_at DESC
+    LIMIT 10
+""")
+
+# Keyset pagination. A cursor is an opaque token for the (created_at, id) of
+# the last row on a page; the next page continues strictly after it.
+PAGE_START = (datetime.max, "")
+
+def encode_page_cursor(created_at: Optional[datetime], row_id: str) -> str:
+    raw = json.dumps([created_at.isoformat() if created_at else None, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_page_cursor(token: str) -> tuple:
+    """(created_at, id) of a cursor as naive UTC, or a 400 for a malformed one.
+
+    The keyset comparison never matches a NULL created_at, so such rows are
+    not paged through; a cursor without one ends the listing.
     """
-    if current_user.role not in ["client", "admin"]: # Or just allow 'client'
-        raise HTTPException(status_code=403, detail="User is not a client")
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_at, row_id = json.loads(raw)
+        if not isinstance(row_id, str):
+            raise TypeError("cursor id must be a string")
+        if created_at is None:
+            return datetime.min, row_id
+        return as_naive_utc(datetime.fromisoformat(created_at)), row_id
+    except (ValueError, TypeError, OverflowError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def as_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Query-string datetimes compared against TIMESTAMP (UTC, no zone) columns."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+# Streamed responses are flushed to the client in chunks of about this size
+STREAM_FLUSH_BYTES = 64 * 1024
+
+def json_row_encoder(model=None, transform=dict):
+    """Encode one row to JSON bytes the way the buffered endpoint would encode it.
+
+    With a model the row is validated and dumped like a response_model item,
+    otherwise it goes through jsonable_encoder like a plain dict response.
+    """
+    if model is None:
+        return lambda record: json.dumps(jsonable_encoder(transform(record)), ensure_ascii=False,
+                                         separators=(",", ":")).encode()
+    adapter = TypeAdapter(model)
+    return lambda record: adapter.dump_json(adapter.validate_python(transform(record)))
+
+async def stream_json_array(pool, query: str, args: list, encode_row):
+    """Yield the rows of `query` as one JSON array, read through a server-side cursor.
+
+    Only STREAM_CURSOR_PREFETCH rows and one output chunk are held at a time, so
+    memory does not grow with the result. The connection stays checked out
+    until the client has read the whole array.
+    """
+    async with pool.acquire() as conn:
+        async with conn.transaction(readonly=True):
+            buffer = bytearray(b"[")
+            separator = b""
+            async for record in conn.cursor(query, *args, prefetch=STREAM_CURSOR_PREFETCH):
+                buffer += separator
+                buffer += encode_row(record)
+                separator = b","
+                if len(buffer) >= STREAM_FLUSH_BYTES:
+                    yield bytes(buffer)
+                    buffer.clear()
+            buffer += b"]"
+            yield bytes(buffer)
+
+def streaming_json_response(pool, query: str, args: list, encode_row) -> StreamingResponse:
+    return StreamingResponse(stream_json_array(pool, query, args, encode_row), media_type="application/json")
 
+# Database helper functions
+async def get_user_by_id(user_id: str) -> Optional[dict]:
     async with db_pool.acquire() as conn:
-        client_record = await conn.fetchrow(
-            "SELECT user_id, balance, created_at, updated_at FROM clients WHERE user_id = $1",
-            current_user.id
-        )
-        if not client_record:
-            # This case should ideally not happen if a client record is created upon user signup
-            raise HTTPException(status_code=404, detail="Client profile not found for this user")
+        result = await statement_registry.fetchrow(conn, "user_by_id", user_id)
+        return dict(result) if result else None
 
-        return ClientProfile(
-            user_id=current_user.id,
-            email=current_user.email,
-            first_name=current_user.first_name,
-            last_name=current_user.last_name,
-            role=current_user.role,
-            balance=client_record['balance'],
-            client_created_at=client_record['created_at'],
-            client_updated_at=client_record['updated_at']
-        )
+class IdentityMap:
+    """Bounded, bidirectional map of users.id <-> clients.id / readers.id.
 
-@app.get("/api/readers/available")
-async def get_available_readers():
-    """Get all currently available readers"""
-    async with db_pool.acquire() as conn:
-        readers = await conn.fetch("""
-            SELECT r.*, u.first_name, u.last_name, u.email 
-            FROM readers r 
-            JOIN users u ON r.user_id = u.id 
-            WHERE r.availability_status = 'online'
-            ORDER BY r.updated_at DESC
-        """)
-        
-        return [dict(reader) for reader in readers]
+    The mappings never change once written, so entries need no TTL; the least
+    recently used pair of a kind is dropped once max_size is exceeded.
+    """
+
+    TABLES = {"client": "clients", "reader": "readers"}
+
+    def __init__(self, max_size: int = IDENTITY_MAP_MAX_SIZE):
+        self.max_size = max_size
+        self._by_user: Dict[str, "OrderedDict[str, str]"] = {kind: OrderedDict() for kind in self.TABLES}
+        self._by_profile: Dict[str, Dict[str, str]] = {kind: {} for kind in self.TABLES}
+        self.hits = 0
+        self.misses = 0
+
+    def remember(self, kind: str, user_id: str, profile_id: str):
+        by_user = self._by_user[kind]
+        by_user[user_id] = profile_id
+        by_user.move_to_end(user_id)
+        self._by_profile[kind][profile_id] = user_id
+        while len(by_user) > self.max_size:
+            _, evicted_profile_id = by_user.popitem(last=False)
+            self._by_profile[kind].pop(evicted_profile_id, None)
+
+    def profile_id(self, kind: str, user_id: str) -> Optional[str]:
+        profile_id = self._by_user[kind].get(user_id)
+        if profile_id is None:
+            self.misses += 1
+            return None
+        self._by_user[kind].move_to_end(user_id)
+        self.hits += 1
+        return profile_id
+
+    def user_id(self, kind: str, profile_id: str) -> Optional[str]:
+        user_id = self._by_profile[kind].get(profile_id)
+        if user_id is None:
+            self.misses += 1
+            return None
+        self._by_user[kind].move_to_end(user_id)
+        self.hits += 1
+        return user_id
+
+    async def warm_up(self, conn):
+        """Bulk-load the most recently updated profiles of each kind."""
+        for kind, table in self.TABLES.items():
+            rows = await conn.fetch(
+                f"SELECT id, user_id FROM {table} ORDER BY updated_at DESC LIMIT $1", self.max_size
+            )
+            # Oldest first so the most recent end up least likely to be evicted
+            for row in reversed(rows):
+                self.remember(kind, row["user_id"], row["id"])
+        logger.info(f"Identity map warmed with {len(self._by_user['client'])} clients and {len(self._by_user['reader'])} readers")
+
+    def metrics(self) -> dict:
+        return {
+            "clients": len(self._by_user["client"]),
+            "readers": len(self._by_user["reader"]),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+identity_map = IdentityMap()
+
+async def _lookup_identity(kind: str, column: str, value: str, conn) -> Optional[str]:
+    # Map miss: read the pair from the profile table and remember it
+    query = f"SELECT id, user_id FROM {IdentityMap.TABLES[kind]} WHERE {column} = $1"
+    if conn is None:
+        async with db_pool.acquire() as conn:
+            row = await conn.fetchrow(query, value)
+    else:
+        row = await conn.fetchrow(query, value)
+    if row is None:
+        return None
+    identity_map.remember(kind, row["user_id"], row["id"])
+    return row["user_id"] if column == "id" else row["id"]
+
+async def get_client_id_from_user_id(user_id: str, conn=None) -> Optional[str]:
+    """Fetch client_id from user_id."""
+    return identity_map.profile_id("client", user_id) or await _lookup_identity("client", "user_id", user_id, conn)
+
+async def get_reader_id_from_user_id(user_id: str, conn=None) -> Optional[str]:
+    """Fetch reader_id from user_id."""
+    return identity_map.profile_id("reader", user_id) or await _lookup_identity("reader", "user_id", user_id, conn)
+
+async def resolve_client_id(identity: TokenIdentity, conn) -> Optional[str]:
+    """client_id from the token claims, falling back to the DB for tokens issued without it."""
+    if identity.client_id:
+        return identity.client_id
+    return await get_client_id_from_user_id(identity.user_id, conn)
+
+async def resolve_reader_id(identity: TokenIdentity, conn) -> Optional[str]:
+    """reader_id from the token claims, falling back to the DB for tokens issued without it."""
+    if identity.reader_id:
+        return identity.reader_id
+    return await get_reader_id_from_user_id(identity.user_id, conn)
+
+async def get_user_id_from_client_id(client_id: str, conn=None) -> Optional[str]:
+    """Fetch user_id from client_id."""
+    return identity_map.user_id("client", client_id) or await _lookup_identity("client", "id", client_id, conn)
+
+async def get_user_id_from_reader_id(reader_id: str, conn=None) -> Optional[str]:
+    """Fetch user_id from reader_id."""
+    return identity_map.user_id("reader", reader_id) or await _lookup_identity("reader", "id", reader_id, conn)
+
+# Ledger accounts
+PLATFORM_REVENUE_ACCOUNT = "platform:revenue"
+EXTERNAL_PAYMENTS_ACCOUNT = "external:stripe"
+
+def client_account(client_id: str) -> str:
+    return f"client:{client_id}"
+
+def reader_account(reader_id: str) -> str:
+    return f"reader:{reader_id}"
+
+def hold_account(client_id: str) -> str:
+    """The part of a client's funds reserved for their running sessions."""
+    return f"hold:{client_id}"
+
+def ledger_transfer(transfer_id: str, entry_type: str, reference_id: Optional[str], legs: List[tuple]) -> List[tuple]:
+    """Build the ledger entries of one transfer from (account, amount) legs.
+
+    Legs must sum to zero; zero-amount legs are dropped.
+    """
+    if sum(amount for _, amount in legs) != 0:
+        raise ValueError(f"Unbalanced ledger transfer {transfer_id}: {legs}")
+    return [(transfer_id, account, amount, entry_type, reference_id) for account, amount in legs if amount != 0]
+
+def session_charge_transfer(session_id: str, client_id: str, reader_id: str,
+                            collected: Decimal, reader_share: Decimal) -> List[tuple]:
+    """Client pays what was collected; the reader gets their share, the platform the rest."""
+    if not Decimal('0.00') <= reader_share <= collected:
+        raise ValueError(f"Reader share {reader_share} of session {session_id} is outside the {collected} collected")
+    return ledger_transfer(f"session_charge:{session_id}", "session_charge", session_id, [
+        (client_account(client_id), -collected),
+        (reader_account(reader_id), reader_share),
+        (PLATFORM_REVENUE_ACCOUNT, collected - reader_share),
+    ])
+
+async def append_ledger_entries(entries: List[tuple], conn):
+    """Insert a batch of ledger entries with one statement.
+
+    Replaying a transfer is a no-op thanks to the (transfer_id, account) key.
+    """
+    if not entries:
+        return
+    transfer_ids, accounts, amounts, entry_types, reference_ids = (list(column) for column in zip(*entries))
+    await conn.execute(
+        """INSERT INTO ledger_entries (transfer_id, account, amount, entry_type, reference_id)
+           SELECT * FROM unnest($1::text[], $2::text[], $3::numeric[], $4::text[], $5::text[])
+           ON CONFLICT (transfer_id, account) DO NOTHING""",
+        transfer_ids, accounts, amounts, entry_types, reference_ids
+    )
+
+async def get_ledger_balance(account: str, conn) -> Decimal:
+    """Account balance = last snapshot + entries appended since (index range scan)."""
+    return await conn.fetchval("SELECT ledger_balance($1)", account)
+
+# Client balances are ledger accounts (see migration 0009): credits are plain
+# appends, while a debit first locks the client's row (without updating it)
+# so two debits cannot both spend the same balance. The lock is taken in its
+# own statement: a statement's snapshot predates the locks it waits for, so
+# it would not see entries appended by the transaction it waited on.
+
+async def lock_clients(client_ids: List[str], conn):
+    """Serialize debits per client, in id order (after any session rows)."""
+    if client_ids:
+        await conn.execute(
+            "SELECT 1 FROM clients WHERE id = ANY($1::text[]) ORDER BY id FOR UPDATE", sorted(set(client_ids))
+        )
+
+async def place_balance_hold(session_id: str, client_id: str, amount: Decimal, conn) -> Decimal:
+    """Move up to `amount` of the client's balance into a hold for the session.
+
+    Returns the amount actually held (less than requested if the balance is short).
+    A second hold for the same session violates the primary key, so the
+    caller's transaction rolls back instead of debiting without a hold.
+    """
+    await lock_clients([client_id], conn)
+    held = await conn.fetchval(
+        """WITH held AS (
+               INSERT INTO balance_holds (session_id, client_id, amount_held)
+               SELECT $1, $2, LEAST(GREATEST(ledger_balance($4), 0.00), $3)
+               RETURNING amount_held
+           ), journaled AS (
+               INSERT INTO ledger_entries (transfer_id, account, amount, entry_type, reference_id)
+               SELECT 'hold:' || $1 || ':' || held.amount_held, leg.account, leg.amount, 'hold', $1
+               FROM held CROSS JOIN LATERAL (VALUES ($4, -held.amount_held), ($5, held.amount_held)) AS leg(account, amount)
+               WHERE held.amount_held > 0
+           )
+           SELECT amount_held FROM held""",
+        session_id, client_id, amount, client_account(client_id), hold_account(client_id)
+    )
+    return held if held is not None else Decimal('0.00')
+
+async def settle_balance_hold(session_id: str, client_id: str, amount_due: Decimal, conn) -> Decimal:
+    """Settle a session's hold against the exact amount owed.
+
+    The hold goes back to the client's balance, which then pays what is due
+    (see session_charge_transfer), capped at what the client has. Returns the
+    amount collected from the client.
+    """
+    await lock_clients([client_id], conn)
+    collected = await conn.fetchval(
+        """WITH checkpoint AS (
+               DELETE FROM session_billing_state WHERE session_id = $1
+           ), settlement AS (
+               SELECT COALESCE(h.amount_held, 0.00) AS held,
+                      LEAST($2, COALESCE(h.amount_held, 0.00) + GREATEST(ledger_balance($3), 0.00)) AS collected
+               FROM (SELECT 1) AS one
+               LEFT JOIN balance_holds h ON h.session_id = $1 AND h.status = 'open'
+           ), settled AS (
+               UPDATE balance_holds h
+               SET status = 'settled', amount_settled = settlement.collected, updated_at = NOW()
+               FROM settlement
+               WHERE h.session_id = $1 AND h.status = 'open'
+           ), released AS (
+               INSERT INTO ledger_entries (transfer_id, account, amount, entry_type, reference_id)
+               SELECT 'hold_release:' || $1, leg.account, leg.amount, 'hold_release', $1
+               FROM settlement CROSS JOIN LATERAL (VALUES ($4, -settlement.held), ($3, settlement.held)) AS leg(account, amount)
+               WHERE settlement.held > 0
+           )
+           SELECT collected FROM settlement""",
+        session_id, amount_due, client_account(client_id), hold_account(client_id)
+    )
+    return collected if collected is not None else Decimal('0.00')
+
+# API Routes
+
+# Auth Endpoints
+@app.post("/api/auth/signup", response_model=Token)
+async def signup(user_create: UserCreate):
+    # Reject a known email before hashing, so duplicates never take a bcrypt slot
+    async with db_pool.acquire() as conn:
+        existing_user = await conn.fetchrow("SELECT id FROM users WHERE email = $1", user_create.email)
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    # Hash without holding a pool connection while bcrypt runs
+    hashed_password = await get_password_hash_async(user_create.password)
+    user_id = str(uuid.uuid4())
+    role = "client" # Default role
+    async with db_pool.acquire() as conn:
+        try:
+            async with conn.transaction():
+                # Insert into users table; the unique email catches a concurrent signup
+                await conn.execute(
+                    """INSERT INTO users (id, email, hashed_password, role)
+                       VALUES ($1, $2, $3, $4)""",
+                    user_id, user_create.email, hashed_password, role
+                )
+
+                # Insert into clients table
+                client_id = await conn.fetchval(
+                    "INSERT INTO clients (user_id) VALUES ($1) RETURNING id",
+                    user_id
+                )
+        except asyncpg.UniqueViolationError:
+            raise HTTPException(status_code=400, detail="Email already registered")
+    identity_map.remember("client", user_id, client_id)
+
+    access_token = create_access_token(data={"sub": user_id, "role": role, "client_id": client_id})
+    return Token(access_token=access_token, token_type="bearer", role=role, user_id=user_id)
+
+@app.post("/api/auth/signin", response_model=Token)
+async def signin(user_login: UserLogin):
+    async with db_pool.acquire() as conn:
+        user_record = await conn.fetchrow(
+            """
+            SELECT u.*, c.id AS client_id, r.id AS reader_id
+            FROM users u
+            LEFT JOIN clients c ON c.user_id = u.id
+            LEFT JOIN readers r ON r.user_id = u.id
+            WHERE u.email = $1
+            """,
+            user_login.email
+        )
+
+    if not user_record:
+        raise HTTPException(status_code=401, detail="Incorrect email or password")
+
+    if not await verify_password_async(user_login.password, user_record["hashed_password"]):
+        raise HTTPException(status_code=401, detail="Incorrect email or password")
+
+    access_token = create_access_token(data={
+        "sub": user_record["id"],
+        "role": user_record["role"],
+        "client_id": user_record["client_id"],
+        "reader_id": user_record["reader_id"],
+    })
+    return Token(access_token=access_token, token_type="bearer", role=user_record["role"], user_id=user_record["id"])
+
+@app.get("/api/status")
+async def get_status():
+    return {"status": "ok", "service": "SoulSeer API"}
+
+@app.get("/api/health")
+async def health_check():
+    try:
+        async with db_pool.acquire() as conn:
+            await conn.fetchval("SELECT 1")
+        return {"status": "healthy", "database": "connected"}
+    except Exception as e:
+        raise HTTPException(status_code=503, detail="Database connection failed")
+
+@app.get("/api/user/profile")
+async def get_user_profile(current_user: User = Depends(get_current_user)):
+    # The user object is already fetched and validated by get_current_user
+    # It's also already a Pydantic User model
+    return current_user
+
+@app.get("/api/client/profile", response_model=ClientProfile)
+async def get_client_profile(current_user: User = Depends(get_current_user)):
+    """
+    Get client-specific profile information, including balance.
+    """
+    if current_user.role not in ["client", "admin"]: # Or just allow 'client'
+        raise HTTPException(status_code=403, detail="User is not a client")
+
+    async with db_pool.acquire() as conn:
+        client_record = await conn.fetchrow(
+            """SELECT user_id, ledger_balance('client:' || id) AS balance, created_at, updated_at
+               FROM clients WHERE user_id = $1""",
+            current_user.id
+        )
+        if not client_record:
+            # This case should ideally not happen if a client record is created upon user signup
+            raise HTTPException(status_code=404, detail="Client profile not found for this user")
+
+        return ClientProfile(
+            user_id=current_user.id,
+            email=current_user.email,
+            first_name=current_user.first_name,
+            last_name=current_user.last_name,
+            role=current_user.role,
+            balance=client_record['balance'],
+            client_created_at=client_record['created_at'],
+            client_updated_at=client_record['updated_at']
+        )
+
+@app.get("/api/readers/available")
+async def get_available_readers(request: Request, stream: bool = False,
+                                identity: Optional[TokenIdentity] = Depends(get_optional_token_identity)):
+    """Get all currently available readers.
+
+    Served from the in-memory reader directory, with ETag / If-None-Match
+    support. ?stream=true reads the database instead and streams the array.
+    A pool is only picked (and counted in the replica metrics) for reads
+    that reach the database.
+    """
+    if not stream and reader_directory.loaded:
+        return reader_directory.response(request.headers.get("if-none-match"))
+    db = replica_router.read_pool(identity.user_id if identity else None)
+    if stream:
+        return streaming_json_response(db, statement_registry.statements["available_readers"], [], json_row_encoder())
+    async with db.acquire() as conn:
+        readers = await statement_registry.fetch(conn, "available_readers")
+        
+        return [dict(reader) for reader in readers]
 
 @app.get("/api/reader/profile")
 async def get_reader_profile(current_user: User = Depends(get_current_user)):
@@ -802,60 +1946,47 @@ async def get_reader_profile(current_user: User = Depends(get_current_user)):
         
         return dict(reader)
 
-@app.get("/api/client/bookings", response_model=List[ReadingSession])
-async def get_client_bookings(current_user: User = Depends(get_current_user)):
-    """Fetch all past and upcoming bookings for the current client."""
-    async with db_pool.acquire() as conn:
-        client_id_db = await get_client_id_from_user_id(current_user.id, conn)
+@app.get("/api/client/bookings", response_model=List[SessionDetailsClientView])
+async def get_client_bookings(
+    response: Response,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+    identity: TokenIdentity = Depends(get_token_identity),
+    db = Depends(read_only_db)
+):
+    """Fetch the current client's bookings, newest first, one page at a time.
+
+    When more bookings exist, the X-Next-Cursor response header carries the
+    token to pass back as ?cursor= for the next page.
+    """
+    after_created, after_id = decode_page_cursor(cursor) if cursor else PAGE_START
+    to_date = as_naive_utc(to_date)
+    if to_date is not None and to_date < after_created:
+        after_created, after_id = to_date, "" # created_at < to_date
+    from_date = as_naive_utc(from_date) or datetime.min
+
+    async with db.acquire() as conn:
+        client_id_db = await resolve_client_id(identity, conn)
         if not client_id_db:
             # This should not happen if client profile is created on signup
             raise HTTPException(status_code=404, detail="Client profile not found.")
-
-        # Query needs to join with readers and users table to get reader's name.
-        # For simplicity, if ReadingSession model is not designed for joined data,
-        # we might return a list of dicts or a custom model.
-        # Assuming ReadingSession can handle the fields for now, or we adjust the query.
-        # The current ReadingSession model might not have fields for reader_name.
-        # Let's return the raw records for now and plan to refine the response model if needed.
-
-        sessions_records = await conn.fetch(
-            """
-            SELECT rs.*,
-                   r_user.first_name AS reader_first_name,
-                   r_user.last_name AS reader_last_name
-            FROM reading_sessions rs
-            JOIN readers r_table ON rs.reader_id = r_table.id
-            JOIN users r_user ON r_table.user_id = r_user.id
-            WHERE rs.client_id = $1
-            ORDER BY rs.created_at DESC
-            """,
-            client_id_db
+        records = await statement_registry.fetch(
+            conn, "client_bookings", client_id_db, after_created, after_id, from_date, status, limit + 1
         )
-        # Convert records to ReadingSession Pydantic model, potentially adding extra fields if necessary
-        # For now, if ReadingSession doesn't support reader_first_name directly, this will need adjustment.
-        # A simple approach is to return List[Dict] or create a new response model.
-        # Given the current structure, returning List[Dict] is safer.
-
-        # Modify response to include reader name, this means response_model=List[ReadingSession] might be an issue
-        # For now, let's manually construct what we need if ReadingSession model is strict
-
-        bookings = []
-        for record in sessions_records:
-            booking_dict = dict(record)
-            # Add reader name to the dictionary if not part of ReadingSession model
-            booking_dict['reader_name'] = f"{record['reader_first_name'] or ''} {record['reader_last_name'] or ''}".strip()
-            bookings.append(booking_dict)
-        # Now, construct the Pydantic models
-        detailed_bookings = []
-        for record in sessions_records:
-            booking_detail = SessionDetailsClientView(
-                **record, # Spread the original session fields
-                reader_first_name=record['reader_first_name'],
-                reader_last_name=record['reader_last_name'],
-                reader_name=f"{record['reader_first_name'] or ''} {record['reader_last_name'] or ''}".strip()
-            )
-            detailed_bookings.append(booking_detail)
-        return detailed_bookings
+
+    bookings = []
+    for record in records[:limit]:
+        booking = dict(record)
+        booking["reader_name"] = f"{record['reader_first_name'] or ''} {record['reader_last_name'] or ''}".strip()
+        bookings.append(booking)
+    if len(records) > limit:
+        last = records[limit - 1]
+        response.headers["X-Next-Cursor"] = encode_page_cursor(last["created_at"], last["id"])
+    return bookings
 
 @app.get("/api/client/messages")
 async def get_client_messages(current_user: User = Depends(get_current_user)):
@@ -865,80 +1996,53 @@ async def get_client_messages(current_user: User = Depends(get_current_user)):
     logger.info(f"Client messages endpoint called by user: {current_user.id}")
     return {"message": "Messaging feature coming soon.", "sample_messages": []}
 
+def reader_queue_entry(record) -> dict:
+    entry = dict(record)
+    entry["client_name"] = f"{record['client_first_name'] or ''} {record['client_last_name'] or ''}".strip()
+    return entry
+
 @app.get("/api/reader/sessions/queue", response_model=List[SessionDetailsReaderView])
-async def get_reader_sessions_queue(current_user: User = Depends(get_current_user)):
-    """Fetch pending and active sessions for the current reader."""
+async def get_reader_sessions_queue(
+    stream: bool = False,
+    current_user: User = Depends(get_current_user),
+    identity: TokenIdentity = Depends(get_token_identity)
+):
+    """Fetch pending and active sessions for the current reader (?stream=true streams the JSON array)."""
     if current_user.role != 'reader' and current_user.role != 'admin': # Admin can also see for debugging?
         raise HTTPException(status_code=403, detail="User is not a reader.")
 
     async with db_pool.acquire() as conn:
-        reader_id_db = await get_reader_id_from_user_id(current_user.id, conn)
+        reader_id_db = await resolve_reader_id(identity, conn)
         if not reader_id_db:
             raise HTTPException(status_code=404, detail="Reader profile not found for current user.")
 
-        sessions_records = await conn.fetch(
-            """
-            SELECT rs.*,
-                   u_client.first_name AS client_first_name,
-                   u_client.last_name AS client_last_name
-            FROM reading_sessions rs
-            JOIN clients c ON rs.client_id = c.id
-            JOIN users u_client ON c.user_id = u_client.id
-            WHERE rs.reader_id = $1 AND rs.status IN ('pending', 'active')
-            ORDER BY rs.created_at ASC
-            """,
-            reader_id_db
-        )
+        if not stream:
+            sessions_records = await statement_registry.fetch(conn, "reader_session_queue", reader_id_db)
+            return [reader_queue_entry(record) for record in sessions_records]
 
-        detailed_sessions = []
-        for record in sessions_records:
-            session_detail = SessionDetailsReaderView(
-                **record,
-                client_first_name=record['client_first_name'],
-                client_last_name=record['client_last_name'],
-                client_name=f"{record['client_first_name'] or ''} {record['client_last_name'] or ''}".strip()
-            )
-            detailed_sessions.append(session_detail)
-        return detailed_sessions
+    return streaming_json_response(
+        db_pool, statement_registry.statements["reader_session_queue"], [reader_id_db],
+        json_row_encoder(SessionDetailsReaderView, reader_queue_entry)
+    )
 
 @app.get("/api/reader/earnings", response_model=ReaderEarningsSummary)
-async def get_reader_earnings(current_user: User = Depends(get_current_user)):
+async def get_reader_earnings(
+    current_user: User = Depends(get_current_user),
+    identity: TokenIdentity = Depends(get_token_identity),
+    db = Depends(read_only_db)
+):
     """Fetch earnings summary and recent earnings for the current reader."""
     if current_user.role != 'reader' and current_user.role != 'admin':
         raise HTTPException(status_code=403, detail="User is not a reader.")
 
-    async with db_pool.acquire() as conn:
-        reader_id_db = await get_reader_id_from_user_id(current_user.id, conn)
+    async with db.acquire() as conn:
+        reader_id_db = await resolve_reader_id(identity, conn)
         if not reader_id_db:
             raise HTTPException(status_code=404, detail="Reader profile not found for current user.")
 
-        pending_balance_record = await conn.fetchrow(
-            "SELECT COALESCE(SUM(amount_earned), 0.00) AS total FROM reader_earnings WHERE reader_id = $1 AND payout_status = 'pending'",
-            reader_id_db
-        )
-        paid_out_total_record = await conn.fetchrow(
-            "SELECT COALESCE(SUM(amount_earned), 0.00) AS total FROM reader_earnings WHERE reader_id = $1 AND payout_status = 'paid'",
-            reader_id_db
-        )
-        total_earned_lifetime_record = await conn.fetchrow(
-            "SELECT COALESCE(SUM(amount_earned), 0.00) AS total FROM reader_earnings WHERE reader_id = $1",
-            reader_id_db
-        )
-
-        recent_earnings_records = await conn.fetch(
-            """
-            SELECT re.session_id, re.total_session_amount, re.amount_earned, re.payout_status, re.created_at,
-                   rs.session_type, u_client.first_name as client_first_name
-            FROM reader_earnings re
-            JOIN reading_sessions rs ON re.session_id = rs.id
-            JOIN clients c ON rs.client_id = c.id
-            JOIN users u_client ON c.user_id = u_client.id
-            WHERE re.reader_id = $1
-            ORDER BY re.created_at DESC
-            LIMIT 10
-            """,
-            reader_id_db
-        )
+        # Totals are maintained by triggers on reader_earnings; no row means no earnings yet
+        totals = await statement_registry.fetchrow(conn, "reader_earnings_totals", reader_id_db)
+        recent_earnings_records = await statement_registry.fetch(conn, "reader_recent_earnings", reader_id_db)
 
         recent_earnings_list = [
             {
@@ -953,32 +2057,100 @@ async def get_reader_earnings(current_user: User = Depends(get_current_user)):
         ]
 
         return ReaderEarningsSummary(
-            pending_balance=pending_balance_record['total'] if pending_balance_record else Decimal('0.00'),
-            paid_out_total=paid_out_total_record['total'] if paid_out_total_record else Decimal('0.00'),
-            total_earned_lifetime=total_earned_lifetime_record['total'] if total_earned_lifetime_record else Decimal('0.00'),
+            pending_balance=totals['pending_total'] if totals else Decimal('0.00'),
+            paid_out_total=totals['paid_total'] if totals else Decimal('0.00'),
+            total_earned_lifetime=totals['lifetime_total'] if totals else Decimal('0.00'),
             recent_earnings=recent_earnings_list
         )
 
+# Admin reader directory: keyset-paginated on (readers.created_at, readers.id),
+# filtered by status and by an email/name prefix
+READER_DIRECTORY_COLUMNS = """
+    u.id, u.email, u.first_name, u.last_name, u.role, u.created_at, u.updated_at,
+    r.id AS reader_db_id, r.bio, r.specialties,
+    r.is_online, r.chat_rate_per_minute, r.phone_rate_per_minute, r.video_rate_per_minute,
+    r.availability_status, r.application_status,
+    r.created_at AS reader_created_at, r.updated_at AS reader_updated_at
+"""
+
+def reader_directory_filters(application_status: Optional[str] = None,
+                             availability_status: Optional[str] = None,
+                             search: Optional[str] = None) -> tuple:
+    """FROM/WHERE clause and its arguments, shared by the page query and the count estimate."""
+    conditions = ["u.role = 'reader'"]
+    args = []
+    if application_status:
+        args.append(application_status)
+        conditions.append(f"r.application_status = ${len(args)}")
+    if availability_status:
+        args.append(availability_status)
+        conditions.append(f"r.availability_status = ${len(args)}")
+    if search and search.strip():
+        prefix = search.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        args.append(prefix + "%")
+        n = len(args)
+        conditions.append(f"(lower(u.email) LIKE ${n} OR lower(u.first_name) LIKE ${n} OR lower(u.last_name) LIKE ${n})")
+    return f"FROM readers r JOIN users u ON u.id = r.user_id WHERE {' AND '.join(conditions)}", args
+
+def reader_directory_page_query(limit: Optional[int], after: tuple = PAGE_START, **filters) -> tuple:
+    """Up to `limit` (None: all) readers strictly after the (created_at, id) keyset `after`, newest first."""
+    from_where, args = reader_directory_filters(**filters)
+    n = len(args)
+    query = (
+        f"SELECT {READER_DIRECTORY_COLUMNS} {from_where}"
+        f" AND (r.created_at, r.id) < (${n + 1}, ${n + 2})"
+        f" ORDER BY r.created_at DESC, r.id DESC LIMIT ${n + 3}"
+    )
+    return query, [*args, *after, limit]
+
+async def fetch_reader_directory_page(conn, limit: int, after: tuple = PAGE_START, **filters) -> list:
+    query, args = reader_directory_page_query(limit, after, **filters)
+    return await conn.fetch(query, *args)
+
+async def estimate_row_count(conn, query: str, *args) -> int:
+    """Planner row estimate for a query: no COUNT(*), so it is cheap but approximate."""
+    plan = await conn.fetchval("EXPLAIN (FORMAT JSON) " + query, *args)
+    if isinstance(plan, str): # connection without the JSON codec
+        plan = loads_json(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
 @app.get("/api/admin/readers", response_model=List[AdminReaderView])
-async def admin_get_readers(current_user: User = Depends(get_current_user)):
+async def admin_get_readers(
+    response: Response,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    application_status: Optional[str] = None,
+    availability_status: Optional[str] = None,
+    q: Optional[str] = Query(None, max_length=100),
+    stream: bool = False,
+    current_user: User = Depends(get_current_user),
+    db = Depends(read_only_db)
+):
+    """One page of readers, newest first.
+
+    `q` matches a prefix of the email, first name or last name. The first page
+    carries an approximate match count in X-Total-Estimate; X-Next-Cursor is
+    set while more pages remain. With ?stream=true, every matching reader after
+    the cursor is streamed as one JSON array instead, and limit is ignored.
+    """
     if current_user.role != 'admin':
         raise HTTPException(status_code=403, detail="Insufficient privileges.")
 
-    async with db_pool.acquire() as conn:
-        reader_records = await conn.fetch(
-            """
-            SELECT u.*, r.id as reader_db_id, r.bio, r.specialties, r.is_online,
-                   r.chat_rate_per_minute, r.phone_rate_per_minute, r.video_rate_per_minute,
-                   r.availability_status, r.application_status,
-                   r.created_at as reader_created_at, r.updated_at as reader_updated_at
-            FROM users u
-            JOIN readers r ON u.id = r.user_id
-            WHERE u.role = 'reader'
-            ORDER BY u.created_at DESC
-            """
-            # Consider adding WHERE u.role = 'reader' if users table might have other roles that somehow have reader entries
-        )
-        return [AdminReaderView(**record) for record in reader_records]
+    after = decode_page_cursor(cursor) if cursor else PAGE_START
+    filters = {"application_status": application_status, "availability_status": availability_status, "search": q}
+    if stream:
+        query, args = reader_directory_page_query(None, after, **filters)
+        return streaming_json_response(db, query, args, json_row_encoder(AdminReaderView))
+    async with db.acquire() as conn:
+        records = await fetch_reader_directory_page(conn, limit + 1, after, **filters)
+        if not cursor:
+            from_where, args = reader_directory_filters(**filters)
+            response.headers["X-Total-Estimate"] = str(await estimate_row_count(conn, f"SELECT 1 {from_where}", *args))
+
+    if len(records) > limit:
+        last = records[limit - 1]
+        response.headers["X-Next-Cursor"] = encode_page_cursor(last["reader_created_at"], last["reader_db_id"])
+    return [dict(record) for record in records[:limit]]
 
 @app.put("/api/admin/reader/{target_user_id}/status", response_model=AdminReaderView)
 async def admin_update_reader_application_status(
@@ -991,16 +2163,23 @@ async def admin_update_reader_application_status(
 
     async with db_pool.acquire() as conn:
         # Check if the target user is actually a reader
-        reader_profile_check = await conn.fetchrow("SELECT id FROM readers WHERE user_id = $1", target_user_id)
-        if not reader_profile_check:
+        reader_db_id = await get_reader_id_from_user_id(target_user_id, conn)
+        if not reader_db_id:
             raise HTTPException(status_code=404, detail=f"Reader profile not found for user ID: {target_user_id}")
 
-        reader_db_id = reader_profile_check['id']
-
-        await conn.execute(
-            "UPDATE readers SET application_status = $1, updated_at = NOW() WHERE id = $2",
-            status_update.status, reader_db_id
-        )
+        async with conn.transaction():
+            previous_reader = await conn.fetchrow(
+                "SELECT application_status FROM readers WHERE id = $1 FOR UPDATE", reader_db_id
+            )
+            updated_reader = await conn.fetchrow(
+                "UPDATE readers SET application_status = $1, updated_at = NOW() WHERE id = $2 RETURNING application_status, updated_at",
+                status_update.status, reader_db_id
+            )
+        user_cache.invalidate(target_user_id)
+        await reader_directory.refresh_reader(reader_db_id, conn)
+        await event_bus.publish("reader", reader_id=reader_db_id, user_id=target_user_id)
+        if previous_reader["application_status"] != updated_reader["application_status"]:
+            await broadcast_reader_status_change(reader_db_id, dict(updated_reader))
 
         # Fetch the updated full profile to return
         updated_reader_record = await conn.fetchrow(
@@ -1032,18 +2211,160 @@ async def admin_get_logs(current_user: User = Depends(get_current_user)):
         {"timestamp": (datetime.utcnow() - timedelta(minutes=10)).isoformat(), "level": "ERROR", "message": "Mock log: Unhandled exception in session processing Z."}
     ]
 
+@app.get("/api/admin/metrics")
+async def admin_get_metrics(current_user: User = Depends(get_current_user)):
+    """In-process runtime metrics for the background subsystems."""
+    if current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail="Insufficient privileges.")
+
+    return {
+        "billing": billing_scheduler.metrics(),
+        "ledger_snapshots": ledger_snapshot_job.metrics(),
+        "password_hashing": password_hasher.metrics(),
+        "user_cache": user_cache.metrics(),
+        "identity_map": identity_map.metrics(),
+        "reader_directory": reader_directory.metrics(),
+        "event_bus": event_bus.metrics(),
+        "websockets": websocket_hub.metrics(),
+        "notification_inbox": notification_inbox.metrics(),
+        "statements": statement_registry.metrics(),
+        "database": replica_router.metrics()
+    }
+
+@app.post("/api/admin/users/{target_user_id}/revoke-tokens")
+async def admin_revoke_user_tokens(target_user_id: str, current_user: User = Depends(get_current_user)):
+    """Reject every token issued to a user before now (e.g. after a role change)."""
+    if current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail="Insufficient privileges.")
+
+    async with db_pool.acquire() as conn:
+        cutoff = await token_revocations.revoke_user(target_user_id, conn)
+    user_cache.invalidate(target_user_id)
+    await event_bus.publish("revocation", user_id=target_user_id, revoked_before=cutoff)
+    return {"user_id": target_user_id, "revoked": True}
+
+@app.get("/api/admin/ledger/balance")
+async def admin_get_ledger_balance(account: str, current_user: User = Depends(get_current_user)):
+    """Ledger balance of an account (e.g. client:<id>, reader:<id>, platform:revenue)."""
+    if current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail="Insufficient privileges.")
+
+    async with db_pool.acquire() as conn:
+        balance = await get_ledger_balance(account, conn)
+    return {"account": account, "balance": balance}
+
+# Bulk exports stream COPY output to the client; rows are never held in Python.
+# Sensitive columns (hashed_password) are left out of the column lists.
+EXPORT_DATASETS = {
+    "sessions": """
+        SELECT id, client_id, reader_id, session_type, billing_type, status, rate_per_minute, fixed_price,
+               duration_minutes, scheduled_time, start_time, end_time, billing_duration_seconds,
+               total_minutes, total_amount, room_id, created_at, updated_at
+        FROM reading_sessions
+    """,
+    "earnings": """
+        SELECT id, reader_id, session_id, total_session_amount, amount_earned, payout_status, created_at, updated_at
+        FROM reader_earnings
+    """,
+    "users": "SELECT id, email, first_name, last_name, role, created_at, updated_at FROM users",
+}
+# NDJSON is one row_to_json() column written as CSV with a quote character and
+# delimiter that JSON output never contains, so each line is the raw JSON
+EXPORT_FORMATS = {
+    "csv": ("text/csv", {"format": "csv", "header": True}),
+    "ndjson": ("application/x-ndjson", {"format": "csv", "quote": "\x01", "delimiter": "\x02"}),
+}
+async def stream_copy_query(pool, query: str, args: list, **copy_options):
+    """Yield the COPY output of `query` while it is produced.
+
+    At most EXPORT_BUFFER_CHUNKS chunks wait between the connection and the
+    client, so a slow reader applies back-pressure instead of growing memory.
+    """
+    queue = asyncio.Queue(maxsize=EXPORT_BUFFER_CHUNKS)
+    failure = []
+
+    async def produce():
+        try:
+            async with pool.acquire() as conn:
+                await conn.copy_from_query(query, *args, output=queue.put, **copy_options)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            failure.append(e)
+        await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        done = False
+        while not done:
+            parts = [await queue.get()]
+            size = len(parts[0] or b"")
+            while size < STREAM_FLUSH_BYTES and not queue.empty():
+                parts.append(queue.get_nowait())
+                size += len(parts[-1] or b"")
+            if parts[-1] is None:
+                done = True
+                parts.pop()
+            if parts:
+                yield b"".join(parts)
+        if failure:
+            logger.error(f"Export stopped early: {failure[0]}")
+            raise failure[0]
+    finally:
+        if not producer.done():
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+@app.get("/api/admin/export/{dataset}")
+async def admin_export(
+    dataset: str,
+    export_format: str = Query("csv", alias="format"),
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+    db = Depends(read_only_db)
+):
+    """Stream sessions, earnings or users as CSV or NDJSON, optionally limited to created_at in [from_date, to_date)."""
+    if current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail="Insufficient privileges.")
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown export: {dataset}")
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+
+    conditions, args = [], []
+    if from_date:
+        args.append(as_naive_utc(from_date))
+        conditions.append(f"created_at >= ${len(args)}")
+    if to_date:
+        args.append(as_naive_utc(to_date))
+        conditions.append(f"created_at < ${len(args)}")
+    query = EXPORT_DATASETS[dataset]
+    if conditions:
+        query = f"{query} WHERE {' AND '.join(conditions)}"
+    if export_format == "ndjson":
+        query = f"SELECT row_to_json(export_row) FROM ({query}) AS export_row"
+
+    media_type, copy_options = EXPORT_FORMATS[export_format]
+    filename = f"{dataset}-{datetime.utcnow():%Y%m%dT%H%M%SZ}.{export_format}"
+    logger.info(f"Admin {current_user.email} exporting {dataset} as {export_format}")
+    return StreamingResponse(
+        stream_copy_query(db, query, args, **copy_options),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @app.put("/api/reader/status")
 async def update_reader_status(
     status_update: ReaderStatus,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    identity: TokenIdentity = Depends(get_token_identity)
 ):
     """Update reader availability status and rates"""
-    user_id = current_user.id
-    
     async with db_pool.acquire() as conn:
         # Check if reader exists
-        reader = await conn.fetchrow("SELECT id FROM readers WHERE user_id = $1", user_id)
-        if not reader:
+        reader_id_db = await resolve_reader_id(identity, conn)
+        if not reader_id_db:
             raise HTTPException(status_code=404, detail="Reader profile not found")
         
         # Build update query
@@ -1066,19 +2387,27 @@ async def update_reader_status(
             values.append(status_update.video_rate_per_minute)
             param_count += 1
         
-        values.append(user_id)
+        values.append(reader_id_db)
         
         query = f"""
             UPDATE readers 
             SET {', '.join(update_fields)}
-            WHERE user_id = ${param_count}
+            WHERE id = ${param_count}
             RETURNING *
         """
         
-        updated_reader = await conn.fetchrow(query, *values)
+        async with conn.transaction():
+            previous_reader = await conn.fetchrow("SELECT * FROM readers WHERE id = $1 FOR UPDATE", reader_id_db)
+            updated_reader = await conn.fetchrow(query, *values)
+        if not updated_reader:
+            raise HTTPException(status_code=404, detail="Reader profile not found")
+        await reader_directory.refresh_reader(reader_id_db, conn)
+        await event_bus.publish("reader", reader_id=reader_id_db)
         
-        # Notify connected clients of status change
-        await broadcast_reader_status_change(dict(updated_reader))
+        # Notify subscribers of what changed (a repeated status is not a change)
+        changes = changed_fields(previous_reader, updated_reader)
+        if set(changes) - {"updated_at"}:
+            await broadcast_reader_status_change(reader_id_db, changes)
         
         return dict(updated_reader)
 
@@ -1093,16 +2422,7 @@ async def session_action(
     """Handle session actions: accept, reject, end, cancel_client."""
     async with db_pool.acquire() as conn:
         # Fetch session details along with client's user_id and reader's user_id for notifications
-        session_record = await conn.fetchrow(
-            """
-            SELECT rs.*, c.user_id AS client_user_id, r.user_id AS reader_user_id
-            FROM reading_sessions rs
-            JOIN clients c ON rs.client_id = c.id
-            JOIN readers r ON rs.reader_id = r.id
-            WHERE rs.id = $1
-            """,
-            action_data.session_id
-        )
+        session_record = await statement_registry.fetchrow(conn, "session_with_participants", action_data.session_id)
 
         if not session_record:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -1117,11 +2437,22 @@ async def session_action(
                 raise HTTPException(status_code=403, detail="Action not allowed or invalid session state.")
             
             start_time_utc = datetime.utcnow() # Use UTC for server-side timestamps
-            updated_session_data_dict = await conn.fetchrow(
-                "UPDATE reading_sessions SET status = 'active', start_time = $1, updated_at = NOW() WHERE id = $2 RETURNING *",
-                start_time_utc, session.id
-            )
+            is_per_minute = session.billing_type == 'per_minute' and bool(session.rate_per_minute)
+            async with conn.transaction():
+                updated_session_data_dict = await conn.fetchrow(
+                    "UPDATE reading_sessions SET status = 'active', start_time = $1, updated_at = NOW() WHERE id = $2 AND status = 'pending' RETURNING *",
+                    start_time_utc, session.id
+                )
+                if not updated_session_data_dict:
+                    raise HTTPException(status_code=409, detail="Session is no longer pending.")
+                amount_held = Decimal('0.00')
+                if is_per_minute:
+                    # Reserve the first minutes up front; billing consumes the hold in memory
+                    hold_amount = Decimal(str(session.rate_per_minute)) * BILLING_HOLD_MINUTES
+                    amount_held = await place_balance_hold(session.id, session.client_id, hold_amount, conn)
             await signaling_server.create_room(session.room_id) # Ensure WebRTC room is ready
+            if is_per_minute:
+                await start_session_billing(session.id, dict(updated_session_data_dict, amount_held=amount_held))
             await notify_user(client_user_id, {"type": "session_accepted", "session_id": session.id, "room_id": session.room_id, "reader_name": current_user.first_name or current_user.email})
 
         elif action_data.action == "reject":
@@ -1147,45 +2478,56 @@ async def session_action(
                 total_amount_due = (Decimal(billing_duration_seconds) / Decimal('60.0')) * Decimal(session.rate_per_minute)
                 total_amount_due = round(total_amount_due, 2)
 
-            # Fetch client's current balance
-            client_balance_record = await conn.fetchrow("SELECT balance FROM clients WHERE id = $1", session.client_id)
-            client_balance = Decimal(client_balance_record['balance']) if client_balance_record else Decimal('0.00')
-
-            amount_to_charge = min(total_amount_due, client_balance)
-            new_client_balance = client_balance - amount_to_charge
-
-            # Update client's balance
-            await conn.execute("UPDATE clients SET balance = $1 WHERE id = $2", new_client_balance, session.client_id)
-
-            # Update reading_sessions with total_amount and billing_duration
-            updated_session_data_dict = await conn.fetchrow(
-                """UPDATE reading_sessions
-                   SET status = 'completed', end_time = $1, billing_duration_seconds = $2, total_amount = $3, updated_at = NOW()
-                   WHERE id = $4 RETURNING *""",
-                end_time_utc, billing_duration_seconds, total_amount_due, session.id
-            )
-
-            # Reader Earnings
-            if reader_user_id and total_amount_due > 0 : # Ensure there's an amount to calculate earnings from
-                reader_share_percentage = Decimal('0.70') # 70% share for reader
-                # Base reader earnings on the actual amount charged to the client, or total_amount_due?
-                # For now, using total_amount_due, assuming platform might cover differences or it's an internal metric.
-                # If it should be based on what client *could* pay, use amount_to_charge.
-                amount_earned_by_reader = total_amount_due * reader_share_percentage
-                amount_earned_by_reader = round(amount_earned_by_reader, 2)
-
-                await conn.execute(
-                    """INSERT INTO reader_earnings
-                       (reader_id, session_id, total_session_amount, amount_earned, payout_status)
-                       VALUES ($1, $2, $3, $4, $5)""",
-                    session.reader_id, session.id, total_amount_due, amount_earned_by_reader, 'pending'
+            async with conn.transaction():
+                # Update reading_sessions with total_amount and billing_duration.
+                # The status guard makes a concurrent second "end" a no-op, and the
+                # row lock serialises this with an in-flight billing tick. The
+                # session row is locked before the client row, the same order
+                # as the billing batch and end_sessions_for_insufficient_funds.
+                updated_session_data_dict = await conn.fetchrow(
+                    """UPDATE reading_sessions
+                       SET status = 'completed', end_time = $1, billing_duration_seconds = $2, total_amount = $3, updated_at = NOW()
+                       WHERE id = $4 AND status = 'active' RETURNING *""",
+                    end_time_utc, billing_duration_seconds, total_amount_due, session.id
                 )
+                if not updated_session_data_dict:
+                    raise HTTPException(status_code=409, detail="Session is no longer active.")
+
+                # Settle the exact amount once: refund the unused hold or charge the shortfall
+                amount_collected = await settle_balance_hold(session.id, session.client_id, total_amount_due, conn)
+                amount_earned_by_reader = Decimal('0.00')
+
+                # Reader Earnings
+                if reader_user_id and amount_collected > 0: # Ensure there's an amount to calculate earnings from
+                    reader_share_percentage = Decimal('0.70') # 70% share for reader
+                    # Based on what was actually collected from the client (less than
+                    # total_amount_due when the balance ran short), so the platform's
+                    # leg of the ledger posting is never negative.
+                    amount_earned_by_reader = amount_collected * reader_share_percentage
+                    amount_earned_by_reader = round(amount_earned_by_reader, 2)
+
+                    await conn.execute(
+                        """INSERT INTO reader_earnings
+                           (reader_id, session_id, total_session_amount, amount_earned, payout_status)
+                           VALUES ($1, $2, $3, $4, $5)""",
+                        session.reader_id, session.id, total_amount_due, amount_earned_by_reader, 'pending'
+                    )
+
+                await append_ledger_entries(session_charge_transfer(
+                    session.id, session.client_id, session.reader_id, amount_collected, amount_earned_by_reader
+                ), conn)
+
+            # Stop local per-minute billing only once the end is committed, so a
+            # failed settlement leaves the session billed (the leader drops it on
+            # its next resync if it runs on another worker).
+            billing_scheduler.remove(session.id)
+            active_sessions.pop(session.id, None)
             
             notification_payload = {
                 "type": "session_ended",
                 "session_id": session.id,
                 "ended_by_role": current_user.role,
-                "total_amount": float(total_amount_due), # For notification clarity
+                "total_amount": total_amount_due,
                 "duration_seconds": billing_duration_seconds
             }
             target_notification_user_id = reader_user_id if current_user.id == client_user_id else client_user_id
@@ -1209,6 +2551,7 @@ async def session_action(
             if not updated_session_data_dict:
                  raise HTTPException(status_code=500, detail="Failed to retrieve session state after action.")
 
+        await broadcast_session_update(session.id, changed_fields(session_record, updated_session_data_dict))
         return ReadingSession(**updated_session_data_dict)
 
 @app.post("/api/payment/add-funds")
@@ -1242,7 +2585,8 @@ async def add_funds(
 async def confirm_payment(
     background_tasks: BackgroundTasks,
     payment_intent_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    identity: TokenIdentity = Depends(get_token_identity)
 ):
     """Confirm payment and add funds to account"""
     # user_id = current_user.id # This is users.id
@@ -1259,26 +2603,32 @@ async def confirm_payment(
             amount = payment_intent.amount / 100  # Convert from cents
             
             async with db_pool.acquire() as conn:
-                client_id_db = await get_client_id_from_user_id(current_user.id, conn)
+                client_id_db = await resolve_client_id(identity, conn)
                 if not client_id_db:
                     raise HTTPException(status_code=404, detail="Client profile not found for current user.")
 
-                # Add funds to client account using client_id_db
-                await conn.execute("""
-                    UPDATE clients 
-                    SET balance = balance + $1, updated_at = NOW()
-                    WHERE id = $2
-                """, Decimal(str(amount)), client_id_db) # Ensure amount is Decimal for DB
-                
-                # Get updated balance
+                # The top-up is a ledger transfer into the client's account. It is
+                # keyed by the PaymentIntent, so confirming twice only credits once.
+                amount_decimal = Decimal(str(amount)) # Ensure amount is Decimal for DB
+                entries = ledger_transfer(f"top_up:{payment_intent_id}", "top_up", payment_intent_id, [
+                    (EXTERNAL_PAYMENTS_ACCOUNT, -amount_decimal),
+                    (client_account(client_id_db), amount_decimal),
+                ])
                 new_balance = await conn.fetchval("""
-                    SELECT balance FROM clients WHERE id = $1
-                """, client_id_db)
+                    WITH journaled AS (
+                        INSERT INTO ledger_entries (transfer_id, account, amount, entry_type, reference_id)
+                        SELECT * FROM unnest($2::text[], $3::text[], $4::numeric[], $5::text[], $6::text[])
+                        ON CONFLICT (transfer_id, account) DO NOTHING
+                        RETURNING account, amount
+                    )
+                    -- The statement's own inserts are not visible to ledger_balance
+                    SELECT ledger_balance($1) + COALESCE((SELECT SUM(amount) FROM journaled WHERE account = $1), 0.00)
+                """, client_account(client_id_db), *(list(column) for column in zip(*entries)))
                 
                 return {
                     "status": "success",
                     "amount_added": amount,
-                    "new_balance": float(new_balance)
+                    "new_balance": new_balance
                 }
         else:
             raise HTTPException(status_code=400, detail="Payment not successful")
@@ -1303,8 +2653,7 @@ async def webrtc_signaling(websocket: WebSocket, room_id: str, user_id_param: st
 
     authenticated_user_id_from_token = None
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        token_sub_user_id: str = payload.get("sub")
+        token_sub_user_id: str = decode_access_token(token).user_id
 
         if token_sub_user_id is None or token_sub_user_id != user_id_param:
             await websocket.close(code=1008) # Policy Violation
@@ -1346,9 +2695,293 @@ async def webrtc_signaling(websocket: WebSocket, room_id: str, user_id_param: st
             await signaling_server.leave_room(authenticated_user_id_from_token)
             logger.info(f"Cleaned up WebRTC WebSocket connection for user {authenticated_user_id_from_token} in room {room_id}")
 
+class ClientConnection:
+    """A notification WebSocket with its own outbound queue and writer task.
+
+    enqueue() never waits on the network: messages are queued as already
+    serialized text and the writer task sends them in order, so a slow client
+    only delays its own messages.
+    """
+
+    def __init__(self, hub: "WebSocketHub", user_id: str, websocket: WebSocket):
+        self.hub = hub
+        self.user_id = user_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.topics: Set[str] = set()
+        # While a replay is being prepared, live inbox notifications wait in
+        # held; afterwards the ones the replay already covered are skipped
+        self.held: Optional[List[tuple]] = None
+        self.replayed_through = 0
+        self.over_high_water_since: Optional[float] = None
+        self.closed = False
+        self._writer = asyncio.create_task(self._write())
+
+    def enqueue(self, text: str) -> bool:
+        if self.closed:
+            return False
+        depth = self.queue.qsize()
+        if depth >= self.hub.high_water:
+            now = time.monotonic()
+            if self.over_high_water_since is None:
+                self.over_high_water_since = now
+            if depth >= self.hub.max_queue or now - self.over_high_water_since > self.hub.slow_consumer_seconds:
+                self.hub.evict(self)
+                return False
+        else:
+            self.over_high_water_since = None
+        self.queue.put_nowait(text)
+        self.hub.enqueued += 1
+        return True
+
+    def enqueue_notification(self, seq: Optional[int], text: str) -> bool:
+        if seq is not None:
+            if self.held is not None:
+                self.held.append((seq, text))
+                return True
+            if seq <= self.replayed_through:
+                return False
+        return self.enqueue(text)
+
+    def start_replay(self):
+        self.held = []
+
+    def finish_replay(self, through: int):
+        held, self.held = self.held or [], None
+        self.replayed_through = through
+        for seq, text in sorted(held, key=lambda item: item[0]):
+            if seq > through:
+                self.enqueue(text)
+
+    async def _write(self):
+        try:
+            while True:
+                text = await self.queue.get()
+                await self.websocket.send_text(text)
+                self.hub.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.hub.send_failures += 1
+            logger.info(f"WebSocket send to user {self.user_id} failed, dropping the connection: {e}")
+            self.hub.disconnect(self)
+
+    def stop(self):
+        self.closed = True
+        self._writer.cancel()
+
+class WebSocketHub:
+    """The notification WebSockets connected to this worker, one per user.
+
+    Besides direct messages to a user, connections can subscribe to topics
+    (see TOPIC_PATTERN). publish() sends to a topic's subscribers only, and
+    merges the "changes" of messages for the same entity that arrive within
+    coalesce_seconds into one delivery.
+    """
+
+    def __init__(self, high_water: int = WS_SEND_QUEUE_HIGH_WATER, max_queue: int = WS_SEND_QUEUE_MAX,
+                 slow_consumer_seconds: float = WS_SLOW_CONSUMER_SECONDS,
+                 max_subscriptions: int = WS_MAX_SUBSCRIPTIONS, coalesce_seconds: float = WS_COALESCE_SECONDS):
+        self.high_water = high_water
+        self.max_queue = max_queue
+        self.slow_consumer_seconds = slow_consumer_seconds
+        self.max_subscriptions = max_subscriptions
+        self.coalesce_seconds = coalesce_seconds
+        self.connections: Dict[str, ClientConnection] = {}
+        self.topics: Dict[str, Set[ClientConnection]] = {}
+        self._pending: Dict[str, tuple] = {} # entity -> (topics, message) waiting for the next flush
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.enqueued = 0
+        self.sent = 0
+        self.send_failures = 0
+        self.evicted = 0
+        self.topic_messages = 0
+        self.topic_deliveries = 0
+        self.coalesced = 0
+        self.broadcast_ms = RunningStat()
+
+    def connect(self, user_id: str, websocket: WebSocket) -> ClientConnection:
+        previous = self.connections.get(user_id)
+        if previous:
+            # The newer socket replaces it; its client subscribes again
+            self.disconnect(previous)
+        connection = ClientConnection(self, user_id, websocket)
+        self.connections[user_id] = connection
+        return connection
+
+    def disconnect(self, connection: ClientConnection):
+        connection.stop()
+        for topic in list(connection.topics):
+            self.unsubscribe(connection, topic)
+        # A reconnect may already have replaced this connection
+        if self.connections.get(connection.user_id) is connection:
+            del self.connections[connection.user_id]
+
+    def evict(self, connection: ClientConnection):
+        self.evicted += 1
+        logger.warning(
+            f"Disconnecting slow WebSocket consumer {connection.user_id} with {connection.queue.qsize()} messages queued"
+        )
+        self.disconnect(connection)
+        asyncio.create_task(self._close(connection.websocket))
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=1013), self.slow_consumer_seconds) # 1013: try again later
+        except Exception:
+            pass
+
+    def send(self, user_id: str, text: str, seq: Optional[int] = None) -> bool:
+        connection = self.connections.get(user_id)
+        return connection.enqueue_notification(seq, text) if connection else False
+
+    def subscribe(self, connection: ClientConnection, topic: str) -> bool:
+        if topic not in connection.topics:
+            if len(connection.topics) >= self.max_subscriptions:
+                return False
+            connection.topics.add(topic)
+            self.topics.setdefault(topic, set()).add(connection)
+        return True
+
+    def unsubscribe(self, connection: ClientConnection, topic: str):
+        connection.topics.discard(topic)
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self.topics[topic]
+
+    def publish(self, entity: Optional[str], topics: List[str], message: dict):
+        """Send message to the subscribers of any of topics, once per connection.
+
+        Messages without an entity (one-off events such as gifts) go out
+        immediately. Messages for an entity carry a "changes" dict; they are
+        held for coalesce_seconds and merged with later changes to the same
+        entity, so a burst of updates costs each subscriber one message.
+        """
+        if entity is None:
+            self._deliver(topics, message)
+            return
+        pending = self._pending.get(entity)
+        if pending is None:
+            self._pending[entity] = (set(topics), dict(message, changes=dict(message["changes"])))
+        else:
+            pending_topics, pending_message = pending
+            pending_topics.update(topics)
+            pending_message.update(message, changes={**pending_message["changes"], **message["changes"]})
+            self.coalesced += 1
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.coalesce_seconds, self.flush)
+
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        for topics, message in pending.values():
+            self._deliver(topics, message)
+
+    def _deliver(self, topics, message: dict):
+        subscribers = set()
+        for topic in topics:
+            subscribers.update(self.topics.get(topic, ()))
+        if not subscribers:
+            return
+        text = dumps_json(message) # Serialized once for every subscriber
+        for connection in subscribers:
+            connection.enqueue(text)
+        self.topic_messages += 1
+        self.topic_deliveries += len(subscribers)
+
+    def broadcast(self, text: str) -> int:
+        started = time.perf_counter()
+        delivered = sum(connection.enqueue(text) for connection in list(self.connections.values()))
+        self.broadcast_ms.observe((time.perf_counter() - started) * 1000)
+        return delivered
+
+    def metrics(self) -> dict:
+        depths = [connection.queue.qsize() for connection in self.connections.values()]
+        return {
+            "connections": len(self.connections),
+            "queued": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "send_failures": self.send_failures,
+            "evicted_slow_consumers": self.evicted,
+            "topics": len(self.topics),
+            "subscriptions": sum(len(subscribers) for subscribers in self.topics.values()),
+            "topic_messages": self.topic_messages,
+            "topic_deliveries": self.topic_deliveries,
+            "coalesced_updates": self.coalesced,
+            "broadcast_ms": self.broadcast_ms.snapshot(),
+        }
+
+websocket_hub = WebSocketHub()
+
+# readers: the available-readers listing; reader:{id}, stream:{id} and
+# session:{id}: one reader, live stream or reading session
+TOPIC_PATTERN = re.compile(r"^(readers|(reader|stream|session):[^:\s]{1,128})$")
+
+async def can_subscribe(identity: TokenIdentity, topic: str) -> bool:
+    if not TOPIC_PATTERN.match(topic):
+        return False
+    if topic.startswith("session:") and identity.role != "admin":
+        async with db_pool.acquire() as conn:
+            session = await statement_registry.fetchrow(conn, "session_with_participants", topic.split(":", 1)[1])
+        return bool(session) and identity.user_id in (session["client_user_id"], session["reader_user_id"])
+    return True
+
+async def handle_topic_request(connection: ClientConnection, identity: TokenIdentity, data: str) -> Optional[dict]:
+    """Apply a {"action": "subscribe" | "unsubscribe", "topics": [...]} message.
+
+    Returns the reply (an "error" frame if topics is not a list), or None
+    if data is not a subscription message.
+    """
+    try:
+        request = loads_json(data)
+    except ValueError:
+        return None
+    if not isinstance(request, dict) or request.get("action") not in ("subscribe", "unsubscribe"):
+        return None
+    topics = request.get("topics") or []
+    if not isinstance(topics, list):
+        return {"type": "error", "action": request["action"], "detail": "topics must be a list of strings"}
+    topics = [topic for topic in topics if isinstance(topic, str)]
+    if request["action"] == "unsubscribe":
+        for topic in topics:
+            websocket_hub.unsubscribe(connection, topic)
+        return {"type": "unsubscribed", "topics": topics}
+    accepted, rejected = [], []
+    for topic in topics:
+        if await can_subscribe(identity, topic) and websocket_hub.subscribe(connection, topic):
+            accepted.append(topic)
+        else:
+            rejected.append(topic)
+    return {"type": "subscribed", "topics": accepted, "rejected": rejected}
+
+async def replay_notifications(connection: ClientConnection, since: int):
+    """Send the notifications a reconnecting client missed after seq since as one message."""
+    connection.start_replay()
+    notifications, complete, reset = [], False, False
+    try:
+        notifications, complete, reset = await notification_inbox.replay(connection.user_id, since)
+    except Exception as e:
+        logger.error(f"Notification replay failed for user {connection.user_id}: {e}")
+    through = notifications[-1]["seq"] if notifications else (0 if reset else since)
+    connection.enqueue(dumps_json({
+        "type": "notifications",
+        "notifications": notifications,
+        "last_seq": through,
+        "complete": complete, # False: older ones were left out, refresh instead
+        "reset": reset # True: last_seq went backwards, the client must adopt it
+    }))
+    connection.finish_replay(through)
+
 # WebSocket for real-time notifications
 @app.websocket("/api/ws/{user_id_param}") # Renamed path param to avoid conflict with var name
-async def websocket_endpoint(websocket: WebSocket, user_id_param: str, token: Optional[str] = Query(None)):
+async def websocket_endpoint(websocket: WebSocket, user_id_param: str, token: Optional[str] = Query(None),
+                             since: Optional[int] = Query(None, ge=0)):
     if not token:
         await websocket.close(code=1008) # Policy Violation or use custom 4000-4999 range
         logger.warning(f"WS connection attempt by {user_id_param} without token.")
@@ -1356,8 +2989,8 @@ async def websocket_endpoint(websocket: WebSocket, user_id_param: str, token: Op
 
     authenticated_user_id = None
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        token_user_id: str = payload.get("sub")
+        identity = decode_access_token(token)
+        token_user_id: str = identity.user_id
 
         if token_user_id is None or token_user_id != user_id_param:
             await websocket.close(code=1008) # Policy Violation
@@ -1384,57 +3017,481 @@ async def websocket_endpoint(websocket: WebSocket, user_id_param: str, token: Op
 
     await websocket.accept()
     logger.info(f"WebSocket connection established for user {authenticated_user_id}")
-    websocket_connections[authenticated_user_id] = websocket
+    connection = websocket_hub.connect(authenticated_user_id, websocket)
     
     try:
+        if since is not None:
+            await replay_notifications(connection, since)
         while True:
             data = await websocket.receive_text()
             logger.debug(f"Received WebSocket message from {authenticated_user_id}: {data}")
-            # Echoing back can be a simple pong or for debugging.
-            # Consider if specific client messages need server processing.
-            await websocket.send_text(json.dumps({"type": "pong", "echo": data}))
+            reply = await handle_topic_request(connection, identity, data)
+            # Anything else is echoed back as a pong
+            connection.enqueue(dumps_json(reply) if reply else json.dumps({"type": "pong", "echo": data}))
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for user {authenticated_user_id}")
     except Exception as e:
         logger.error(f"Error in WebSocket for user {authenticated_user_id}: {e}")
     finally:
-        if authenticated_user_id and authenticated_user_id in websocket_connections:
-            del websocket_connections[authenticated_user_id]
-            logger.info(f"Cleaned up WebSocket connection for user {authenticated_user_id}")
+        websocket_hub.disconnect(connection)
+        logger.info(f"Cleaned up WebSocket connection for user {authenticated_user_id}")
+
+class EventBus:
+    """Cross-worker delivery of WebSocket events over Postgres LISTEN/NOTIFY.
+
+    An event is published once with pg_notify on EVENT_BUS_CHANNEL. Every
+    worker, the publisher included, LISTENs on a dedicated connection and
+    hands each event to the handler registered for its kind, which delivers it
+    to the sockets that worker holds. Publishes are queued and sent in batches
+    over the same connection, so callers never wait for a pool connection.
+
+    While the listener is down (or for payloads over Postgres' NOTIFY limit)
+    events are delivered to this worker's sockets only, so a single worker
+    keeps working without the bus. Events sent while a worker was disconnected
+    are not replayed; the "reconnected" handlers resync what can be resynced.
+    """
 
-# Helper functions for WebSocket notifications (generic and specific)
-async def notify_user(user_id: str, message_data: dict) -> bool:
-    """Send a JSON message to a specific user via WebSocket if connected."""
-    websocket = websocket_connections.get(user_id)
-    if websocket:
+    MAX_PAYLOAD_BYTES = 7999 # NOTIFY payloads must be shorter than 8000 bytes
+    MAX_BATCH = 100
+
+    def __init__(self, dsn: Optional[str] = DATABASE_URL, channel: str = EVENT_BUS_CHANNEL,
+                 health_check_seconds: float = EVENT_BUS_HEALTH_CHECK_SECONDS,
+                 reconnect_max_seconds: float = EVENT_BUS_RECONNECT_MAX_SECONDS):
+        self.dsn = dsn
+        self.channel = channel
+        self.health_check_seconds = health_check_seconds
+        self.reconnect_max_seconds = reconnect_max_seconds
+        self.worker_id = uuid.uuid4().hex
+        self.handlers: Dict[str, Any] = {} # kind -> async handler(event)
+        self.listening = False
+        self._conn = None
+        self._conn_lock: Optional[asyncio.Lock] = None
+        self._lost: Optional[asyncio.Event] = None
+        self._outbox: Optional[asyncio.Queue] = None # (event, payload) waiting to be sent
+        self._inbox: Optional[asyncio.Queue] = None # received events waiting for their handler
+        self._tasks: List[asyncio.Task] = []
+        self._seq = 0
+        self.published = 0
+        self.received = 0
+        self.local_deliveries = 0
+        self.oversized = 0
+        self.publish_failures = 0
+        self.handler_errors = 0
+        self.reconnects = 0
+        self.publish_ms = RunningStat()
+
+    def handle(self, kind: str, handler):
+        self.handlers[kind] = handler
+
+    async def start(self):
+        self._conn_lock = asyncio.Lock()
+        self._outbox = asyncio.Queue()
+        self._inbox = asyncio.Queue()
         try:
-            await websocket.send_text(json.dumps(message_data))
-            logger.info(f"Sent WebSocket message to user {user_id}. Type: {message_data.get('type')}")
-            return True
+            await self._connect()
         except Exception as e:
-            logger.error(f"Error sending WebSocket message to user {user_id}: {e}")
-            # Optionally remove stale connection here or let the disconnect handler do it
-            # if user_id in websocket_connections: del websocket_connections[user_id]
-    else:
-        logger.warning(f"User {user_id} not connected for WebSocket message. Type: {message_data.get('type')}")
+            logger.error(f"Event bus listener unavailable, delivering events locally: {e}")
+        self._tasks = [
+            asyncio.create_task(self._run()),
+            asyncio.create_task(self._publish_loop()),
+            asyncio.create_task(self._dispatch_loop()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self._disconnect()
+
+    async def _connect(self):
+        conn = await asyncpg.connect(self.dsn)
+        self._lost = asyncio.Event()
+        conn.add_termination_listener(lambda _conn: self._lost.set())
+        await conn.add_listener(self.channel, self._on_notification)
+        self._conn = conn
+        self.listening = True
+
+    async def _disconnect(self):
+        self.listening = False
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            try:
+                await asyncio.wait_for(conn.close(), self.health_check_seconds)
+            except Exception:
+                conn.terminate()
+
+    async def _run(self):
+        backoff = 1.0
+        while True:
+            try:
+                if not self.listening:
+                    await self._connect()
+                    self.reconnects += 1
+                    backoff = 1.0
+                    logger.info(f"Event bus listener reconnected on channel {self.channel}")
+                    self._inbox.put_nowait({"kind": "reconnected", "origin": self.worker_id})
+                try:
+                    await asyncio.wait_for(self._lost.wait(), self.health_check_seconds)
+                    raise ConnectionError("listener connection closed")
+                except asyncio.TimeoutError:
+                    async with self._conn_lock:
+                        await self._conn.fetchval("SELECT 1", timeout=self.health_check_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.listening:
+                    logger.warning(f"Event bus listener lost, delivering events locally until it reconnects: {e}")
+                await self._disconnect()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.reconnect_max_seconds)
+
+    async def publish(self, kind: str, **fields):
+        """Publish an event to every worker. Returns once it is queued."""
+        self._seq += 1
+        # The sequence number also keeps Postgres from folding identical
+        # payloads sent in one batch into a single notification
+        event = {"kind": kind, "origin": self.worker_id, "seq": self._seq, **fields}
+        if not self.listening:
+            await self._deliver_locally(event)
+            return
+        payload = dumps_json(event)
+        if len(payload.encode()) > self.MAX_PAYLOAD_BYTES:
+            self.oversized += 1
+            logger.warning(f"Event {kind} is {len(payload.encode())} bytes, over the NOTIFY limit; delivering locally")
+            await self._deliver_locally(event)
+            return
+        self._outbox.put_nowait((event, payload))
+
+    async def _publish_loop(self):
+        while True:
+            batch = [await self._outbox.get()]
+            while len(batch) < self.MAX_BATCH and not self._outbox.empty():
+                batch.append(self._outbox.get_nowait())
+            started = time.perf_counter()
+            try:
+                async with self._conn_lock:
+                    if not self.listening:
+                        raise ConnectionError("listener not connected")
+                    await self._conn.execute(
+                        "SELECT pg_notify($1, payload) FROM unnest($2::text[]) WITH ORDINALITY AS p(payload, n) ORDER BY n",
+                        self.channel, [payload for _, payload in batch],
+                    )
+                self.published += len(batch)
+                self.publish_ms.observe((time.perf_counter() - started) * 1000)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.publish_failures += len(batch)
+                logger.error(f"Event bus publish failed, delivering {len(batch)} events locally: {e}")
+                for event, _ in batch:
+                    await self._deliver_locally(event)
+
+    def _on_notification(self, conn, pid, channel, payload):
+        self.received += 1
+        try:
+            self._inbox.put_nowait(loads_json(payload))
+        except ValueError as e:
+            logger.error(f"Dropping malformed event bus payload: {e}")
+
+    async def _dispatch_loop(self):
+        while True:
+            await self._dispatch(await self._inbox.get())
+
+    async def _deliver_locally(self, event: dict):
+        self.local_deliveries += 1
+        await self._dispatch(event)
+
+    async def _dispatch(self, event: dict):
+        handler = self.handlers.get(event.get("kind"))
+        if handler is None:
+            return
+        try:
+            await handler(event)
+        except Exception as e:
+            self.handler_errors += 1
+            logger.error(f"Event bus handler for {event.get('kind')} failed: {e}")
+
+    def metrics(self) -> dict:
+        return {
+            "channel": self.channel,
+            "listening": self.listening,
+            "reconnects": self.reconnects,
+            "published": self.published,
+            "received": self.received,
+            "local_deliveries": self.local_deliveries,
+            "oversized": self.oversized,
+            "publish_failures": self.publish_failures,
+            "handler_errors": self.handler_errors,
+            "pending_publish": self._outbox.qsize() if self._outbox else 0,
+            "pending_dispatch": self._inbox.qsize() if self._inbox else 0,
+            "publish_ms": self.publish_ms.snapshot(),
+        }
+
+event_bus = EventBus()
+
+class NotificationInbox:
+    """Per-user, sequenced log of direct WebSocket notifications.
+
+    record() numbers a notification and stores it before it is published, so
+    it survives the user being offline. Every worker also keeps the last
+    ring_size notifications of recently notified users in memory, filled from
+    the event bus; replay() answers from that ring when it holds everything
+    from the client's last seq up to the user's latest one, and from the
+    table otherwise.
+
+    It uses a small pool of its own: notify_user is mostly called while the
+    caller holds a db_pool connection, and waiting on a second one from the
+    same pool could exhaust it.
+    """
+
+    def __init__(self, dsn: Optional[str] = DATABASE_URL, pool_size: int = NOTIFICATION_POOL_SIZE, ring_size: int = NOTIFICATION_RING_SIZE, ring_users: int = NOTIFICATION_RING_USERS,
+                 replay_max: int = NOTIFICATION_REPLAY_MAX, retention_days: int = NOTIFICATION_RETENTION_DAYS,
+                 prune_seconds: float = NOTIFICATION_PRUNE_SECONDS):
+        self.ring_size = ring_size
+        self.ring_users = ring_users
+        self.replay_max = replay_max
+        self.retention_days = retention_days
+        self.prune_seconds = prune_seconds
+        self.dsn = dsn
+        self.pool_size = pool_size
+        self.pool = None
+        self.rings: "OrderedDict[str, deque]" = OrderedDict() # user_id -> contiguous run of recent notifications
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.record_failures = 0
+        self.ring_replays = 0
+        self.db_replays = 0
+        self.replayed = 0
+        self.pruned = 0
+        self.record_ms = RunningStat()
+
+    async def start(self):
+        self.pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=1,
+            max_size=self.pool_size,
+            statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+            init=init_connection,
+        )
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.prune_seconds)
+            try:
+                await self.prune()
+            except Exception as e:
+                logger.error(f"Error pruning notification inbox: {e}")
+
+    async def prune(self) -> int:
+        async with self.pool.acquire() as conn:
+            status = await conn.execute(
+                "DELETE FROM user_notifications WHERE created_at < NOW() - make_interval(days => $1)",
+                self.retention_days
+            )
+        deleted = int(status.split()[-1])
+        self.pruned += deleted
+        return deleted
+
+    async def record(self, user_id: str, message: dict) -> dict:
+        """Store message in user_id's inbox and return it with its "seq".
+
+        If it cannot be stored, or the inbox was never started (scripts that
+        drive the app without its lifespan), the message is returned
+        unnumbered and is only delivered live.
+        """
+        if self.pool is None:
+            return message
+        started = time.perf_counter()
+        try:
+            async with self.pool.acquire() as conn:
+                seq = await conn.fetchval("""
+                    WITH next AS (
+                        INSERT INTO user_notification_sequences AS s (user_id, last_seq) VALUES ($1, 1)
+                        ON CONFLICT (user_id) DO UPDATE SET last_seq = s.last_seq + 1
+                        RETURNING last_seq
+                    )
+                    INSERT INTO user_notifications (user_id, seq, payload)
+                    SELECT $1, last_seq, $2 FROM next
+                    RETURNING seq
+                """, user_id, message)
+        except Exception as e:
+            self.record_failures += 1
+            logger.error(f"Could not record notification {message.get('type')} for user {user_id}: {e}")
+            return message
+        self.recorded += 1
+        self.record_ms.observe((time.perf_counter() - started) * 1000)
+        return dict(message, seq=seq)
+
+    def remember(self, user_id: str, message: dict):
+        ring = self.rings.get(user_id)
+        if ring is None:
+            ring = self.rings[user_id] = deque(maxlen=self.ring_size)
+            if len(self.rings) > self.ring_users:
+                self.rings.popitem(last=False)
+        else:
+            self.rings.move_to_end(user_id)
+            if message["seq"] <= ring[-1]["seq"]:
+                return # Already superseded by a later notification; the ring still starts after it
+            if message["seq"] != ring[-1]["seq"] + 1:
+                ring.clear() # Missed one (published while a listener was down): restart the run here
+        ring.append(message)
+
+    def forget_all(self):
+        """Drop the rings, e.g. after notifications may have been missed."""
+        self.rings.clear()
+
+    async def replay(self, user_id: str, since: int) -> tuple:
+        """Notifications after since, oldest first, at most replay_max of them.
+
+        Returns (notifications, complete, reset); complete is False when older
+        notifications were left out to stay within replay_max, and reset is
+        True when since was ahead of the user's latest seq (e.g. the database
+        was restored) and the replay started over from 0.
+        """
+        async with self.pool.acquire() as conn: # The primary: a replica may not have the latest yet
+            latest = await statement_registry.fetchval(conn, "notification_last_seq", user_id) or 0
+            reset = since > latest
+            if reset:
+                since = 0
+            ring = self.rings.get(user_id)
+            # A ring run is contiguous, but it can stop short of the latest seq:
+            # a notification delivered locally on another worker while the
+            # event bus was down never reached it.
+            if ring and ring[0]["seq"] <= since + 1 and ring[-1]["seq"] >= latest:
+                notifications = [message for message in ring if message["seq"] > since]
+                self.ring_replays += 1
+            elif since >= latest:
+                notifications = []
+            else:
+                records = await statement_registry.fetch(conn, "notifications_since", user_id, since, self.replay_max + 1)
+                notifications = [dict(record["payload"], seq=record["seq"]) for record in reversed(records)]
+                self.db_replays += 1
+        complete = len(notifications) <= self.replay_max
+        notifications = notifications[-self.replay_max:]
+        self.replayed += len(notifications)
+        return notifications, complete, reset
+
+    def metrics(self) -> dict:
+        return {
+            "recorded": self.recorded,
+            "record_failures": self.record_failures,
+            "record_ms": self.record_ms.snapshot(),
+            "ring_users": len(self.rings),
+            "ring_replays": self.ring_replays,
+            "db_replays": self.db_replays,
+            "replayed": self.replayed,
+            "pruned": self.pruned,
+        }
+
+notification_inbox = NotificationInbox()
+
+# Helper functions for WebSocket notifications (generic and specific)
+def send_to_local_user(user_id: str, message_data: dict) -> bool:
+    """Queue a JSON message for a user's WebSocket if it is connected to this worker."""
+    if websocket_hub.send(user_id, dumps_json(message_data), message_data.get("seq")):
+        logger.info(f"Queued WebSocket message for user {user_id}. Type: {message_data.get('type')}")
+        return True
     return False
 
-async def broadcast_reader_status_change(reader_data: dict):
-    """Notify all connected clients of reader status change"""
-    message = {
+async def notify_user(user_id: str, message_data: dict):
+    """Send a JSON message to a user's WebSocket, on whichever worker holds it.
+
+    The message is recorded in the user's notification inbox first and carries
+    its "seq", so a user who is offline gets it when they reconnect.
+    """
+    message = await notification_inbox.record(user_id, message_data)
+    await event_bus.publish("user", user_id=user_id, message=message)
+
+async def publish_topic_update(entity: Optional[str], topics: List[str], message: dict):
+    """Send a JSON message to the subscribers of topics, on every worker.
+
+    Messages about an entity carry only its changed fields under "changes";
+    see WebSocketHub.publish for coalescing.
+    """
+    await event_bus.publish("topic", entity=entity, topics=topics, message=message)
+
+def changed_fields(previous, current) -> dict:
+    """Columns of current whose value differs from previous (both row mappings)."""
+    return {key: value for key, value in current.items() if previous[key] != value}
+
+async def deliver_user_event(event: dict):
+    if "seq" in event["message"]:
+        notification_inbox.remember(event["user_id"], event["message"])
+    send_to_local_user(event["user_id"], event["message"])
+
+async def deliver_topic_event(event: dict):
+    websocket_hub.publish(event["entity"], event["topics"], event["message"])
+
+async def refresh_reader_from_event(event: dict):
+    # The publishing worker refreshed its directory (and user cache) before publishing
+    if event["origin"] != event_bus.worker_id:
+        if event.get("user_id"): # Set when the change also affects the cached User
+            user_cache.invalidate(event["user_id"])
+        async with db_pool.acquire() as conn:
+            await reader_directory.refresh_reader(event["reader_id"], conn)
+
+async def record_write_event(event: dict):
+    replica_router.record_write(event["user_id"])
+
+async def apply_revocation_event(event: dict):
+    if event["origin"] != event_bus.worker_id:
+        token_revocations.apply(event["user_id"], event["revoked_before"])
+        user_cache.invalidate(event["user_id"])
+
+async def resync_after_reconnect(event: dict):
+    # Reader changes, notifications, writes and revocations published while the listener was down were missed
+    replica_router.missed_writes()
+    notification_inbox.forget_all()
+    async with db_pool.acquire() as conn:
+        await reader_directory.load(conn)
+        await token_revocations.load(conn)
+
+event_bus.handle("user", deliver_user_event)
+event_bus.handle("topic", deliver_topic_event)
+event_bus.handle("reader", refresh_reader_from_event)
+event_bus.handle("write", record_write_event)
+event_bus.handle("revocation", apply_revocation_event)
+event_bus.handle("reconnected", resync_after_reconnect)
+
+async def broadcast_reader_status_change(reader_id: str, changes: dict):
+    """Send a reader's changed fields to the readers and reader:{id} subscribers."""
+    await publish_topic_update(f"reader:{reader_id}", ["readers", f"reader:{reader_id}"], {
         "type": "reader_status_change",
-        "data": reader_data
-    }
-    # Create a copy of user_ids to avoid issues if websocket_connections is modified during iteration
-    connected_user_ids = list(websocket_connections.keys())
-    for user_id in connected_user_ids:
-        await notify_user(user_id, message)
+        "reader_id": reader_id,
+        "changes": changes
+    })
+
+async def broadcast_session_update(session_id: str, changes: dict):
+    """Send a session's changed fields to the session:{id} subscribers."""
+    await publish_topic_update(f"session:{session_id}", [f"session:{session_id}"], {
+        "type": "session_update",
+        "session_id": session_id,
+        "changes": changes
+    })
 
 
 async def notify_reader_session_request(reader_id_db: str, session_data_for_notification: dict):
     """Notify a specific reader of an incoming session request using their database ID."""
-    async with db_pool.acquire() as conn: # Acquire connection for the helper
-        reader_user_id = await get_user_id_from_reader_id(reader_id_db, conn)
+    reader_user_id = await get_user_id_from_reader_id(reader_id_db)
     
     if reader_user_id:
         # The actual message content for "new_session_request" will be constructed in /api/session/request
@@ -1450,164 +3507,560 @@ async def notify_reader_session_request(reader_id_db: str, session_data_for_noti
 # For now, assuming it might be used by other logic, so keeping.
 async def get_reader_user_id(reader_id: str) -> Optional[str]:
     """Get user_id for a reader. DEPRECATED if get_user_id_from_reader_id is used consistently."""
-    async with db_pool.acquire() as conn:
-        result = await conn.fetchval("SELECT user_id FROM readers WHERE id = $1", reader_id)
-        return result
+    return await get_user_id_from_reader_id(reader_id)
 
 # Session billing functions
-async def start_session_billing(session_id: str, session_data: dict):
-    """Start billing for an active session"""
-    active_sessions[session_id] = {
+class BillingTimerWheel:
+    """Hashed timer wheel of session ids keyed by their next bill time.
+
+    Each slot covers one tick; a session due at time T lives in slot
+    ceil(T / tick) % slot_count, so a tick only has to look at one slot.
+    Sessions whose due tick lies more than one revolution ahead stay in
+    their slot until the wheel comes round again.
+    """
+
+    def __init__(self, tick_seconds: float, slot_count: int, now: float):
+        self.tick_seconds = tick_seconds
+        self.slots: List[Set[str]] = [set() for _ in range(slot_count)]
+        self.due_ticks: Dict[str, int] = {}
+        self.current_tick = self._tick_of(now)
+
+    def _tick_of(self, timestamp: float) -> int:
+        return int(timestamp // self.tick_seconds)
+
+    def __len__(self) -> int:
+        return len(self.due_ticks)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self.due_ticks
+
+    def schedule(self, session_id: str, due_at: float):
+        self.cancel(session_id)
+        # Round up so a session never fires before its due time, and never
+        # land in a slot the wheel has already swept.
+        due_tick = max(math.ceil(due_at / self.tick_seconds), self.current_tick + 1)
+        self.due_ticks[session_id] = due_tick
+        self.slots[due_tick % len(self.slots)].add(session_id)
+
+    def cancel(self, session_id: str):
+        due_tick = self.due_ticks.pop(session_id, None)
+        if due_tick is not None:
+            self.slots[due_tick % len(self.slots)].discard(session_id)
+
+    def pop_due(self, now: float) -> List[str]:
+        """Remove and return every session whose due time is <= now."""
+        now_tick = self._tick_of(now)
+        if now_tick <= self.current_tick:
+            return []
+        # After a long stall sweep each slot at most once.
+        steps = min(now_tick - self.current_tick, len(self.slots))
+        due = []
+        for offset in range(1, steps + 1):
+            slot = self.slots[(self.current_tick + offset) % len(self.slots)]
+            ready = [sid for sid in slot if self.due_ticks[sid] <= now_tick]
+            for session_id in ready:
+                slot.discard(session_id)
+                del self.due_ticks[session_id]
+            due.extend(ready)
+        self.current_tick = now_tick
+        return due
+
+class BillingScheduler:
+    """Single background loop that bills all due per-minute sessions.
+
+    Replaces the one-task-per-session model: sessions are registered in a
+    timer wheel and every tick settles the whole due batch with one
+    set-based statement (see settle_billing_batch).
+    """
+
+    def __init__(self, interval_seconds: int = BILLING_INTERVAL_SECONDS,
+                 tick_seconds: float = BILLING_TICK_SECONDS, clock=time.time,
+                 resync_seconds: float = BILLING_RESYNC_SECONDS):
+        self.interval_seconds = interval_seconds
+        self.tick_seconds = tick_seconds
+        self.clock = clock
+        self.resync_seconds = resync_seconds
+        self.is_leader = False
+        self._leader_conn = None
+        self._last_resync = 0.0
+        self.recovery_duration_ms = RunningStat()
+        slot_count = max(1, math.ceil(interval_seconds / tick_seconds))
+        self.wheel = BillingTimerWheel(tick_seconds, slot_count, clock())
+        self.tick_duration_ms = RunningStat()
+        self.batch_size = RunningStat()
+        self.sessions_billed = 0
+        self.sessions_exhausted = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, session_id: str, due_at: float):
+        self.wheel.schedule(session_id, due_at)
+
+    def remove(self, session_id: str):
+        self.wheel.cancel(session_id)
+
+    def reschedule(self, session_ids: List[str]) -> int:
+        """Put active sessions missing from the wheel back at their next bill time."""
+        restored = 0
+        for session_id in session_ids:
+            billing_data = active_sessions.get(session_id)
+            if billing_data is not None and session_id not in self.wheel:
+                self.wheel.schedule(session_id, billing_data['next_bill_at'])
+                restored += 1
+        return restored
+
+    async def start(self):
+        if self._task is None:
+            try:
+                await self._ensure_leadership()
+            except Exception as e:
+                logger.error(f"Billing leadership check failed at startup: {str(e)}")
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Billing scheduler started (leader: {self.is_leader})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._leader_conn is not None:
+            await self._leader_conn.close()
+            self._leader_conn = None
+            self.is_leader = False
+
+    async def _ensure_leadership(self) -> bool:
+        """Hold the billing advisory lock on a dedicated connection.
+
+        The lock is released by Postgres when the connection drops, so a
+        crashed leader is replaced on the next attempt by another worker.
+        """
+        if self.is_leader and self._leader_conn is not None and not self._leader_conn.is_closed():
+            return True
+        if self.is_leader:
+            logger.warning("Lost billing leader connection, clearing local schedule")
+            self._reset()
+        if self._leader_conn is None or self._leader_conn.is_closed():
+            self._leader_conn = await asyncpg.connect(DATABASE_URL)
+        self.is_leader = await self._leader_conn.fetchval(
+            "SELECT pg_try_advisory_lock($1)", BILLING_LEADER_LOCK_KEY
+        )
+        if self.is_leader:
+            logger.info("Acquired billing leadership")
+            await recover_billing_sessions()
+            self._last_resync = self.clock()
+        return self.is_leader
+
+    def _reset(self):
+        self.is_leader = False
+        for session_id in list(active_sessions):
+            self.wheel.cancel(session_id)
+        active_sessions.clear()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            try:
+                if not await self._ensure_leadership():
+                    continue
+                if self.clock() - self._last_resync >= self.resync_seconds:
+                    await recover_billing_sessions()
+                    self._last_resync = self.clock()
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Error in billing scheduler tick: {str(e)}")
+
+    async def tick(self):
+        """Settle every session that is due at the current clock time."""
+        started = time.perf_counter()
+        now = self.clock()
+        due_ids = [sid for sid in self.wheel.pop_due(now) if sid in active_sessions]
+        if due_ids:
+            try:
+                exhausted = await settle_billing_batch(due_ids, now)
+            except Exception:
+                # Popped sessions would otherwise never be billed again
+                self.reschedule(due_ids)
+                raise
+            self.sessions_billed += len(due_ids) - len(exhausted)
+            self.sessions_exhausted += len(exhausted)
+        self.batch_size.observe(len(due_ids))
+        self.tick_duration_ms.observe((time.perf_counter() - started) * 1000)
+
+    def metrics(self) -> dict:
+        return {
+            "is_leader": self.is_leader,
+            "scheduled_sessions": len(self.wheel),
+            "recovery_duration_ms": self.recovery_duration_ms.snapshot(),
+            "tick_duration_ms": self.tick_duration_ms.snapshot(),
+            "batch_size": self.batch_size.snapshot(),
+            "sessions_billed": self.sessions_billed,
+            "sessions_exhausted": self.sessions_exhausted,
+        }
+
+# Global billing scheduler instance (started in lifespan)
+billing_scheduler = BillingScheduler()
+
+def _utc_timestamp(value: datetime) -> float:
+    """Epoch seconds for a naive-UTC (or aware) datetime from the database."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def register_billing_session(session_id: str, client_id: str, reader_id: str, rate_per_minute,
+                             start_time: datetime, last_billed_at: datetime, total_billed,
+                             amount_held) -> dict:
+    """Put a session in the in-memory billing state and schedule its next charge.
+
+    Per-minute charges are consumed from the session's hold in memory; the
+    database is only written when the hold has to be extended.
+    """
+    billing_data = {
         "session_id": session_id,
-        "client_id": session_data['client_id'],
-        "reader_id": session_data['reader_id'],
-        "rate_per_minute": session_data['rate_per_minute'],
-        "start_time": datetime.now(),
-        "last_bill_time": datetime.now(),
-        "total_billed": 0.0
+        "client_id": client_id,
+        "reader_id": reader_id,
+        "rate_per_minute": Decimal(str(rate_per_minute)),
+        "start_time": start_time,
+        "last_bill_time": last_billed_at,
+        "next_bill_at": _utc_timestamp(last_billed_at) + billing_scheduler.interval_seconds,
+        "total_billed": Decimal(str(total_billed)),
+        "amount_held": Decimal(str(amount_held)),
+        "hold_remaining": Decimal(str(amount_held)) - Decimal(str(total_billed))
     }
-    
-    # Start background billing task
-    asyncio.create_task(bill_session_minutes(session_id))
+    active_sessions[session_id] = billing_data
+    billing_scheduler.add(session_id, billing_data['next_bill_at'])
+    return billing_data
+
+async def start_session_billing(session_id: str, session_data: dict):
+    """Start billing for an active session"""
+    if not billing_scheduler.is_leader:
+        # The leader worker picks the session up on its next resync
+        logger.info(f"Session {session_id} will be billed by the billing leader")
+        return
+    start_time = session_data.get('start_time') or datetime.utcfromtimestamp(billing_scheduler.clock())
+    register_billing_session(
+        session_id, session_data['client_id'], session_data['reader_id'],
+        session_data['rate_per_minute'], start_time, start_time, Decimal('0.00'),
+        session_data.get('amount_held', Decimal('0.00'))
+    )
     logger.info(f"Started billing for session {session_id}")
 
-async def end_session_billing(session_id: str, session_data: dict) -> dict:
-    """End billing for a session and finalize charges"""
-    if session_id in active_sessions:
-        billing_data = active_sessions[session_id]
-        end_time = datetime.now()
-        
-        # Calculate final minutes and amount
-        total_seconds = (end_time - billing_data['start_time']).total_seconds()
-        total_minutes = total_seconds / 60.0
-        total_amount = total_minutes * billing_data['rate_per_minute']
-        
-        # Apply any remaining partial minute billing
-        await bill_partial_minute(session_id, end_time)
-        
-        async with db_pool.acquire() as conn:
-            # Update session with final amounts
-            await conn.execute("""
-                UPDATE reading_sessions 
-                SET status = 'completed', end_time = $1, total_minutes = $2, 
-                    total_amount = $3, updated_at = NOW()
-                WHERE id = $4
-            """, end_time, total_minutes, total_amount, session_id)
-            
-            # Process revenue split (70% to reader, 30% to platform)
-            reader_amount = total_amount * 0.7
-            
-            # Add earnings to reader (implement reader earnings table if needed)
-            # For now, just log the transaction
-            logger.info(f"Session {session_id} completed: ${total_amount:.2f} total, ${reader_amount:.2f} to reader")
-            
-            # Get updated session data
-            updated_session = await conn.fetchrow("""
-                SELECT * FROM reading_sessions WHERE id = $1
-            """, session_id)
-        
-        # Clean up active session
+async def recover_billing_sessions():
+    """Rebuild the billing schedule from the database in one query.
+
+    Runs at startup (crash recovery) and periodically on the billing leader so
+    sessions accepted or ended by other workers are picked up. In-memory state
+    is kept for sessions already scheduled since it is never behind the
+    checkpoint table.
+    """
+    started = time.perf_counter()
+    async with db_pool.acquire() as conn:
+        records = await statement_registry.fetch(conn, "active_billing_sessions")
+
+    active_ids = set()
+    added = 0
+    for record in records:
+        active_ids.add(record['id'])
+        if record['id'] in active_sessions:
+            # Re-arm a session dropped from the wheel by a failed tick
+            added += billing_scheduler.reschedule([record['id']])
+            continue
+        register_billing_session(
+            record['id'], record['client_id'], record['reader_id'], record['rate_per_minute'],
+            record['start_time'], record['last_billed_at'] or record['start_time'], record['total_billed'],
+            record['amount_held']
+        )
+        added += 1
+
+    removed = [sid for sid in active_sessions if sid not in active_ids]
+    for session_id in removed:
+        billing_scheduler.remove(session_id)
         del active_sessions[session_id]
-        
-        return dict(updated_session)
-    
-    # If session wasn't actively billed, just mark as completed
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    billing_scheduler.recovery_duration_ms.observe(elapsed_ms)
+    if added or removed:
+        logger.info(f"Billing resync: {added} added, {len(removed)} removed, {len(active_sessions)} active ({elapsed_ms:.1f}ms)")
+
+def _hold_extension(billing_data: dict) -> Decimal:
+    """Amount to add to a session's hold this tick (zero while it has enough left)."""
+    rate = billing_data['rate_per_minute']
+    if billing_data['hold_remaining'] - rate < rate * BILLING_HOLD_REFILL_MINUTES:
+        return rate * BILLING_HOLD_MINUTES
+    return Decimal('0.00')
+
+async def settle_billing_batch(session_ids: List[str], now: float) -> Set[str]:
+    """Charge one minute for every due session in one transaction.
+
+    Minutes are consumed from each session's hold; only sessions whose hold is
+    running low debit their client's ledger balance, with the extensions summed
+    per client and capped at the available balance. Every charged minute is
+    checkpointed in the same statement. Sessions that could not pay, or that
+    were ended on another worker, are returned.
+    """
+    batch = [active_sessions[sid] for sid in session_ids]
+    extensions = [_hold_extension(b) for b in batch]
+    billed_at = datetime.utcfromtimestamp(now)
     async with db_pool.acquire() as conn:
-        await conn.execute("""
-            UPDATE reading_sessions 
-            SET status = 'completed', end_time = NOW(), updated_at = NOW()
-            WHERE id = $1
-        """, session_id)
-        
-        updated_session = await conn.fetchrow("""
-            SELECT * FROM reading_sessions WHERE id = $1
-        """, session_id)
-        
-        return dict(updated_session)
+        async with conn.transaction():
+            # Sessions are locked so an "end" running concurrently on any worker
+            # either completes first (and the session is skipped) or waits for the
+            # charge and its checkpoint to commit. Then the clients whose holds are
+            # extended, like any other debit.
+            await conn.fetch("""
+                SELECT id, client_id FROM reading_sessions
+                WHERE id = ANY($1::text[]) AND status = 'active'
+                ORDER BY id FOR UPDATE
+            """, sorted(session_ids))
+            await lock_clients([b['client_id'] for b, extend_by in zip(batch, extensions) if extend_by > 0], conn)
+            settled_records = await conn.fetch("""
+                WITH due AS (
+                    SELECT d.* FROM unnest($1::text[], $2::text[], $3::numeric[], $4::numeric[],
+                                           $5::numeric[], $6::numeric[], $7::numeric[])
+                        AS d(session_id, client_id, rate, total_billed, hold_remaining, extend_by, amount_held)
+                    JOIN reading_sessions rs ON rs.id = d.session_id AND rs.status = 'active'
+                ), wanted AS (
+                    SELECT client_id, SUM(extend_by) AS amount FROM due WHERE extend_by > 0 GROUP BY client_id
+                ), debited AS (
+                    SELECT w.client_id, LEAST(GREATEST(ledger_balance('client:' || w.client_id), 0.00), w.amount) AS granted
+                    FROM wanted w
+                ), allocated AS (
+                    -- Split a client's grant across their due sessions in order
+                    SELECT due.*, CASE WHEN d.granted IS NULL THEN 0.00
+                               ELSE GREATEST(LEAST(due.extend_by,
+                                   d.granted - (SUM(due.extend_by) OVER (PARTITION BY due.client_id ORDER BY due.session_id)
+                                                - due.extend_by)), 0.00)
+                           END AS granted
+                    FROM due LEFT JOIN debited d ON d.client_id = due.client_id
+                ), held AS (
+                    INSERT INTO balance_holds (session_id, client_id, amount_held)
+                    SELECT session_id, client_id, amount_held + granted FROM allocated WHERE granted > 0
+                    ON CONFLICT (session_id) DO UPDATE
+                    SET amount_held = EXCLUDED.amount_held, updated_at = NOW()
+                ), journaled AS (
+                    -- One transfer per extension, keyed by the hold's new total
+                    INSERT INTO ledger_entries (transfer_id, account, amount, entry_type, reference_id)
+                    SELECT 'hold:' || a.session_id || ':' || (a.amount_held + a.granted)::numeric(10,2),
+                           leg.account, leg.amount, 'hold', a.session_id
+                    FROM allocated a
+                    CROSS JOIN LATERAL (VALUES ('client:' || a.client_id, -a.granted),
+                                               ('hold:' || a.client_id, a.granted)) AS leg(account, amount)
+                    WHERE a.granted > 0
+                ), checkpointed AS (
+                    INSERT INTO session_billing_state (session_id, last_billed_at, total_billed)
+                    SELECT session_id, $8, total_billed + rate FROM allocated
+                    WHERE hold_remaining + granted >= rate
+                    ON CONFLICT (session_id) DO UPDATE
+                    SET last_billed_at = EXCLUDED.last_billed_at, total_billed = EXCLUDED.total_billed
+                )
+                SELECT requested.session_id, allocated.session_id IS NOT NULL AS is_active,
+                       COALESCE(allocated.granted, 0.00) AS granted
+                FROM unnest($1::text[]) AS requested(session_id)
+                LEFT JOIN allocated ON allocated.session_id = requested.session_id
+            """,
+                [b['session_id'] for b in batch],
+                [b['client_id'] for b in batch],
+                [b['rate_per_minute'] for b in batch],
+                [b['total_billed'] for b in batch],
+                [b['hold_remaining'] for b in batch],
+                extensions,
+                [b['amount_held'] for b in batch],
+                billed_at
+            )
 
-async def bill_session_minutes(session_id: str):
-    """Background task to bill session per minute"""
-    while session_id in active_sessions:
+    results = {record['session_id']: record for record in settled_records}
+    exhausted = set()
+    ended_elsewhere = set()
+    for billing_data in batch:
+        session_id = billing_data['session_id']
+        record = results.get(session_id)
+        if not record or not record['is_active']:
+            ended_elsewhere.add(session_id)
+            active_sessions.pop(session_id, None)
+            continue
+        rate = billing_data['rate_per_minute']
+        granted = record['granted']
+        billing_data['amount_held'] += granted
+        billing_data['hold_remaining'] += granted
+        if billing_data['hold_remaining'] < rate:
+            exhausted.add(session_id)
+            continue
+        billing_data['hold_remaining'] -= rate
+        billing_data['total_billed'] += rate
+        billing_data['last_bill_time'] = billed_at
+        billing_data['next_bill_at'] += billing_scheduler.interval_seconds
+        billing_scheduler.add(session_id, billing_data['next_bill_at'])
+
+    if exhausted:
+        logger.warning(f"Insufficient funds for {len(exhausted)} session(s), ending them")
         try:
-            await asyncio.sleep(60)  # Wait 1 minute
-            
-            if session_id not in active_sessions:
-                break
-                
-            billing_data = active_sessions[session_id]
-            current_time = datetime.now()
-            
-            # Bill for the minute
-            await bill_partial_minute(session_id, current_time)
-            
+            await end_sessions_for_insufficient_funds(list(exhausted), billed_at)
         except Exception as e:
-            logger.error(f"Error in billing task for session {session_id}: {str(e)}")
-            break
-
-async def bill_partial_minute(session_id: str, current_time: datetime):
-    """Bill for a partial or full minute"""
-    if session_id not in active_sessions:
-        return
-        
-    billing_data = active_sessions[session_id]
-    rate_per_minute = billing_data['rate_per_minute']
-    
+            # Their next_bill_at was not advanced, so the next tick retries the end
+            logger.error(f"Failed to end {len(exhausted)} exhausted session(s): {str(e)}")
+            billing_scheduler.reschedule(list(exhausted))
+            exhausted = {sid for sid in exhausted if sid not in active_sessions}
+    return exhausted | ended_elsewhere
+
+async def end_sessions_for_insufficient_funds(session_ids: List[str], end_time: datetime):
+    """Complete sessions whose client ran out of funds and notify both parties.
+
+    The minutes already billed are the session total: the reader's share is
+    recorded in reader_earnings and the charge journaled in the ledger, in the
+    same transaction that settles the holds.
+
+    Sessions are locked by id, as in a user-initiated end and the billing
+    batch. The holds already cover what was billed, so the clients' ledger
+    accounts are only credited and their rows need no lock.
+    """
+    session_ids = sorted(session_ids)
     async with db_pool.acquire() as conn:
-        # Check client balance
-        client = await conn.fetchrow("""
-            SELECT balance FROM clients 
-            WHERE id = $1
-        """, billing_data['client_id'])
-        
-        if not client or client['balance'] < rate_per_minute:
-            # Insufficient funds - end session
-            logger.warning(f"Insufficient funds for session {session_id}, ending session")
-            
-            # End the session due to insufficient funds
-            await conn.execute("""
-                UPDATE reading_sessions 
-                SET status = 'completed', end_time = $1, updated_at = NOW()
-                WHERE id = $2
-            """, current_time, session_id)
-            
-            # Notify both parties
-            session_info = await conn.fetchrow("""
-                SELECT rs.*, c.user_id as client_user_id, r.user_id as reader_user_id
-                FROM reading_sessions rs
-                JOIN clients c ON rs.client_id = c.id
-                JOIN readers r ON rs.reader_id = r.id
-                WHERE rs.id = $1
-            """, session_id)
-            
-            if session_info:
-                await notify_session_update(session_info['client_user_id'], {
-                    "type": "session_ended",
-                    "reason": "insufficient_funds",
-                    "session_id": session_id
-                })
-                await notify_session_update(session_info['reader_user_id'], {
-                    "type": "session_ended", 
-                    "reason": "insufficient_funds",
-                    "session_id": session_id
-                })
-            
-            # Remove from active sessions
-            if session_id in active_sessions:
-                del active_sessions[session_id]
-            return
-        
-        # Deduct the minute charge
-        await conn.execute("""
-            UPDATE clients 
-            SET balance = balance - $1, updated_at = NOW()
-            WHERE id = $2
-        """, rate_per_minute, billing_data['client_id'])
-        
-        # Update billing data
-        billing_data['total_billed'] += rate_per_minute
-        billing_data['last_bill_time'] = current_time
-        
-        logger.info(f"Billed ${rate_per_minute:.2f} for session {session_id}")
+        async with conn.transaction():
+            await conn.fetch("""
+                SELECT id, client_id FROM reading_sessions
+                WHERE id = ANY($1::text[]) AND status = 'active'
+                ORDER BY id FOR UPDATE
+            """, session_ids)
+            ended_records = await conn.fetch("""
+                WITH cleared AS (
+                    DELETE FROM session_billing_state WHERE session_id = ANY($2::text[])
+                    RETURNING session_id, total_billed
+                ), settled AS (
+                    -- The hold goes back to the balance, which pays for the minutes billed
+                    UPDATE balance_holds h
+                    SET status = 'settled', updated_at = NOW(),
+                        amount_settled = COALESCE((SELECT cl.total_billed FROM cleared cl WHERE cl.session_id = h.session_id), 0.00)
+                    WHERE h.session_id = ANY($2::text[]) AND h.status = 'open'
+                    RETURNING h.session_id, h.client_id, h.amount_held
+                ), released AS (
+                    INSERT INTO ledger_entries (transfer_id, account, amount, entry_type, reference_id)
+                    SELECT 'hold_release:' || r.session_id, leg.account, leg.amount, 'hold_release', r.session_id
+                    FROM settled r
+                    CROSS JOIN LATERAL (VALUES ('hold:' || r.client_id, -r.amount_held),
+                                               ('client:' || r.client_id, r.amount_held)) AS leg(account, amount)
+                    WHERE r.amount_held > 0
+                )
+                UPDATE reading_sessions rs
+                SET status = 'completed', end_time = $1, updated_at = NOW(),
+                    total_amount = COALESCE((SELECT cl.total_billed FROM cleared cl WHERE cl.session_id = rs.id), rs.total_amount)
+                FROM clients c, readers r
+                WHERE rs.id = ANY($2::text[]) AND rs.status = 'active' AND c.id = rs.client_id AND r.id = rs.reader_id
+                RETURNING rs.id, rs.client_id, rs.reader_id, rs.total_amount,
+                          c.user_id AS client_user_id, r.user_id AS reader_user_id
+            """, end_time, session_ids)
+
+            charged = [record for record in ended_records if record['total_amount'] and record['total_amount'] > 0]
+            reader_shares = {record['id']: round(record['total_amount'] * Decimal('0.70'), 2) for record in charged}
+            if charged:
+                await conn.execute(
+                    """INSERT INTO reader_earnings
+                       (reader_id, session_id, total_session_amount, amount_earned, payout_status)
+                       SELECT reader_id, session_id, total, earned, 'pending'
+                       FROM unnest($1::text[], $2::text[], $3::numeric[], $4::numeric[])
+                           AS e(reader_id, session_id, total, earned)""",
+                    [record['reader_id'] for record in charged],
+                    [record['id'] for record in charged],
+                    [record['total_amount'] for record in charged],
+                    [reader_shares[record['id']] for record in charged]
+                )
+            await append_ledger_entries([
+                entry
+                for record in charged
+                for entry in session_charge_transfer(
+                    record['id'], record['client_id'], record['reader_id'],
+                    record['total_amount'], reader_shares[record['id']]
+                )
+            ], conn)
+
+    for session_id in session_ids:
+        billing_scheduler.remove(session_id)
+        active_sessions.pop(session_id, None)
+
+    for record in ended_records:
+        message = {
+            "type": "session_ended",
+            "reason": "insufficient_funds",
+            "session_id": record['id']
+        }
+        await notify_session_update(record['client_user_id'], message)
+        await notify_session_update(record['reader_user_id'], message)
+        await broadcast_session_update(record['id'], {
+            "status": "completed", "end_time": end_time, "total_amount": record['total_amount']
+        })
+
+class LedgerSnapshotJob:
+    """Periodically rolls ledger entries up into per-account snapshots.
+
+    Only entries older than LEDGER_SNAPSHOT_LAG_SECONDS are folded in, so an
+    entry whose id was allocated by a transaction that has not committed yet
+    is not skipped. An advisory lock keeps concurrent workers from folding the
+    same entries twice.
+    """
+
+    def __init__(self, interval_seconds: float = LEDGER_SNAPSHOT_SECONDS):
+        self.interval_seconds = interval_seconds
+        self.run_duration_ms = RunningStat()
+        self.accounts_updated = RunningStat()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error in ledger snapshot job: {str(e)}")
+
+    async def run_once(self) -> int:
+        started = time.perf_counter()
+        async with db_pool.acquire() as conn:
+            async with conn.transaction():
+                if not await conn.fetchval("SELECT pg_try_advisory_xact_lock($1)", LEDGER_SNAPSHOT_LOCK_KEY):
+                    return 0
+                updated = await conn.fetch("""
+                    WITH bound AS (
+                        SELECT COALESCE(MAX(id), 0) AS max_id FROM ledger_entries
+                        WHERE created_at < NOW() - make_interval(secs => $1)
+                    ), rolled AS (
+                        SELECT e.account, SUM(e.amount) AS delta
+                        FROM ledger_entries e
+                        LEFT JOIN ledger_snapshots s ON s.account = e.account
+                        WHERE e.id > COALESCE(s.last_entry_id, 0) AND e.id <= (SELECT max_id FROM bound)
+                        GROUP BY e.account
+                    )
+                    INSERT INTO ledger_snapshots (account, balance, last_entry_id)
+                    SELECT account, delta, (SELECT max_id FROM bound) FROM rolled
+                    ON CONFLICT (account) DO UPDATE
+                    SET balance = ledger_snapshots.balance + EXCLUDED.balance,
+                        last_entry_id = EXCLUDED.last_entry_id, updated_at = NOW()
+                    RETURNING account
+                """, LEDGER_SNAPSHOT_LAG_SECONDS)
+        self.accounts_updated.observe(len(updated))
+        self.run_duration_ms.observe((time.perf_counter() - started) * 1000)
+        return len(updated)
+
+    def metrics(self) -> dict:
+        return {
+            "run_duration_ms": self.run_duration_ms.snapshot(),
+            "accounts_updated": self.accounts_updated.snapshot(),
+        }
+
+# Global ledger snapshot job (started in lifespan)
+ledger_snapshot_job = LedgerSnapshotJob()
 
 async def notify_session_update(user_id: str, message: dict):
     """Notify a user about session updates"""
@@ -1624,7 +4077,7 @@ async def notify_message_received(message_data: dict):
     })
 
 async def broadcast_gift_to_stream(stream_id: str, gift_data: dict):
-    """Broadcast gift to all stream viewers"""
+    """Broadcast gift to the stream:{id} subscribers"""
     # In a real implementation, this would broadcast to all connected stream viewers
     # For now, we'll store the gift data and it can be retrieved via API
     message = {
@@ -1633,14 +4086,8 @@ async def broadcast_gift_to_stream(stream_id: str, gift_data: dict):
         "data": gift_data
     }
     
-    # Broadcast to all connected users (simplified implementation)
-    for user_id, websocket in websocket_connections.items():
-        try:
-            await websocket.send_text(json.dumps(message))
-        except:
-            # Remove stale connections
-            if user_id in websocket_connections:
-                del websocket_connections[user_id]
+    # Gifts are events, not state: never coalesced
+    await publish_topic_update(None, [f"stream:{stream_id}"], message)
 
 if __name__ == "__main__":
     import uvicorn
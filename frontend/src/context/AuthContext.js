@@ -1,4 +1,4 @@
-import React, { createContext, useState, useEffect, useContext } from 'react';
+import React, { createContext, useState, useEffect, useContext, useRef } from 'react';
 import axios from 'axios';
 import { useNavigate } from 'react-router-dom'; // Import useNavigate
 
@@ -6,6 +6,9 @@ const API_BASE_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001
 
 const AuthContext = createContext(null);
 
+// Sequence number of the last inbox notification seen, per user
+const lastSeqKey = (uid) => `wsLastSeq:${uid}`;
+
 export const AuthProvider = ({ children }) => {
   const [token, setToken] = useState(localStorage.getItem('token'));
   const [userRole, setUserRole] = useState(localStorage.getItem('userRole'));
@@ -31,7 +34,10 @@ export const AuthProvider = ({ children }) => {
     const backendUrl = process.env.REACT_APP_BACKEND_URL || API_BASE_URL; // API_BASE_URL is defined in AuthContext
     const wsUrl = backendUrl.replace(/^http/, 'ws'); // Replace http with ws or https with wss
 
-    const fullWsUrl = `${wsUrl}/api/ws/${uid}?token=${authToken}`;
+    // With ?since the server first replays the notifications missed while disconnected
+    const lastSeq = localStorage.getItem(lastSeqKey(uid));
+    const sinceParam = lastSeq ? `&since=${lastSeq}` : '';
+    const fullWsUrl = `${wsUrl}/api/ws/${uid}?token=${authToken}${sinceParam}`;
     console.log("Attempting to connect WebSocket:", fullWsUrl);
 
     const socket = new WebSocket(fullWsUrl);
@@ -46,6 +52,11 @@ export const AuthProvider = ({ children }) => {
       console.log("WebSocket message received:", event.data);
       try {
         const parsedMessage = JSON.parse(event.data);
+        const seq = parsedMessage.type === 'notifications' ? parsedMessage.last_seq : parsedMessage.seq;
+        // A reset replay means the server's sequence restarted below ours
+        if (seq !== undefined && (parsedMessage.reset || seq > Number(localStorage.getItem(lastSeqKey(uid)) || 0))) {
+          localStorage.setItem(lastSeqKey(uid), String(seq));
+        }
         setLastWsMessage({ ...parsedMessage, receivedAt: new Date() }); // Add a timestamp for uniqueness
       } catch (e) {
         console.error("Error parsing WebSocket message:", e);
@@ -63,7 +74,11 @@ export const AuthProvider = ({ children }) => {
         wsRef.current = null;
         setWs(null);
       }
-      // Optional: Reconnection logic here, e.g., if not a clean logout
+      // Reconnect unless this was a logout or the server rejected the token
+      // (1008); the replay covers the gap
+      if (event.code !== 1000 && event.code !== 1008 && localStorage.getItem('token') === authToken) {
+        setTimeout(() => connectWebSocket(uid, authToken), 3000);
+      }
     };
   };
 
@@ -6,6 +6,10 @@ const AdminDashboard = () => {
   const { userId } = useAuth();
   const [adminUserProfile, setAdminUserProfile] = useState(null);
   const [readers, setReaders] = useState([]);
+  const [readersCursor, setReadersCursor] = useState(null);
+  const [readersEstimate, setReadersEstimate] = useState(null);
+  const [readerSearch, setReaderSearch] = useState('');
+  const [readerStatusFilter, setReaderStatusFilter] = useState('');
   const [logs, setLogs] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
@@ -15,17 +19,24 @@ const AdminDashboard = () => {
 
   const authenticatedAxios = createAuthenticatedAxios();
 
+  const readerParams = () => ({
+    q: readerSearch || undefined,
+    application_status: readerStatusFilter || undefined,
+  });
+
   const fetchData = async (isInitialLoad = false) => {
     if(isInitialLoad) setLoading(true);
     setError('');
     try {
       const [userRes, readersRes, logsRes] = await Promise.all([
         authenticatedAxios.get('/api/user/profile'),
-        authenticatedAxios.get('/api/admin/readers'),
+        authenticatedAxios.get('/api/admin/readers', { params: readerParams() }),
         authenticatedAxios.get('/api/admin/logs')
       ]);
       setAdminUserProfile(userRes.data);
       setReaders(readersRes.data);
+      setReadersCursor(readersRes.headers['x-next-cursor'] || null);
+      setReadersEstimate(readersRes.headers['x-total-estimate'] || null);
       setLogs(logsRes.data);
     } catch (err) {
       console.error("Error fetching admin data:", err);
@@ -61,6 +72,22 @@ const AdminDashboard = () => {
     }
   };
 
+  const loadMoreReaders = async () => {
+    try {
+      const res = await authenticatedAxios.get('/api/admin/readers', { params: { ...readerParams(), cursor: readersCursor } });
+      setReaders(prev => [...prev, ...res.data]);
+      setReadersCursor(res.headers['x-next-cursor'] || null);
+    } catch (err) {
+      console.error("Error loading more readers:", err);
+      setError(err.response?.data?.detail || 'Failed to load more readers.');
+    }
+  };
+
+  const handleReaderSearch = (e) => {
+    e.preventDefault();
+    fetchData();
+  };
+
   const handleReaderStatusUpdate = async (targetUserId, newStatus) => {
     if (!window.confirm(`Are you sure you want to set reader ${targetUserId} to ${newStatus}?`)) return;
     try {
@@ -114,6 +141,29 @@ const AdminDashboard = () => {
       {/* Manage Readers Section */}
       <div className="p-6 bg-gray-800/50 rounded-md mb-8">
         <h2 className="text-2xl font-playfair text-blue-400 mb-3">Manage Readers</h2>
+        <form onSubmit={handleReaderSearch} className="flex flex-wrap gap-2 mb-3">
+          <input
+            type="text"
+            value={readerSearch}
+            onChange={(e) => setReaderSearch(e.target.value)}
+            placeholder="Search by email or name"
+            className="bg-gray-700 text-white text-sm px-3 py-1 rounded"
+          />
+          <select
+            value={readerStatusFilter}
+            onChange={(e) => setReaderStatusFilter(e.target.value)}
+            className="bg-gray-700 text-white text-sm px-3 py-1 rounded"
+          >
+            <option value="">All statuses</option>
+            <option value="pending_approval">Pending approval</option>
+            <option value="active">Active</option>
+            <option value="suspended">Suspended</option>
+          </select>
+          <button type="submit" className="bg-blue-600 hover:bg-blue-700 text-white text-sm px-3 py-1 rounded font-playfair transition-colors">
+            Search
+          </button>
+          {readersEstimate !== null && <span className="text-xs text-gray-400 self-center">~{readersEstimate} readers</span>}
+        </form>
         {readers.length > 0 ? (
           <div className="overflow-x-auto">
             <table className="w-full text-sm text-left text-gray-300">
@@ -158,6 +208,14 @@ const AdminDashboard = () => {
             </table>
           </div>
         ) : <p className="text-gray-400">No readers found or to manage.</p>}
+        {readersCursor && (
+          <button
+            onClick={loadMoreReaders}
+            className="mt-3 bg-gray-600 hover:bg-gray-700 text-white text-xs px-3 py-1 rounded font-playfair transition-colors"
+          >
+            Load more
+          </button>
+        )}
       </div>
 
       {/* View System Logs Section */}
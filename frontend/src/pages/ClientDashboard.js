@@ -16,6 +16,7 @@ const ClientDashboard = () => {
   const [userProfile, setUserProfile] = useState(null);
   const [clientProfile, setClientProfile] = useState(null);
   const [bookings, setBookings] = useState([]);
+  const [bookingsCursor, setBookingsCursor] = useState(null);
   const [messagesInfo, setMessagesInfo] = useState({ message: "Loading messages...", sample_messages: [] });
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
@@ -38,6 +39,7 @@ const ClientDashboard = () => {
       setUserProfile(userRes.data);
       setClientProfile(clientRes.data);
       setBookings(bookingsRes.data);
+      setBookingsCursor(bookingsRes.headers['x-next-cursor'] || null);
       setMessagesInfo(messagesRes.data);
     } catch (err) {
       console.error("Error fetching client data:", err);
@@ -47,6 +49,17 @@ const ClientDashboard = () => {
     }
   };
 
+  const loadMoreBookings = async () => {
+    try {
+      const res = await authenticatedAxios.get('/api/client/bookings', { params: { cursor: bookingsCursor } });
+      setBookings(prev => [...prev, ...res.data]);
+      setBookingsCursor(res.headers['x-next-cursor'] || null);
+    } catch (err) {
+      console.error("Error loading more bookings:", err);
+      setError(err.response?.data?.detail || 'Failed to load more bookings.');
+    }
+  };
+
   useEffect(() => {
     if (auth.userId) {
         fetchClientData(true); // Pass true for initial load
@@ -83,6 +96,8 @@ const ClientDashboard = () => {
           setActiveCallSession(null);
         }
         fetchClientData();
+      } else if (type === 'notifications' && data.notifications?.length) {
+        fetchClientData(); // Missed while disconnected
       }
     }
   }, [auth.lastWsMessage, auth.userId, bookings, activeCallSession]);
@@ -229,6 +244,14 @@ const ClientDashboard = () => {
         ) : (
           <p className="text-gray-400">No bookings found.</p>
         )}
+        {bookingsCursor && (
+          <button
+            onClick={loadMoreBookings}
+            className="mt-3 bg-gray-600 hover:bg-gray-700 text-white text-xs px-3 py-1 rounded font-playfair transition-colors"
+          >
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );
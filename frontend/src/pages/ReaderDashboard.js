@@ -82,6 +82,8 @@ const ReaderDashboard = () => {
           setActiveCallSession(null);
         }
         fetchReaderData(); // Re-fetch queue and potentially earnings
+      } else if (type === 'notifications' && data.notifications?.length) {
+        fetchReaderData(); // Missed while disconnected
       }
     }
   }, [auth.lastWsMessage, auth.userId, activeCallSession]);
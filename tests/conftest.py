@@ -0,0 +1,53 @@
+"""Shared setup for the backend tests: puts backend/ on sys.path so test
+modules can `import server`, and provides the fixtures they share."""
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+
+class StubPool:
+    """Stands in for an asyncpg pool whose acquire() always yields one connection."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def acquire(self):
+        pool = self
+
+        class _Acquire:
+            async def __aenter__(self):
+                return pool.connection
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Acquire()
+
+
+@pytest.fixture
+def stub_pool():
+    """Factory: stub_pool(connection) -> a pool handing out that connection."""
+    return StubPool
+
+
+@pytest.fixture(scope="session")
+def registry_args():
+    """Sample arguments for every statement in server.statement_registry."""
+    return {
+        "user_by_id": ("u42",),
+        "available_readers": (),
+        "available_reader": ("r42",),
+        "session_with_participants": ("s4242",),
+        "notification_last_seq": ("u42",),
+        "notifications_since": ("u42", 0, 201),
+        "client_bookings": ("c42", datetime.max, "", datetime.min, None, 51),
+        "reader_session_queue": ("r42",),
+        "active_billing_sessions": (),
+        "reader_earnings_totals": ("r42",),
+        "reader_recent_earnings": ("r42",),
+    }
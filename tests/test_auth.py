@@ -0,0 +1,108 @@
+"""Request-level tests for authentication and write tracking; no database needed.
+
+Requests are sent straight to the ASGI app, with the user cache and the
+database pool replaced by stubs:
+
+    python -m pytest tests/test_auth.py
+"""
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+import server
+
+
+def _request(method: str, path: str, token: str = None) -> tuple:
+    """Send one request through the app; returns (status, decoded JSON body)."""
+    headers = [(b"host", b"testserver")]
+    if token is not None:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": headers, "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(server.app(scope, receive, send))
+    body = b"".join(message.get("body", b"") for message in messages if message["type"] == "http.response.body")
+    return messages[0]["status"], json.loads(body) if body else None
+
+
+class Executed:
+    def __init__(self):
+        self.queries = []
+
+    async def execute(self, query, *args):
+        self.queries.append(query)
+
+
+@pytest.fixture
+def writes(monkeypatch, stub_pool):
+    """Users whose writes were recorded for read-your-writes routing."""
+    recorded = []
+
+    async def note_write(user_id):
+        recorded.append(user_id)
+
+    async def load_user(user_id):
+        role = "admin" if user_id.startswith("admin") else "client"
+        now = datetime.utcnow()
+        return server.User(id=user_id, email=f"{user_id}@example.com", role=role, created_at=now, updated_at=now)
+
+    monkeypatch.setattr(server.replica_router, "note_write", note_write)
+    monkeypatch.setattr(server, "user_cache", server.UserCache(load_user))
+    monkeypatch.setattr(server, "token_revocations", server.TokenRevocations())
+    monkeypatch.setattr(server, "db_pool", stub_pool(Executed()))
+    return recorded
+
+
+def _token(user_id: str) -> str:
+    return server.create_access_token({"sub": user_id, "role": "client"})
+
+
+def test_missing_authorization_header_is_unauthorized():
+    status, body = _request("GET", "/api/client/bookings")
+    assert status == 401
+    assert body["detail"] == "Could not validate credentials"
+
+
+def test_successful_write_is_recorded_for_the_writer(writes):
+    status, _ = _request("POST", "/api/admin/users/u9/revoke-tokens", _token("admin1"))
+    assert status == 200
+    assert writes == ["admin1"]
+
+
+def test_rejected_write_is_not_recorded(writes):
+    status, _ = _request("POST", "/api/admin/users/u9/revoke-tokens", _token("u1"))
+    assert status == 403
+    assert writes == []
+
+
+def test_signup_rejects_a_known_email_before_hashing(monkeypatch, stub_pool):
+    class ExistingUser:
+        async def fetchrow(self, query, email):
+            return {"id": "u1"}
+
+    hashed = []
+
+    async def hash_password(password):
+        hashed.append(password)
+        return "hash"
+
+    monkeypatch.setattr(server, "db_pool", stub_pool(ExistingUser()))
+    monkeypatch.setattr(server, "get_password_hash_async", hash_password)
+
+    with pytest.raises(server.HTTPException) as rejected:
+        asyncio.run(server.signup(server.UserCreate(email="taken@example.com", password="secret")))
+
+    assert rejected.value.status_code == 400
+    assert hashed == []
@@ -0,0 +1,188 @@
+"""Unit tests for the in-memory side of per-minute billing.
+
+The database is replaced by a stub pool, so these run without Postgres:
+
+    python -m pytest tests/test_billing.py
+"""
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+import server
+
+START = 1_000_000.0
+
+
+class Transaction:
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class StubConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def transaction(self):
+        return Transaction()
+
+    async def fetch(self, query, *args):
+        return self.rows
+
+    async def execute(self, query, *args):
+        return None
+
+
+@pytest.fixture
+def clock():
+    return [START]
+
+
+@pytest.fixture
+def scheduler(monkeypatch, clock):
+    scheduler = server.BillingScheduler(interval_seconds=60, tick_seconds=1, clock=lambda: clock[0])
+    monkeypatch.setattr(server, "billing_scheduler", scheduler)
+    monkeypatch.setattr(server, "active_sessions", {})
+    return scheduler
+
+
+def test_wheel_pops_sessions_once_they_are_due():
+    wheel = server.BillingTimerWheel(tick_seconds=1, slot_count=60, now=START)
+    wheel.schedule("late", START + 30)
+    wheel.schedule("early", START + 10.5)
+    wheel.schedule("next_lap", START + 90) # Shares a slot with "late"
+
+    assert wheel.pop_due(START + 10) == []
+    assert wheel.pop_due(START + 11) == ["early"]
+    assert wheel.pop_due(START + 30) == ["late"]
+    assert "next_lap" in wheel
+    assert wheel.pop_due(START + 89) == []
+    assert wheel.pop_due(START + 90) == ["next_lap"]
+    assert len(wheel) == 0
+
+
+def test_wheel_never_schedules_into_a_swept_tick():
+    wheel = server.BillingTimerWheel(tick_seconds=1, slot_count=60, now=START)
+    wheel.pop_due(START + 5)
+    wheel.schedule("overdue", START + 2)
+    assert wheel.pop_due(START + 5) == []
+    assert wheel.pop_due(START + 6) == ["overdue"]
+
+
+def test_wheel_sweeps_every_slot_after_a_stall():
+    wheel = server.BillingTimerWheel(tick_seconds=1, slot_count=10, now=START)
+    for offset in range(1, 10):
+        wheel.schedule(f"s{offset}", START + offset)
+    assert sorted(wheel.pop_due(START + 500)) == sorted(f"s{offset}" for offset in range(1, 10))
+
+
+def test_wheel_reschedule_replaces_the_previous_due_time():
+    wheel = server.BillingTimerWheel(tick_seconds=1, slot_count=60, now=START)
+    wheel.schedule("s1", START + 5)
+    wheel.schedule("s1", START + 20)
+    assert wheel.pop_due(START + 10) == []
+    wheel.cancel("s1")
+    assert wheel.pop_due(START + 30) == []
+
+
+def _register(session_id, amount_held="5.00", total_billed="0.00"):
+    started = datetime.utcfromtimestamp(START)
+    return server.register_billing_session(
+        session_id, "c1", "r1", "1.00", started, started, total_billed, amount_held
+    )
+
+
+def test_exhausted_sessions_are_rescheduled_when_ending_fails(monkeypatch, stub_pool, scheduler, clock):
+    _register("s1", amount_held="1.00", total_billed="1.00")
+    monkeypatch.setattr(server, "db_pool", stub_pool(StubConnection([
+        {"session_id": "s1", "is_active": True, "granted": Decimal("0.00")},
+    ])))
+
+    async def failing_end(session_ids, end_time):
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(server, "end_sessions_for_insufficient_funds", failing_end)
+    clock[0] = START + 61
+
+    asyncio.run(scheduler.tick())
+
+    assert "s1" in server.active_sessions
+    assert "s1" in scheduler.wheel
+    assert scheduler.sessions_exhausted == 0
+    # The end is retried on the next tick
+    assert scheduler.wheel.pop_due(clock[0] + 1) == ["s1"]
+
+
+def test_failed_batch_puts_due_sessions_back_on_the_wheel(monkeypatch, scheduler, clock):
+    _register("s1")
+    _register("s2")
+
+    async def failing_settle(session_ids, now):
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(server, "settle_billing_batch", failing_settle)
+    clock[0] = START + 61
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scheduler.tick())
+
+    assert "s1" in scheduler.wheel and "s2" in scheduler.wheel
+    assert sorted(scheduler.wheel.pop_due(clock[0] + 1)) == ["s1", "s2"]
+
+
+def test_resync_rearms_active_sessions_missing_from_the_wheel(monkeypatch, stub_pool, scheduler):
+    billing_data = _register("s1")
+    scheduler.wheel.cancel("s1") # As if a failed tick had dropped it
+    started = datetime.utcfromtimestamp(START)
+
+    async def fetch_active(conn, name):
+        return [{
+            "id": "s1", "client_id": "c1", "reader_id": "r1", "rate_per_minute": Decimal("1.00"),
+            "start_time": started, "last_billed_at": started, "total_billed": Decimal("0.00"),
+            "amount_held": Decimal("5.00"),
+        }]
+
+    monkeypatch.setattr(server, "db_pool", stub_pool(StubConnection([])))
+    monkeypatch.setattr(server.statement_registry, "fetch", fetch_active)
+
+    asyncio.run(server.recover_billing_sessions())
+
+    assert server.active_sessions["s1"] is billing_data
+    assert scheduler.wheel.due_ticks["s1"] == START + 60
+
+
+class FailingSettlement:
+    """A connection whose end-of-session transaction fails on its first write."""
+
+    def transaction(self):
+        return Transaction()
+
+    async def fetchrow(self, query, *args):
+        raise RuntimeError("connection reset")
+
+
+def test_session_stays_billed_when_ending_it_fails(monkeypatch, stub_pool, scheduler):
+    _register("s1")
+    started = datetime.utcfromtimestamp(START)
+    record = {
+        "id": "s1", "client_id": "c1", "reader_id": "r1", "session_type": "chat", "billing_type": "per_minute",
+        "status": "active", "rate_per_minute": 1.0, "start_time": started, "room_id": "room_s1",
+        "created_at": started, "updated_at": started, "client_user_id": "u1", "reader_user_id": "u2",
+    }
+
+    async def fetch_session(conn, name, session_id):
+        return record
+
+    monkeypatch.setattr(server, "db_pool", stub_pool(FailingSettlement()))
+    monkeypatch.setattr(server.statement_registry, "fetchrow", fetch_session)
+    user = server.User(id="u1", email="u1@example.com", created_at=started, updated_at=started)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(server.session_action(server.SessionAction(session_id="s1", action="end"), current_user=user))
+
+    assert "s1" in server.active_sessions
+    assert "s1" in scheduler.wheel
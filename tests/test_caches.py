@@ -0,0 +1,172 @@
+"""Unit tests for the in-memory caches in front of the database.
+
+    python -m pytest tests/test_caches.py
+"""
+import asyncio
+
+import pytest
+
+import server
+
+
+class CountingLoader:
+    """Stands in for the users query; can be held open to overlap loads."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = None
+
+    async def __call__(self, user_id):
+        self.calls.append(user_id)
+        if self.release is not None:
+            await self.release.wait()
+        if user_id == "missing":
+            return None
+        if user_id == "broken":
+            raise RuntimeError("connection reset")
+        return {"id": user_id, "load": len(self.calls)}
+
+
+def test_user_cache_serves_hits_until_the_ttl_expires():
+    async def scenario():
+        loader = CountingLoader()
+        cache = server.UserCache(loader, ttl_seconds=60, max_size=10)
+        first = await cache.get("u1")
+        assert await cache.get("u1") is first
+
+        expired = server.UserCache(loader, ttl_seconds=0, max_size=10)
+        await expired.get("u2")
+        await expired.get("u2")
+        return loader.calls, cache.hits
+
+    calls, hits = asyncio.run(scenario())
+    assert calls == ["u1", "u2", "u2"]
+    assert hits == 1
+
+
+def test_user_cache_evicts_the_least_recently_used():
+    async def scenario():
+        loader = CountingLoader()
+        cache = server.UserCache(loader, ttl_seconds=60, max_size=2)
+        await cache.get("a")
+        await cache.get("b")
+        await cache.get("a") # "b" is now the least recently used
+        await cache.get("c")
+        await cache.get("a")
+        await cache.get("b")
+        return loader.calls, cache.evictions
+
+    calls, evictions = asyncio.run(scenario())
+    assert calls == ["a", "b", "c", "b"]
+    assert evictions == 2
+
+
+def test_user_cache_does_not_store_missing_users():
+    async def scenario():
+        loader = CountingLoader()
+        cache = server.UserCache(loader, ttl_seconds=60, max_size=10)
+        assert await cache.get("missing") is None
+        assert await cache.get("missing") is None
+        return loader.calls
+
+    assert asyncio.run(scenario()) == ["missing", "missing"]
+
+
+def test_user_cache_shares_one_load_between_concurrent_misses():
+    async def scenario():
+        loader = CountingLoader()
+        loader.release = asyncio.Event()
+        cache = server.UserCache(loader, ttl_seconds=60, max_size=10)
+        waiters = [asyncio.create_task(cache.get("u1")) for _ in range(5)]
+        await asyncio.sleep(0)
+        loader.release.set()
+        return loader.calls, await asyncio.gather(*waiters), cache.coalesced
+
+    calls, users, coalesced = asyncio.run(scenario())
+    assert calls == ["u1"]
+    assert all(user is users[0] for user in users)
+    assert coalesced == 4
+
+
+def test_user_cache_shares_a_failed_load_without_caching_it():
+    async def scenario():
+        loader = CountingLoader()
+        loader.release = asyncio.Event()
+        cache = server.UserCache(loader, ttl_seconds=60, max_size=10)
+        waiters = [asyncio.create_task(cache.get("broken")) for _ in range(3)]
+        await asyncio.sleep(0)
+        loader.release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        loader.release = None
+        with pytest.raises(RuntimeError):
+            await cache.get("broken")
+        return loader.calls, results
+
+    calls, results = asyncio.run(scenario())
+    assert calls == ["broken", "broken"]
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_user_cache_drops_a_load_invalidated_while_in_flight():
+    async def scenario():
+        loader = CountingLoader()
+        loader.release = asyncio.Event()
+        cache = server.UserCache(loader, ttl_seconds=60, max_size=10)
+        pending = asyncio.create_task(cache.get("u1"))
+        await asyncio.sleep(0)
+        cache.invalidate("u1") # e.g. the profile was updated meanwhile
+        loader.release.set()
+        stale = await pending
+        loader.release = None
+        fresh = await cache.get("u1")
+        return stale, fresh
+
+    stale, fresh = asyncio.run(scenario())
+    assert stale["load"] == 1
+    assert fresh["load"] == 2
+
+
+def test_identity_map_resolves_both_directions():
+    identities = server.IdentityMap(max_size=10)
+    identities.remember("client", "u1", "c1")
+    identities.remember("reader", "u2", "r2")
+
+    assert identities.profile_id("client", "u1") == "c1"
+    assert identities.user_id("reader", "r2") == "u2"
+    assert identities.profile_id("reader", "u1") is None # Kinds are kept apart
+    assert (identities.hits, identities.misses) == (2, 1)
+
+
+def test_identity_map_evicts_the_least_recently_used_pair_per_kind():
+    identities = server.IdentityMap(max_size=2)
+    identities.remember("client", "u1", "c1")
+    identities.remember("client", "u2", "c2")
+    identities.user_id("client", "c1") # Lookups by profile id count as use too
+    identities.remember("client", "u3", "c3")
+    identities.remember("reader", "u9", "r9")
+
+    assert identities.profile_id("client", "u2") is None
+    assert identities.user_id("client", "c2") is None
+    assert identities.profile_id("client", "u1") == "c1"
+    assert identities.user_id("client", "c3") == "u3"
+    assert identities.metrics()["clients"] == 2
+    assert identities.metrics()["readers"] == 1
+
+
+def test_reader_event_invalidates_the_cached_user_on_other_workers(monkeypatch, stub_pool):
+    class Directory:
+        async def refresh_reader(self, reader_id, conn):
+            pass
+
+    async def scenario():
+        loader = CountingLoader()
+        cache = server.UserCache(loader, ttl_seconds=60, max_size=10)
+        monkeypatch.setattr(server, "user_cache", cache)
+        monkeypatch.setattr(server, "reader_directory", Directory())
+        monkeypatch.setattr(server, "db_pool", stub_pool(None))
+        await cache.get("u2")
+        event = {"kind": "reader", "origin": "other", "seq": 1, "reader_id": "r2", "user_id": "u2"}
+        await server.refresh_reader_from_event(event)
+        return await cache.get("u2")
+
+    assert asyncio.run(scenario())["load"] == 2
@@ -0,0 +1,32 @@
+"""Unit tests for building ledger postings; no database needed.
+
+    python -m pytest tests/test_ledger.py
+"""
+from decimal import Decimal
+
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("collected", ["0.00", "0.01", "0.05", "1.99", "3.33", "47.76", "1000.00"])
+def test_session_charge_balances_with_non_negative_platform_leg(collected):
+    collected = Decimal(collected)
+    reader_share = round(collected * Decimal("0.70"), 2)
+    entries = server.session_charge_transfer("s1", "c1", "r1", collected, reader_share)
+
+    amounts = {account: amount for _, account, amount, _, _ in entries}
+    assert sum(amounts.values()) == 0
+    assert amounts.get(server.client_account("c1"), Decimal("0.00")) == -collected
+    assert amounts.get(server.PLATFORM_REVENUE_ACCOUNT, Decimal("0.00")) >= 0
+
+
+def test_session_charge_rejects_share_above_collected():
+    # The reader share of the amount due, after collecting only part of it
+    with pytest.raises(ValueError):
+        server.session_charge_transfer("s1", "c1", "r1", Decimal("2.00"), Decimal("7.00"))
+
+
+def test_ledger_transfer_rejects_unbalanced_legs():
+    with pytest.raises(ValueError):
+        server.ledger_transfer("t1", "top_up", None, [("a", Decimal("1.00")), ("b", Decimal("-0.99"))])
@@ -0,0 +1,53 @@
+"""Unit tests for loading and splitting migration files; no database needed.
+
+    python -m pytest tests/test_migrations.py
+"""
+
+import pytest
+
+import server
+
+NO_TRANSACTION_SQL = """-- migrate:no-transaction
+-- Rebuild the index without blocking writes.
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_example;   
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_example
+    ON example(a, b) -- trailing comment; not a terminator
+    WHERE note <> 'a;b';
+-- A commented-out statement;
+ANALYZE example;"""
+
+
+def test_statements_split_on_line_ending_semicolons():
+    migration = server.Migration(8, "example", NO_TRANSACTION_SQL)
+    assert not migration.in_transaction
+    assert migration.statements() == [
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_example",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_example\n"
+        "    ON example(a, b) -- trailing comment; not a terminator\n"
+        "    WHERE note <> 'a;b'",
+        "ANALYZE example",
+    ]
+
+
+def test_migrations_run_in_a_transaction_unless_marked():
+    assert server.Migration(1, "plain", "CREATE TABLE t (id INT);").in_transaction
+    assert not server.Migration(2, "marked", "\n" + NO_TRANSACTION_SQL).in_transaction
+
+
+def test_shipped_migrations_are_ordered_and_split_cleanly():
+    migrations = server.load_migrations()
+    versions = [migration.version for migration in migrations]
+    assert versions == sorted(versions) == list(range(1, len(versions) + 1))
+    for migration in migrations:
+        if not migration.in_transaction:
+            for statement in migration.statements():
+                assert statement.split()[0].upper() in ("CREATE", "DROP", "ALTER", "ANALYZE"), statement
+
+
+def test_duplicate_migration_versions_are_rejected(tmp_path):
+    (tmp_path / "0001_first.sql").write_text("SELECT 1;")
+    (tmp_path / "0001_second.sql").write_text("SELECT 2;")
+    (tmp_path / "README.md").write_text("ignored")
+    with pytest.raises(ValueError):
+        server.load_migrations(str(tmp_path))
@@ -0,0 +1,114 @@
+"""Unit tests for the notification inbox's in-memory ring and replay.
+
+The inbox's pool is replaced by a stub holding one user's stored
+notifications, so these run without Postgres:
+
+    python -m pytest tests/test_notification_inbox.py
+"""
+import asyncio
+
+import pytest
+
+import server
+
+
+class StoredNotifications:
+    """Answers the inbox's last_seq and notifications_since statements."""
+
+    def __init__(self, last_seq: int):
+        self.last_seq = last_seq
+        self.fetches = []
+
+    async def fetchval(self, query, user_id):
+        return self.last_seq or None
+
+    async def fetch(self, query, user_id, since, limit):
+        self.fetches.append(since)
+        seqs = range(self.last_seq, since, -1)
+        return [{"seq": seq, "payload": {"type": "n"}} for seq in seqs][:limit]
+
+
+@pytest.fixture
+def make_inbox(stub_pool):
+    def make(last_seq: int, **kwargs) -> server.NotificationInbox:
+        inbox = server.NotificationInbox(dsn=None, **kwargs)
+        inbox.pool = stub_pool(StoredNotifications(last_seq))
+        return inbox
+    return make
+
+
+def _remember(inbox, user_id, *seqs):
+    for seq in seqs:
+        inbox.remember(user_id, {"type": "n", "seq": seq})
+
+
+def _seqs(ring_or_notifications):
+    return [message["seq"] for message in ring_or_notifications]
+
+
+def test_ring_keeps_one_contiguous_run(make_inbox):
+    inbox = make_inbox(0, ring_size=3)
+    _remember(inbox, "u1", 1, 2, 2, 1, 3, 4)
+    assert _seqs(inbox.rings["u1"]) == [2, 3, 4] # Duplicates and stale ones ignored, bounded
+    _remember(inbox, "u1", 6) # 5 was missed
+    assert _seqs(inbox.rings["u1"]) == [6]
+
+
+def test_ring_drops_the_least_recently_notified_user(make_inbox):
+    inbox = make_inbox(0, ring_users=2)
+    _remember(inbox, "u1", 1)
+    _remember(inbox, "u2", 1)
+    _remember(inbox, "u1", 2)
+    _remember(inbox, "u3", 1)
+    assert list(inbox.rings) == ["u1", "u3"]
+
+
+def test_replay_answers_from_a_ring_that_covers_since_through_the_latest(make_inbox):
+    inbox = make_inbox(5)
+    _remember(inbox, "u1", 3, 4, 5)
+    notifications, complete, reset = asyncio.run(inbox.replay("u1", 2))
+    assert (_seqs(notifications), complete, reset) == ([3, 4, 5], True, False)
+    assert inbox.pool.connection.fetches == []
+    assert inbox.ring_replays == 1
+
+
+def test_replay_reads_the_table_when_the_ring_stops_short_of_the_latest(make_inbox):
+    inbox = make_inbox(6) # 6 was delivered on another worker while the event bus was down
+    _remember(inbox, "u1", 3, 4, 5)
+    notifications, _, _ = asyncio.run(inbox.replay("u1", 2))
+    assert _seqs(notifications) == [3, 4, 5, 6]
+    assert inbox.pool.connection.fetches == [2]
+
+
+def test_replay_reads_the_table_when_the_ring_starts_after_since(make_inbox):
+    inbox = make_inbox(5)
+    _remember(inbox, "u1", 4, 5)
+    notifications, _, _ = asyncio.run(inbox.replay("u1", 2))
+    assert _seqs(notifications) == [3, 4, 5]
+    assert inbox.db_replays == 1
+
+
+def test_replay_of_an_up_to_date_client_is_empty(make_inbox):
+    inbox = make_inbox(5)
+    assert asyncio.run(inbox.replay("u1", 5)) == ([], True, False)
+    assert inbox.pool.connection.fetches == []
+
+
+def test_replay_restarts_when_since_is_ahead_of_the_server(make_inbox):
+    inbox = make_inbox(3)
+    notifications, complete, reset = asyncio.run(inbox.replay("u1", 40))
+    assert (_seqs(notifications), complete, reset) == ([1, 2, 3], True, True)
+    assert inbox.pool.connection.fetches == [0]
+
+
+def test_replay_keeps_the_newest_when_over_replay_max(make_inbox):
+    inbox = make_inbox(10, replay_max=4)
+    notifications, complete, _ = asyncio.run(inbox.replay("u1", 0))
+    assert (_seqs(notifications), complete) == ([7, 8, 9, 10], False)
+
+
+def test_record_without_a_started_inbox_delivers_live_only():
+    inbox = server.NotificationInbox(dsn=None)
+    message = {"type": "session_ended"}
+    assert asyncio.run(inbox.record("u1", message)) is message
+    assert inbox.record_failures == 0
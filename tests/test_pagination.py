@@ -0,0 +1,49 @@
+"""Unit tests for the keyset pagination cursors; no database needed.
+
+    python -m pytest tests/test_pagination.py
+"""
+import base64
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+
+def _token(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("created_at", [datetime(2026, 1, 2, 3, 4, 5, 678901), datetime.max, datetime.min])
+def test_cursor_round_trip(created_at):
+    token = server.encode_page_cursor(created_at, "s42")
+    assert "=" not in token
+    assert server.decode_page_cursor(token) == (created_at, "s42")
+
+
+def test_cursor_with_aware_datetime_decodes_to_naive_utc():
+    aware = datetime(2026, 1, 2, 10, 0, tzinfo=timezone(timedelta(hours=2)))
+    token = server.encode_page_cursor(aware, "s42")
+    assert server.decode_page_cursor(token) == (datetime(2026, 1, 2, 8, 0), "s42")
+
+
+def test_cursor_with_null_created_at_ends_the_listing():
+    token = server.encode_page_cursor(None, "s42")
+    assert server.decode_page_cursor(token) == (datetime.min, "s42")
+
+
+@pytest.mark.parametrize("token", [
+    "!!!",
+    _token(b"\xff\xfe"),
+    _token(b"not json"),
+    _token(b'["2026-01-02T03:04:05"]'),
+    _token(b'["2026-01-02T03:04:05", "s1", "extra"]'),
+    _token(b'["yesterday", "s1"]'),
+    _token(b'[20260102, "s1"]'),
+    _token(b'["2026-01-02T03:04:05", 42]'),
+    _token(b'["9999-12-31T23:59:59-05:00", "s1"]'),
+])
+def test_malformed_cursor_is_a_bad_request(token):
+    with pytest.raises(server.HTTPException) as excinfo:
+        server.decode_page_cursor(token)
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,149 @@
+"""Query-plan regression tests for the hot queries.
+
+Seeds a large dataset into a scratch schema of a local Postgres, applies the
+migrations, and fails if EXPLAIN shows a sequential scan on any of the large
+tables for a hot query. Needs TEST_DATABASE_URL (e.g.
+postgresql://postgres@localhost/postgres); skipped otherwise.
+
+    TEST_DATABASE_URL=... python -m pytest tests/test_query_plans.py
+"""
+import asyncio
+import json
+import os
+
+import pytest
+
+asyncpg = pytest.importorskip("asyncpg")
+
+import server  # noqa: E402
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+SCHEMA = "query_plan_test"
+SCALE = int(os.getenv("QUERY_PLAN_SCALE", "1"))
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+# Tables seeded large enough that a sequential scan is a real regression
+LARGE_TABLES = {"users", "clients", "readers", "reading_sessions", "reader_earnings", "messages", "ledger_entries"}
+
+CLIENTS = 50000 * SCALE
+READERS = 5000 * SCALE
+SESSIONS = 300000 * SCALE
+EARNINGS = 100000 * SCALE
+MESSAGES = 100000 * SCALE
+LEDGER_ENTRIES = 200000 * SCALE
+
+SEED_SQL = f"""
+INSERT INTO users (id, email, hashed_password, first_name, role)
+SELECT 'u' || g, 'user' || g || '@example.com', 'x', 'User ' || g,
+       CASE WHEN g <= {READERS} THEN 'reader' ELSE 'client' END
+FROM generate_series(1, {CLIENTS + READERS}) g;
+
+INSERT INTO readers (id, user_id, availability_status, application_status, updated_at)
+SELECT 'r' || g, 'u' || g, CASE WHEN g % 50 = 0 THEN 'online' ELSE 'offline' END, 'active',
+       NOW() - g * INTERVAL '1 second'
+FROM generate_series(1, {READERS}) g;
+
+INSERT INTO clients (id, user_id)
+SELECT 'c' || g, 'u' || ({READERS} + g)
+FROM generate_series(1, {CLIENTS}) g;
+
+INSERT INTO reading_sessions (id, client_id, reader_id, session_type, billing_type, status,
+                              rate_per_minute, start_time, room_id, created_at)
+SELECT 's' || g, 'c' || (1 + g % {CLIENTS}), 'r' || (1 + g % {READERS}), 'chat', 'per_minute',
+       CASE WHEN g % 1000 = 0 THEN 'active' WHEN g % 997 = 0 THEN 'pending' ELSE 'completed' END,
+       2.50, NOW() - g * INTERVAL '1 minute', 'room_' || g, NOW() - g * INTERVAL '1 minute'
+FROM generate_series(1, {SESSIONS}) g;
+
+INSERT INTO reader_earnings (reader_id, session_id, total_session_amount, amount_earned, payout_status, created_at)
+SELECT 'r' || (1 + g % {READERS}), 's' || g, 10.00, 7.00,
+       CASE WHEN g % 3 = 0 THEN 'paid' ELSE 'pending' END, NOW() - g * INTERVAL '1 minute'
+FROM generate_series(1, {EARNINGS}) g;
+
+INSERT INTO messages (sender_id, recipient_id, message_text, created_at)
+SELECT 'u' || (1 + g % {CLIENTS + READERS}), 'u' || (1 + (g * 7) % {CLIENTS + READERS}), 'hello',
+       NOW() - g * INTERVAL '1 minute'
+FROM generate_series(1, {MESSAGES}) g;
+
+INSERT INTO ledger_entries (transfer_id, account, amount, entry_type, created_at)
+SELECT 't' || (g / 2), CASE WHEN g % 2 = 0 THEN 'client:c' || (1 + g % {CLIENTS}) ELSE 'platform:revenue' END,
+       CASE WHEN g % 2 = 0 THEN -1.00 ELSE 1.00 END, 'session_charge', NOW() - g * INTERVAL '1 second'
+FROM generate_series(1, {LEDGER_ENTRIES}) g;
+"""
+
+# Hot queries that are not in the registry, with sample arguments
+EXTRA_QUERIES = {
+    "user_by_email": ("SELECT id FROM users WHERE email = $1", ("user42@example.com",)),
+    "client_by_user_id": ("SELECT id, user_id FROM clients WHERE user_id = $1", ("u5042",)),
+    "reader_by_user_id": ("SELECT id, user_id FROM readers WHERE user_id = $1", ("u42",)),
+    "client_by_id": ("SELECT id, user_id FROM clients WHERE id = $1", ("c42",)),
+    "reader_by_id": ("SELECT id, user_id FROM readers WHERE id = $1", ("r42",)),
+    "client_profile": (
+        """SELECT user_id, ledger_balance('client:' || id) AS balance, created_at, updated_at
+           FROM clients WHERE user_id = $1""", ("u5042",)
+    ),
+    "message_inbox": (
+        "SELECT * FROM messages WHERE recipient_id = $1 ORDER BY created_at DESC LIMIT 50", ("u42",)
+    ),
+    # The body of the ledger_balance() function, which EXPLAIN does not look into
+    "ledger_balance": (
+        """SELECT COALESCE(s.balance, 0.00) + COALESCE((
+                  SELECT SUM(e.amount) FROM ledger_entries e
+                  WHERE e.account = $1 AND e.id > COALESCE(s.last_entry_id, 0)
+              ), 0.00)
+           FROM (SELECT 1) AS one
+           LEFT JOIN ledger_snapshots s ON s.account = $1""",
+        ("client:c42",),
+    ),
+    "reader_directory_page": server.reader_directory_page_query(51),
+    "reader_directory_search": server.reader_directory_page_query(51, search="user4242"),
+    "reader_directory_status": server.reader_directory_page_query(51, application_status="pending_approval"),
+}
+
+
+def _seq_scans(plan: dict) -> list:
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in LARGE_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+async def _explain_all(registry_args: dict) -> dict:
+    conn = await asyncpg.connect(TEST_DATABASE_URL)
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+        await conn.execute(f"SET search_path TO {SCHEMA}")
+        await server.apply_migrations(conn)
+        await conn.execute(SEED_SQL)
+        await conn.execute("ANALYZE")
+
+        queries = {
+            name: (sql, registry_args.get(name))
+            for name, sql in server.statement_registry.statements.items()
+        }
+        queries.update(EXTRA_QUERIES)
+        plans = {}
+        for name, (sql, args) in queries.items():
+            if args is None:
+                continue # Reported by the test for this statement
+            explained = await conn.fetchval("EXPLAIN (FORMAT JSON) " + sql, *args)
+            plans[name] = json.loads(explained)[0]["Plan"]
+        return plans
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+@pytest.fixture(scope="module")
+def plans(registry_args):
+    return asyncio.run(_explain_all(registry_args))
+
+
+# Every registered statement is checked, so a new one cannot skip its plan check
+@pytest.mark.parametrize("name", sorted(set(server.statement_registry.statements) | set(EXTRA_QUERIES)))
+def test_hot_query_avoids_sequential_scans(plans, name):
+    assert name in plans, f"Add sample arguments to registry_args in conftest.py for {name}"
+    scanned = _seq_scans(plans[name])
+    assert not scanned, f"{name} sequentially scans {scanned}:\n{json.dumps(plans[name], indent=2)}"
@@ -0,0 +1,55 @@
+"""Unit tests for routing reads between the primary and the replica.
+
+The pools are plain markers, so these run without Postgres:
+
+    python -m pytest tests/test_replica_router.py
+"""
+import asyncio
+
+import pytest
+
+import server
+
+PRIMARY = object()
+REPLICA = object()
+
+
+@pytest.fixture
+def router(monkeypatch):
+    router = server.ReplicaRouter(dsn="postgresql://replica", max_lag_seconds=60, check_seconds=1)
+    router.pool = REPLICA
+    router.healthy = True
+    bus = server.EventBus(dsn=None)
+    bus.listening = True
+    monkeypatch.setattr(server, "db_pool", PRIMARY)
+    monkeypatch.setattr(server, "replica_router", router)
+    monkeypatch.setattr(server, "event_bus", bus)
+    return router
+
+
+def test_write_on_another_worker_routes_the_user_to_the_primary(router):
+    assert router.read_pool("u1") is REPLICA
+    asyncio.run(server.record_write_event({"kind": "write", "origin": "other", "seq": 1, "user_id": "u1"}))
+    assert router.read_pool("u1") is PRIMARY
+    assert router.read_pool("u2") is REPLICA
+
+
+def test_reads_use_the_primary_while_other_workers_writes_are_unknown(router):
+    server.event_bus.listening = False
+    assert router.read_pool("u1") is PRIMARY
+    server.event_bus.listening = True
+    router.missed_writes() # The listener just reconnected
+    assert router.read_pool("u1") is PRIMARY
+    assert router.event_bus_fallbacks == 2
+
+
+def test_listing_served_from_the_directory_does_not_pick_a_pool(monkeypatch, router):
+    directory = server.ReaderDirectory()
+    directory._replace({})
+    monkeypatch.setattr(server, "reader_directory", directory)
+    request = server.Request({"type": "http", "headers": []})
+
+    response = asyncio.run(server.get_available_readers(request, stream=False, identity=None))
+
+    assert response.status_code == 200
+    assert (router.primary_reads, router.replica_reads) == (0, 0)
@@ -0,0 +1,31 @@
+"""Checks on the statement registry that need no database.
+
+    python -m pytest tests/test_statement_registry.py
+"""
+import asyncio
+
+import server
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.prepared = []
+        self.executed = []
+
+    async def prepare(self, sql):
+        self.prepared.append(sql)
+
+    async def fetch(self, sql, *args):
+        self.executed.append(sql)
+
+
+def test_every_registered_statement_has_sample_arguments(registry_args):
+    missing = set(server.statement_registry.statements) - set(registry_args)
+    assert not missing, f"Add sample arguments to registry_args in conftest.py for: {sorted(missing)}"
+
+
+def test_prepare_connection_prepares_without_executing():
+    conn = RecordingConnection()
+    asyncio.run(server.statement_registry.prepare_connection(conn))
+    assert conn.prepared == list(server.statement_registry.statements.values())
+    assert conn.executed == []
@@ -0,0 +1,58 @@
+"""Unit tests for per-user token revocation; no database needed.
+
+    python -m pytest tests/test_token_revocations.py
+"""
+import asyncio
+import time
+from datetime import datetime
+
+import server
+
+
+class StubConnection:
+    """Keeps token_revocations rows in a dict, keyed by user_id."""
+
+    def __init__(self):
+        self.rows = {}
+
+    async def execute(self, query, *args):
+        if query.lstrip().startswith("INSERT"):
+            self.rows[args[0]] = args[1]
+        else:
+            self.rows = {user_id: cutoff for user_id, cutoff in self.rows.items() if cutoff >= args[0]}
+
+    async def fetch(self, query, horizon):
+        return [
+            {"user_id": user_id, "revoked_before": cutoff}
+            for user_id, cutoff in self.rows.items() if cutoff >= horizon
+        ]
+
+
+def test_revocations_survive_a_restart():
+    async def scenario():
+        conn = StubConnection()
+        conn.rows["expired"] = datetime.utcfromtimestamp(0)
+        cutoff = await server.TokenRevocations().revoke_user("u1", conn)
+        restarted = server.TokenRevocations()
+        await restarted.load(conn)
+        return cutoff, restarted, conn.rows
+
+    cutoff, restarted, rows = asyncio.run(scenario())
+    assert list(rows) == ["u1"] # Cutoffs past the token lifetime are pruned
+    assert restarted.is_revoked("u1", cutoff - 1)
+    assert not restarted.is_revoked("u1", cutoff + 1)
+    assert not restarted.is_revoked("u2", cutoff - 1)
+
+
+def test_revocation_events_apply_on_other_workers(monkeypatch):
+    revocations = server.TokenRevocations()
+    monkeypatch.setattr(server, "token_revocations", revocations)
+    cutoff = time.time()
+
+    own = {"kind": "revocation", "origin": server.event_bus.worker_id, "seq": 1, "user_id": "u1", "revoked_before": cutoff}
+    asyncio.run(server.apply_revocation_event(own))
+    assert not revocations.is_revoked("u1", cutoff - 1) # Applied when it was stored
+
+    asyncio.run(server.apply_revocation_event(dict(own, origin="other")))
+    assert revocations.is_revoked("u1", cutoff - 1)
+    assert revocations.is_revoked("u1", None) # Tokens without "iat" predate the cutoff
@@ -0,0 +1,156 @@
+"""Unit tests for the notification WebSocket hub, with stand-in sockets.
+
+    python -m pytest tests/test_websocket_hub.py
+"""
+import asyncio
+import json
+
+import server
+
+
+class FakeWebSocket:
+    """Records what is sent; a stalled one never completes a send."""
+
+    def __init__(self, stalled: bool = False):
+        self.sent = []
+        self.close_code = None
+        self.stalled = stalled
+
+    async def send_text(self, text):
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+def test_slow_consumer_is_evicted_at_the_queue_limit():
+    async def scenario():
+        hub = server.WebSocketHub(high_water=2, max_queue=4, slow_consumer_seconds=60)
+        slow = hub.connect("slow", FakeWebSocket(stalled=True))
+        fast = hub.connect("fast", FakeWebSocket())
+        hub.subscribe(slow, "readers")
+        await asyncio.sleep(0)
+        accepted = []
+        for n in range(6):
+            accepted.append(hub.broadcast(json.dumps({"n": n})))
+            await asyncio.sleep(0) # The fast writer keeps up
+        await asyncio.sleep(0.01)
+        return hub, slow, fast, accepted
+
+    hub, slow, fast, accepted = asyncio.run(scenario())
+    assert accepted[-1] == 1 # Only the fast consumer is left
+    assert slow.closed and "slow" not in hub.connections
+    assert slow.websocket.close_code == 1013
+    assert "readers" not in hub.topics
+    assert [json.loads(text)["n"] for text in fast.websocket.sent] == list(range(6))
+    assert hub.evicted == 1
+
+
+def test_slow_consumer_is_evicted_after_staying_over_high_water():
+    async def scenario():
+        hub = server.WebSocketHub(high_water=2, max_queue=100, slow_consumer_seconds=0.01)
+        slow = hub.connect("slow", FakeWebSocket(stalled=True))
+        for n in range(4):
+            hub.send("slow", str(n))
+        assert not slow.closed # Over high water, but not for long yet
+        await asyncio.sleep(0.02)
+        hub.send("slow", "late")
+        return slow
+
+    assert asyncio.run(scenario()).closed
+
+
+def test_consumer_that_drains_below_high_water_is_kept():
+    async def scenario():
+        hub = server.WebSocketHub(high_water=2, max_queue=100, slow_consumer_seconds=0.01)
+        connection = hub.connect("u1", FakeWebSocket())
+        for n in range(3):
+            hub.send("u1", str(n))
+        await asyncio.sleep(0.02) # The writer catches up
+        hub.send("u1", "3")
+        await asyncio.sleep(0)
+        return connection
+
+    connection = asyncio.run(scenario())
+    assert not connection.closed
+    assert connection.websocket.sent == ["0", "1", "2", "3"]
+
+
+def test_entity_updates_are_coalesced_per_subscriber():
+    async def scenario():
+        hub = server.WebSocketHub(coalesce_seconds=60)
+        both = hub.connect("both", FakeWebSocket())
+        listing = hub.connect("listing", FakeWebSocket())
+        other = hub.connect("other", FakeWebSocket())
+        hub.subscribe(both, "readers")
+        hub.subscribe(both, "reader:r1")
+        hub.subscribe(listing, "readers")
+        hub.subscribe(other, "reader:r2")
+
+        topics = ["readers", "reader:r1"]
+        hub.publish("reader:r1", topics, {"type": "reader_status_change", "reader_id": "r1", "changes": {"status": "online"}})
+        hub.publish("reader:r1", topics, {"type": "reader_status_change", "reader_id": "r1", "changes": {"rate": 2, "status": "busy"}})
+        hub.publish(None, ["readers"], {"type": "announcement"}) # No entity: not held back
+        await asyncio.sleep(0)
+        immediate = [json.loads(text)["type"] for text in both.websocket.sent]
+        hub.flush()
+        await asyncio.sleep(0)
+        return hub, both, listing, other, immediate
+
+    hub, both, listing, other, immediate = asyncio.run(scenario())
+    assert immediate == ["announcement"]
+    for connection in (both, listing):
+        messages = [json.loads(text) for text in connection.websocket.sent]
+        assert [message["type"] for message in messages] == ["announcement", "reader_status_change"]
+        assert messages[1]["changes"] == {"status": "busy", "rate": 2}
+    assert other.websocket.sent == []
+    assert hub.coalesced == 1
+    assert hub.topic_deliveries == 4
+
+
+def test_subscriptions_are_capped_per_connection():
+    async def scenario():
+        hub = server.WebSocketHub(max_subscriptions=2)
+        connection = hub.connect("u1", FakeWebSocket())
+        return [hub.subscribe(connection, topic) for topic in ("readers", "reader:r1", "reader:r1", "reader:r2")]
+
+    assert asyncio.run(scenario()) == [True, True, True, False]
+
+
+def test_replacing_a_connection_drops_its_subscriptions():
+    async def scenario():
+        hub = server.WebSocketHub()
+        old = hub.connect("u1", FakeWebSocket())
+        hub.subscribe(old, "readers")
+        new = hub.connect("u1", FakeWebSocket())
+        topics_after_replace = dict(hub.topics)
+        hub.disconnect(old) # The old socket's handler cleans up later
+        return hub, old, new, topics_after_replace
+
+    hub, old, new, topics_after_replace = asyncio.run(scenario())
+    assert topics_after_replace == {}
+    assert old.closed and not new.closed
+    assert hub.connections["u1"] is new
+
+
+def test_topic_request_rejects_topics_that_are_not_a_list(monkeypatch):
+    hub = server.WebSocketHub()
+    monkeypatch.setattr(server, "websocket_hub", hub)
+
+    async def scenario():
+        connection = hub.connect("u1", FakeWebSocket())
+        identity = server.TokenIdentity(user_id="u1", role="client")
+        replies = []
+        for request in ({"action": "subscribe", "topics": "readers"},
+                        {"action": "unsubscribe", "topics": {"readers": True}},
+                        {"action": "subscribe", "topics": ["readers", 7, "bogus topic"]}):
+            replies.append(await server.handle_topic_request(connection, identity, json.dumps(request)))
+        replies.append(await server.handle_topic_request(connection, identity, "ping"))
+        return replies
+
+    string_topics, dict_topics, mixed, ping = asyncio.run(scenario())
+    assert string_topics["type"] == dict_topics["type"] == "error"
+    assert mixed == {"type": "subscribed", "topics": ["readers"], "rejected": ["bogus topic"]}
+    assert ping is None